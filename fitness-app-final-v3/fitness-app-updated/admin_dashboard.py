@@ -0,0 +1,164 @@
+"""
+admin_dashboard.py
+RoutineX operator dashboard — user activity, retention and plan funnels
+across every user, plus LLM latency, retries and token spend.
+Only usernames listed in ADMIN_USERS (comma-separated, .env) can open it.
+"""
+
+import os
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+
+from database_tracker import get_cohort_report
+from engine.telemetry import get_llm_call_stats, get_llm_daily_tokens
+
+
+def is_admin(username):
+    admins = [u.strip() for u in os.getenv("ADMIN_USERS", "").split(",") if u.strip()]
+    return bool(username) and username in admins
+
+
+# ─────────────────────────────────────────────────────────────
+# USERS & COHORTS
+# ─────────────────────────────────────────────────────────────
+
+def render_cohort_analytics():
+    st.markdown("### 👥 Users & Cohorts")
+
+    days = st.selectbox("Activity window", [30, 90, 180, 365], index=1,
+                        format_func=lambda d: f"Last {d} days", key="admin_cohort_days")
+    report = get_cohort_report(days)
+    if not report["dau"] and not report["retention"]:
+        st.info("No diary check-ins recorded yet.")
+        return
+    st.caption(f"Summary tables refreshed {report['refreshed_at']}")
+
+    dau = pd.DataFrame(report["dau"])
+    wau = pd.DataFrame(report["wau"])
+    mau = pd.DataFrame(report["mau"])
+    m1, m2, m3, m4 = st.columns(4)
+    last_dau = int(dau["active_users"].iloc[-1]) if not dau.empty else 0
+    last_wau = int(wau["active_users"].iloc[-1]) if not wau.empty else 0
+    m1.metric("DAU (latest day)", f"{last_dau:,}")
+    m2.metric("WAU (this week)", f"{last_wau:,}")
+    m3.metric("MAU (this month)", f"{int(mau['active_users'].iloc[-1]) if not mau.empty else 0:,}")
+    m4.metric("DAU / WAU", f"{last_dau / last_wau:.0%}" if last_wau else "—")
+
+    if not dau.empty:
+        fig = px.line(dau, x="period_start", y="active_users", title="Daily active users")
+        if not wau.empty:
+            fig.add_scatter(x=wau["period_start"], y=wau["active_users"], mode="lines+markers",
+                            name="Weekly active", line_shape="hv")
+        fig.update_layout(height=300, margin=dict(t=40, b=20, l=10, r=10), xaxis_title="",
+                          yaxis_title="Users", legend_title_text="")
+        st.plotly_chart(fig, use_container_width=True)
+
+    retention = report["retention"]
+    if retention:
+        st.markdown("#### Weekly check-in retention by first-check-in week")
+        weeks = max(len(c["retention"]) for c in retention)
+        grid = pd.DataFrame(
+            [c["retention"] + [None] * (weeks - len(c["retention"])) for c in retention],
+            index=[f"{c['cohort_week']} ({c['size']:,})" for c in retention],
+            columns=[f"W{k}" for k in range(weeks)],
+        )
+        fig = px.imshow(grid, text_auto=".0f", aspect="auto", color_continuous_scale="Blues",
+                        labels=dict(color="% active"))
+        fig.update_layout(height=40 + 28 * len(retention), margin=dict(t=10, b=10, l=10, r=10))
+        st.plotly_chart(fig, use_container_width=True)
+        curve = report["retention_curve"]
+        st.caption("Average: " + " → ".join(f"W{k} {v:.0f}%" for k, v in enumerate(curve) if v is not None))
+
+    c1, c2 = st.columns(2)
+    with c1:
+        st.markdown("#### Workout plan funnel")
+        if report["funnel"]:
+            fig = px.funnel(pd.DataFrame(report["funnel"]), x="users", y="label")
+            fig.update_layout(height=320, margin=dict(t=10, b=10, l=10, r=10), yaxis_title="")
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.caption("The first funnel snapshot is taken at the next refresh.")
+    with c2:
+        st.markdown("#### Mood & sleep by goal type")
+        if report["goal_stats"]:
+            view = pd.DataFrame(report["goal_stats"]).rename(columns={
+                "goal_type": "Goal", "users": "Users", "days_logged": "Days logged",
+                "avg_mood": "Avg mood", "avg_sleep": "Avg sleep (h)", "avg_energy": "Avg energy",
+            })
+            st.dataframe(view, use_container_width=True, hide_index=True)
+        else:
+            st.caption("No check-ins in the last few months.")
+
+
+# ─────────────────────────────────────────────────────────────
+# LLM TELEMETRY
+# ─────────────────────────────────────────────────────────────
+
+def render_llm_telemetry():
+    st.markdown("### 🤖 LLM Calls")
+
+    days = st.selectbox("Window", [1, 7, 30, 90], index=1,
+                        format_func=lambda d: f"Last {d} day{'s' if d > 1 else ''}",
+                        key="admin_llm_days")
+    stats, parse_failures = get_llm_call_stats(days)
+
+    if not stats and not parse_failures:
+        st.info("No LLM calls recorded in this window yet.")
+        return
+
+    df = pd.DataFrame(stats)
+    if not df.empty:
+        total_calls = int(df["calls"].sum())
+        total_tokens = int(df["prompt_tokens"].sum() + df["response_tokens"].sum())
+        retried = (df["retry_rate_pct"] * df["calls"]).sum() / max(total_calls, 1)
+
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Provider calls", f"{total_calls:,}")
+        m2.metric("Tokens", f"{total_tokens:,}")
+        m3.metric("Retry rate", f"{retried:.1f}%")
+        m4.metric("Parse failures", f"{sum(parse_failures.values()):,}")
+
+        st.markdown("#### Latency & spend by feature / model")
+        view = df.rename(columns={
+            "feature": "Feature", "model": "Model", "calls": "Calls", "ok_calls": "OK",
+            "retry_rate_pct": "Retry %", "error_rate_pct": "Error %", "cache_hits": "Cache hits",
+            "prompt_tokens": "Prompt tok", "response_tokens": "Response tok",
+            "p50_ms": "p50 ms", "p95_ms": "p95 ms", "p99_ms": "p99 ms",
+        })
+        st.dataframe(view, use_container_width=True, hide_index=True)
+
+        by_feature = df.groupby("feature")[["prompt_tokens", "response_tokens"]].sum().reset_index()
+        fig = px.bar(by_feature, x="feature", y=["prompt_tokens", "response_tokens"],
+                     title="Token spend per feature", barmode="stack")
+        fig.update_layout(height=300, margin=dict(t=40, b=20, l=10, r=10), legend_title_text="")
+        st.plotly_chart(fig, use_container_width=True)
+
+    if parse_failures:
+        st.markdown("#### Parse failures")
+        st.dataframe(pd.DataFrame(
+            [{"Feature": f, "Failures": n} for f, n in parse_failures.items()]
+        ), use_container_width=True, hide_index=True)
+
+    daily = get_llm_daily_tokens(max(days, 7))
+    if daily:
+        dfd = pd.DataFrame(daily)
+        fig = px.line(dfd, x="day", y="tokens", color="feature", markers=True,
+                      title="Daily token spend")
+        fig.update_layout(height=300, margin=dict(t=40, b=20, l=10, r=10), legend_title_text="")
+        st.plotly_chart(fig, use_container_width=True)
+
+
+# ─────────────────────────────────────────────────────────────
+# MAIN ENTRY POINT
+# ─────────────────────────────────────────────────────────────
+
+def render_admin_page(username):
+    if not is_admin(username):
+        st.error("You don't have access to this page.")
+        return
+
+    st.markdown("<h2 class='section-title'>Admin Dashboard</h2>", unsafe_allow_html=True)
+    render_cohort_analytics()
+    st.divider()
+    render_llm_telemetry()
@@ -17,27 +17,22 @@ from engine.diet_generator import generate_diet_plan
 from combined_planner import render_combined_planner
 
 # NEW: TRACKER DATABASE
-from database_tracker import init_tracker_db, save_workout_plan, save_diet_plan, get_all_workout_plans, get_all_diet_plans, get_workout_plan_by_id, activate_workout_plan, delete_workout_plan, delete_diet_plan, get_canvas_entries, delete_canvas_entry, get_wins, delete_wins
+from database_tracker import save_workout_plan, save_diet_plan, get_all_workout_plans, get_all_diet_plans, get_workout_plan_by_id, activate_workout_plan, delete_workout_plan, delete_diet_plan, get_canvas_entries, delete_canvas_entry, get_wins, delete_wins
 
 # NEW: IMPORT MENTAL HEALTH MODULE
 from mental_health import render_mental_health_page
 
+# ADMIN DASHBOARD
+from admin_dashboard import render_admin_page, is_admin
+
 # IMPORT DATABASE FUNCTIONS
-from database import init_db, add_user, verify_user, save_plan, get_user_plans, delete_plan
-from database_extended import (
-    save_workout_for_checkin,
-    get_active_workout,
-    get_canvas_entries,
-    get_wins,
-    delete_canvas_entry,
-    delete_wins
-)
+from migrations import bootstrap
+from database import add_user, verify_user, save_plan, get_user_plans, delete_plan
 
 # ----------------------------
-# INITIALIZE DB ON STARTUP
+# INITIALIZE DB ON STARTUP (migrations run once per process)
 # ----------------------------
-init_db()
-init_tracker_db()
+bootstrap()
 
 # ----------------------------
 # PAGE CONFIGURATION
@@ -1281,14 +1276,7 @@ elif st.session_state.page == "scheduler":
                 with col2:
                     st.info("💡 Activate this workout to track your daily progress in Mental Health > Daily Check-in")
                     if st.button("✅ ACTIVATE FOR DAILY CHECK-IN", type="primary", use_container_width=True):
-                        # Save to old checkin system
-                        save_workout_for_checkin(
-                            username=st.session_state.user,
-                            workout_data=plan_data,
-                            plan_name=f"{goal} - {duration_months} months",
-                            duration_weeks=len(plan_data.get('schedule', []))
-                        )
-                        # Save to new tracker DB
+                        # One write: the Daily Check-in reads the active saved plan
                         save_workout_plan(
                             username=st.session_state.user,
                             plan_name=f"{goal} – {duration_months} months",
@@ -1622,9 +1610,13 @@ elif st.session_state.page == "diet":
         }
 
         with st.spinner("Calculating nutritional needs..."):
-            targets = calculate_nutritional_needs(nutri_profile, d_goal, d_activity)
+            from database_tracker import get_energy_summary
+            adaptive = get_energy_summary(st.session_state.user) if st.session_state.user else None
+            targets = calculate_nutritional_needs(nutri_profile, d_goal, d_activity, adaptive)
             st.session_state['diet_targets'] = targets
             st.success(f"Targets: {targets['calories']} kcal | P: {targets['macros']['protein']}g | C: {targets['macros']['carbs']}g | F: {targets['macros']['fats']}g")
+            if targets["adaptive"]:
+                st.caption(f"Maintenance estimate {targets['tdee']} kcal includes your logged weight trend.")
 
         with st.spinner("AI Chef is crafting your menu..."):
             diet_plan = generate_diet_plan(targets, gen_profile)
@@ -1730,6 +1722,12 @@ elif st.session_state.page == "subscription":
     </div>
     """, unsafe_allow_html=True)
 
+# ======================================================
+# ADMIN PAGE
+# ======================================================
+elif st.session_state.page == "admin":
+    render_admin_page(st.session_state.user)
+
 # ======================================================
 # PROFILE PAGE
 # ======================================================
@@ -1744,27 +1742,57 @@ elif st.session_state.page == "profile":
             if st.button("LOGOUT", type="secondary"):
                 st.session_state.user = None
                 st.rerun()
+            if is_admin(st.session_state.user):
+                if st.button("ADMIN", type="secondary"):
+                    st.session_state.page = "admin"
+                    st.rerun()
         
         st.markdown("---")
         
+        # --- SEARCH ---
+        from database_tracker import search_history
+        sc1, sc2, sc3 = st.columns([3, 1, 1])
+        with sc1:
+            search_text = st.text_input("🔎 Search your journal, notes and wins",
+                                        placeholder="e.g. that week my knee hurt", key="profile_search")
+        with sc2:
+            search_from = st.date_input("From", value=None, key="profile_search_from")
+        with sc3:
+            search_to = st.date_input("To", value=None, key="profile_search_to")
+        if search_text.strip():
+            hits = search_history(st.session_state.user, search_text.strip(),
+                                  search_from.isoformat() if search_from else None,
+                                  search_to.isoformat() if search_to else None)
+            if not hits:
+                st.info("Nothing matched. Try fewer or different words.")
+            source_labels = {"diary": "📔 Diary", "canvas": "📝 Journal", "wins": "🏆 Wins"}
+            for hit in hits:
+                st.markdown(f"**{hit['entry_date']}** · {source_labels[hit['source']]}  \n{hit['snippet']}")
+            st.markdown("---")
+        
         # --- TABBED INTERFACE ---
         tab1, tab2, tab3, tab4 = st.tabs(["💪 Workout Plans", "🥗 Diet Plans", "📝 Journal / Canvas", "🏆 Daily Wins"])
         
         # TAB 1: WORKOUT PLANS
         with tab1:
             st.markdown("### Your Saved Workout Plans")
-            from database_tracker import get_all_workout_plans, get_workout_plan_by_id, activate_workout_plan, delete_workout_plan
-            wplans = get_all_workout_plans(st.session_state.user)
+            from database_tracker import get_workout_plan_summaries_page, load_pages, get_workout_plan_by_id, activate_workout_plan, delete_workout_plan
+            # One query per page of plan summaries + week outlines; the full
+            # schedule is only loaded for a plan the user opens.
+            wp_pages_key = f"profile_wp_page_count:{st.session_state.user}"
+            wp_page = load_pages(get_workout_plan_summaries_page, st.session_state.user, st.session_state.setdefault(wp_pages_key, 1))
+            wplans = wp_page["items"]
             
             if not wplans:
                 st.info("No workout plans saved yet. Generate one in the Planner!")
             else:
+                import math
                 for wp in wplans:
                     active_badge = "🟢 Active" if wp.get("is_active") else "⚪ Archived"
                     with st.expander(f"{active_badge} · {wp['plan_name']} · {wp['created_at'][:10]}"):
                         col_a, col_b, col_c = st.columns([3, 1, 1])
                         with col_a:
-                            st.caption(f"Goal: {wp.get('goal','—')} · Duration: {wp.get('duration_months','—')} months")
+                            st.caption(f"Goal: {wp.get('goal') or '—'} · Duration: {wp.get('duration_months') or '—'} months")
                         with col_b:
                             if not wp.get("is_active"):
                                 if st.button("Activate", key=f"act_wp_{wp['id']}"):
@@ -1775,28 +1803,45 @@ elif st.session_state.page == "profile":
                                 delete_workout_plan(wp['id'])
                                 st.rerun()
                         
-                        # Show schedule preview
-                        full = get_workout_plan_by_id(wp['id'])
-                        if full:
-                            schedule = full["plan_data"].get("schedule", [])
-                            import math
+                        # Outline preview (no plan_data needed)
+                        outline = wp["outline"]
+                        if outline:
+                            num_months = math.ceil(len(outline) / 4)
+                            st.markdown("  \n".join(
+                                f"**Month {mi+1}:** " + " · ".join(
+                                    f"W{w['week']} {w['focus'] or '—'} ({w['training_days']}d)"
+                                    for w in outline[mi*4:mi*4+4]
+                                )
+                                for mi in range(num_months)
+                            ))
+                        
+                        # Full schedule, fetched on demand
+                        if st.checkbox("Show full schedule", key=f"full_wp_{wp['id']}"):
+                            full = get_workout_plan_by_id(wp['id'])
+                            schedule = full["plan_data"].get("schedule", []) if full else []
                             num_months = math.ceil(len(schedule) / 4)
-                            tabs_wp = st.tabs([f"Month {i+1}" for i in range(min(num_months, 3))])
-                            for mi, mta in enumerate(tabs_wp):
-                                with mta:
-                                    for week in schedule[mi*4:mi*4+4]:
-                                        with st.expander(f"Week {week.get('week_number','?')}: {week.get('focus','')}"):
+                            if num_months:
+                                tabs_wp = st.tabs([f"Month {i+1}" for i in range(num_months)])
+                                for mi, mta in enumerate(tabs_wp):
+                                    with mta:
+                                        for week in schedule[mi*4:mi*4+4]:
+                                            st.markdown(f"##### Week {week.get('week_number','?')}: {week.get('focus','')}")
                                             for day in week.get("workouts", []):
                                                 st.markdown(f"**{day.get('day','')}** — {day.get('focus','')}")
                                                 for ex in day.get("exercises", []):
                                                     st.text(f"• {ex}")
-                                                st.divider()
+                                            st.divider()
+                if wp_page["next_cursor"] and st.button("Load more plans", key="more_wp"):
+                    st.session_state[wp_pages_key] += 1
+                    st.rerun()
         
         # TAB 2: DIET PLANS
         with tab2:
             st.markdown("### Your Saved Diet Plans")
-            from database_tracker import get_all_diet_plans, delete_diet_plan
-            dplans = get_all_diet_plans(st.session_state.user)
+            from database_tracker import get_diet_plans_page, load_pages, delete_diet_plan
+            dp_pages_key = f"profile_dp_page_count:{st.session_state.user}"
+            dp_page = load_pages(get_diet_plans_page, st.session_state.user, st.session_state.setdefault(dp_pages_key, 1))
+            dplans = dp_page["items"]
             
             if not dplans:
                 st.info("No diet plans saved yet. Generate one in the Planner!")
@@ -1811,12 +1856,17 @@ elif st.session_state.page == "profile":
                             if st.button("Delete", key=f"del_dp_{dp['id']}", type="primary"):
                                 delete_diet_plan(dp['id'])
                                 st.rerun()
+                if dp_page["next_cursor"] and st.button("Load more plans", key="more_dp"):
+                    st.session_state[dp_pages_key] += 1
+                    st.rerun()
 
         # TAB 3: CANVAS / JOURNAL
         with tab3:
             st.markdown("### 📝 Your Journal Entries")
-            from database_tracker import get_canvas_entries, delete_canvas_entry
-            entries = get_canvas_entries(st.session_state.user, limit=30)
+            from database_tracker import get_canvas_page, load_pages, delete_canvas_entry
+            canvas_pages_key = f"profile_canvas_page_count:{st.session_state.user}"
+            canvas_page = load_pages(get_canvas_page, st.session_state.user, st.session_state.setdefault(canvas_pages_key, 1))
+            entries = canvas_page["items"]
             
             if not entries:
                 st.info("No journal entries yet. Visit Mental Health > Mind Reset to write your thoughts!")
@@ -1829,12 +1879,17 @@ elif st.session_state.page == "profile":
                             if st.button("🗑️", key=f"del_canvas_{entry['id']}"):
                                 delete_canvas_entry(entry['id'])
                                 st.rerun()
+                if canvas_page["next_cursor"] and st.button("Load older entries", key="more_canvas"):
+                    st.session_state[canvas_pages_key] += 1
+                    st.rerun()
         
         # TAB 4: WINS
         with tab4:
             st.markdown("### 🏆 Daily Wins")
-            from database_tracker import get_wins, delete_wins
-            wins = get_wins(st.session_state.user, limit=20)
+            from database_tracker import get_wins_page, load_pages, delete_wins
+            wins_pages_key = f"profile_wins_page_count:{st.session_state.user}"
+            wins_page = load_pages(get_wins_page, st.session_state.user, st.session_state.setdefault(wins_pages_key, 1))
+            wins = wins_page["items"]
             
             if not wins:
                 st.info("No wins logged yet. Keep going — every effort counts!")
@@ -1849,6 +1904,9 @@ elif st.session_state.page == "profile":
                             if st.button("🗑️", key=f"del_win_{win['id']}"):
                                 delete_wins(win['id'])
                                 st.rerun()
+                if wins_page["next_cursor"] and st.button("Load older wins", key="more_wins"):
+                    st.session_state[wins_pages_key] += 1
+                    st.rerun()
     
     # --- IF NOT LOGGED IN ---
     else:
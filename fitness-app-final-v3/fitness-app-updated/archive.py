@@ -0,0 +1,496 @@
+"""
+archive.py
+Columnar export of the history tables, and archival of old diary rows out of
+the hot SQLite tables.
+
+export() streams each dataset to Hive-partitioned columnar files, one
+directory per year, BATCH_ROWS rows at a time (memory stays flat however big
+the table is). Parquet by default; fmt="arrow" writes Arrow IPC files:
+
+    <out>/daily_diary/year=2024/part-<run>.parquet
+    <out>/weight_log/...
+    <out>/weekly_reviews/...
+    <out>/workout_plans/...   one row per exercise (plan → week → day → exercise)
+    <out>/diet_plans/...      one row per plan, plan_data decoded to JSON text
+
+Daily check-ins have lived in daily_diary since migration 4, so they come
+with it. Within a year, rows are ordered by (username, date) so Parquet
+row-group statistics let a per-user read skip everything else.
+
+prune() moves daily_diary rows older than a retention horizon into the same
+layout under the archive directory (each row tagged with archived_at),
+deletes them from the hot table and records the horizon in archive_state.
+The history reads then merge archived rows back in for ranges that reach
+past the horizon — get_diary_entry / get_diary_range / get_diary_last_n in
+database_tracker, the chart series (timeseries.py) and insights.py — so
+callers see the same rows as before. A write to an archived day first
+restores that day into the hot table, so rollups, streaks and the energy
+state stay consistent. The rollups keep counting archived days, and
+rollups.rebuild() reads them back through stage(). Streak and energy
+recomputes see archived days through archived_diary_runs — runs of
+consecutive archived days not back in the hot table ('logged': rows that
+aren't imported, 'diet': diet_followed = 1), rebuilt from stage() by every
+prune; prune() recomputes both summaries before and after moving the rows
+and refuses to commit if any row would change. Search only covers the hot
+range.
+
+    python archive.py export --out exports/ [--format arrow] [--tables daily_diary weight_log]
+    python archive.py prune --keep-days 730 [--dir archive/]
+    python archive.py status
+
+Needs pyarrow (pip install pyarrow); without it the rest of the app works
+as long as nothing has been pruned. Every function takes an open connection
+so it runs inside the caller's transaction (database_tracker and
+migrations).
+"""
+
+import argparse
+import json
+import os
+from datetime import date, datetime, timedelta
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = ds = pq = None
+
+import energy
+import streaks
+from plan_codec import decode as decode_plan
+
+ARCHIVE_DIR = os.getenv("ROUTINEX_ARCHIVE_DIR", "archive")
+BATCH_ROWS = 50_000          # rows held in memory at once while writing
+ROW_GROUP_ROWS = 64 * 1024
+DEFAULT_KEEP_DAYS = 730
+
+# dataset -> (SELECT over its rows, date column to partition and filter on,
+#             {column: arrow type} for columns not taken from the source table)
+DATASETS = {
+    "daily_diary": ("SELECT * FROM daily_diary t", "entry_date", {}),
+    "weight_log": ("SELECT * FROM weight_log t", "log_date", {}),
+    "weekly_reviews": ("SELECT * FROM weekly_reviews t", "week_start", {}),
+    "workout_plans": ("""
+        SELECT t.id AS plan_id, t.username, t.plan_name, t.goal, t.is_active, t.started_on,
+               t.created_at, d.week_number, w.focus AS week_focus, d.position AS day_position,
+               d.day_label, d.weekday, d.focus AS day_focus, e.position AS exercise_position,
+               e.text AS exercise
+        FROM saved_workout_plans t
+        JOIN workout_plan_days d ON d.plan_id = t.id
+        LEFT JOIN workout_plan_weeks w ON w.plan_id = t.id AND w.week_number = d.week_number
+        JOIN workout_plan_exercises e ON e.day_id = d.id
+    """, "created_at", {"plan_id": "INTEGER", "week_focus": "TEXT", "day_position": "INTEGER",
+                        "day_label": "TEXT", "weekday": "INTEGER", "day_focus": "TEXT",
+                        "exercise_position": "INTEGER", "exercise": "TEXT", "week_number": "INTEGER"}),
+    "diet_plans": ("SELECT t.id, t.username, t.plan_name, t.goal, t.calories, t.is_active, "
+                   "t.created_at, t.plan_data AS plan_json FROM saved_diet_plans t",
+                   "created_at", {"plan_json": "TEXT"}),
+}
+_SOURCE_TABLE = {"workout_plans": "saved_workout_plans", "diet_plans": "saved_diet_plans"}
+
+# tables prune() may empty past the horizon -> their date column
+PRUNABLE = {"daily_diary": "entry_date"}
+
+# daily_diary columns a wearable import writes, or that every row has
+_IMPORT_COLUMNS = {"id", "username", "entry_date", "created_at", "updated_at", "steps_count", "sleep_hours",
+                   "imported", "archived_at", "year"}
+
+
+def _require():
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed (pip install pyarrow)")
+
+
+# ──────────────────────────────────────────────────────────────
+# WRITING
+# ──────────────────────────────────────────────────────────────
+
+def _arrow_type(decl):
+    decl = (decl or "").upper()
+    if "INT" in decl:
+        return pa.int64()
+    if any(t in decl for t in ("REAL", "FLOA", "DOUB")):
+        return pa.float64()
+    if "BLOB" in decl:
+        return pa.binary()
+    return pa.string()
+
+
+def _schema(con, name, columns):
+    types = DATASETS[name][2]
+    declared = {r[1]: r[2] for r in con.execute(f"PRAGMA table_info({_SOURCE_TABLE.get(name, name)})")}
+    return pa.schema([(c, _arrow_type(types.get(c, declared.get(c)))) for c in columns])
+
+
+def _transform(name, rows):
+    if name == "diet_plans":
+        # the JSON blob is (possibly binary-encoded) plan_data; store readable JSON
+        i = len(rows[0]) - 1
+        rows = [r[:i] + (json.dumps(decode_plan(r[i]), ensure_ascii=False),) for r in rows]
+    return rows
+
+
+class _PartitionWriter:
+    """One open file at a time, in the partition of the rows being written."""
+
+    def __init__(self, root, schema, fmt, run):
+        self.root, self.schema, self.fmt, self.run = root, schema, fmt, run
+        self.year, self.writer, self.sink = None, None, None
+
+    def write(self, year, batch):
+        if year != self.year:
+            self.close()
+            folder = os.path.join(self.root, f"year={year}")
+            os.makedirs(folder, exist_ok=True)
+            path = os.path.join(folder, f"part-{self.run}.{'arrow' if self.fmt == 'arrow' else 'parquet'}")
+            if self.fmt == "arrow":
+                self.sink = pa.OSFile(path, "wb")
+                self.writer = pa.ipc.new_file(self.sink, self.schema)
+            else:
+                self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+            self.year = year
+        if self.fmt == "arrow":
+            self.writer.write_batch(batch)
+        else:
+            self.writer.write_batch(batch, row_group_size=ROW_GROUP_ROWS)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            if self.sink is not None:
+                self.sink.close()
+        self.writer = self.sink = None
+
+
+def _years(con, name, where, args):
+    """Years with rows (MIN and MAX separately, so each is an index probe where there is one)."""
+    sql, date_col, _ = DATASETS[name]
+    lo, hi = (con.execute(f"SELECT {fn}(t.{date_col}) FROM ({sql}) t WHERE {where}", args).fetchone()[0]
+              for fn in ("MIN", "MAX"))
+    return range(int(lo[:4]), int(hi[:4]) + 1) if lo else range(0)
+
+
+def write_dataset(con, name, root, where="1", args=(), fmt="parquet", extra=None, run=None):
+    """
+    Stream the rows of dataset `name` matching `where` into `root`/name/year=YYYY/.
+    `extra` adds constant columns. Returns the number of rows written.
+    """
+    _require()
+    sql, date_col, _ = DATASETS[name]
+    run = run or datetime.now().strftime("%Y%m%d%H%M%S")
+    writer, total = None, 0
+    try:
+        for year in _years(con, name, where, args):
+            cur = con.execute(f"""
+                SELECT * FROM ({sql}) t
+                WHERE {where} AND t.{date_col} >= ? AND t.{date_col} < ?
+                ORDER BY t.username, t.{date_col}
+            """, (*args, f"{year:04d}-01-01", f"{year + 1:04d}-01-01"))
+            columns = [d[0] for d in cur.description]
+            if writer is None:
+                schema = _schema(con, name, columns)
+                for c in extra or {}:
+                    schema = schema.append(pa.field(c, pa.string()))
+                writer = _PartitionWriter(os.path.join(root, name), schema, fmt, run)
+            while True:
+                rows = cur.fetchmany(BATCH_ROWS)
+                if not rows:
+                    break
+                rows = _transform(name, [tuple(r) for r in rows])
+                arrays = [pa.array(col, type=f.type) for col, f in zip(zip(*rows), writer.schema)]
+                arrays += [pa.array([v] * len(rows), type=pa.string()) for v in (extra or {}).values()]
+                writer.write(year, pa.RecordBatch.from_arrays(arrays, schema=writer.schema))
+                total += len(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    return total
+
+
+def _remove_run(root, run):
+    """Delete the files one write_dataset run left under `root` (a dataset's folder)."""
+    if not os.path.isdir(root):
+        return
+    for folder in os.listdir(root):
+        path = os.path.join(root, folder)
+        for ext in ("parquet", "arrow"):
+            part = os.path.join(path, f"part-{run}.{ext}")
+            if os.path.exists(part):
+                os.remove(part)
+        if os.path.isdir(path) and not os.listdir(path):
+            os.rmdir(path)
+
+
+def export(con, out_dir, names=None, fmt="parquet"):
+    """Write every dataset (or `names`) under `out_dir`. Returns {dataset: rows}."""
+    run = datetime.now().strftime("%Y%m%d%H%M%S")
+    return {name: write_dataset(con, name, out_dir, fmt=fmt, run=run) for name in names or DATASETS}
+
+
+# ──────────────────────────────────────────────────────────────
+# PRUNING
+# ──────────────────────────────────────────────────────────────
+
+def horizon(con, table):
+    """(pruned_before, archive_dir, pruned_at) for a pruned table, else None."""
+    return con.execute("SELECT pruned_before, archive_dir, pruned_at FROM archive_state WHERE table_name = ?",
+                       (table,)).fetchone()
+
+
+def prune(con, before, archive_dir=ARCHIVE_DIR, table="daily_diary"):
+    """
+    Archive and delete `table` rows dated before `before` (ISO date). Rows
+    already archived by an earlier prune are written again only if they were
+    restored since. Returns the number of rows moved.
+
+    Streaks and energy state are recomputed over the whole history before
+    and after (the archived days through rebuild_runs); a difference raises
+    RuntimeError, which rolls the prune back with the caller's transaction.
+    Whatever raises, the files this prune wrote are deleted again.
+    """
+    date_col = PRUNABLE[table]
+    before = str(before)
+    archive_dir = os.path.abspath(archive_dir)
+    state = horizon(con, table)
+    if state and state[1] != archive_dir:
+        raise RuntimeError(f"{table} is already archived under {state[1]}")
+    summaries = _summaries(con)
+    # to the microsecond, so a second prune in the same second neither overwrites the
+    # first's files nor ties with its copies of a row (newest archived_at wins)
+    started = datetime.now()
+    now = started.strftime("%Y-%m-%d %H:%M:%S.%f")
+    run = started.strftime("%Y%m%d%H%M%S%f")
+    try:
+        written = write_dataset(con, table, archive_dir, f"t.{date_col} < ?", (before,),
+                                extra={"archived_at": now}, run=run)
+        _datasets.clear()
+        deleted = con.execute(f"DELETE FROM {table} WHERE {date_col} < ?", (before,)).rowcount
+        if deleted != written:
+            raise RuntimeError(f"archived {written} {table} rows but {deleted} matched the delete")
+        con.execute("""
+            INSERT INTO archive_state(table_name, pruned_before, archive_dir, rows_archived, pruned_at)
+            VALUES(?, ?, ?, ?, ?)
+            ON CONFLICT(table_name) DO UPDATE SET
+                pruned_before = MAX(pruned_before, excluded.pruned_before), archive_dir = excluded.archive_dir,
+                rows_archived = rows_archived + excluded.rows_archived, pruned_at = excluded.pruned_at
+        """, (table, before, archive_dir, written, now))
+        rebuild_runs(con)
+        after = _summaries(con)
+        changed = sorted(u for u in set(summaries) | set(after) if summaries.get(u) != after.get(u))
+        if changed:
+            raise RuntimeError(f"pruning would change the streak / energy rows of {len(changed)} users "
+                               f"(e.g. {changed[0]}); nothing was archived")
+    except BaseException:
+        # rebuild_runs had to read them in place; left behind, every later read would too
+        _remove_run(os.path.join(archive_dir, table), run)
+        _datasets.clear()
+        raise
+    return written
+
+
+def _summaries(con):
+    """Freshly recomputed user_streaks and energy_state rows, by username (updated_at left out)."""
+    streaks.backfill(con)
+    energy.backfill(con)
+    out = {}
+    for table in ("user_streaks", "energy_state"):
+        cur = con.execute(f"SELECT * FROM {table}")
+        keep = [i for i, d in enumerate(cur.description) if d[0] != "updated_at"]
+        for row in cur:
+            out.setdefault(row[0], {})[table] = tuple(row[i] for i in keep)
+    return out
+
+
+def imported(row):
+    """
+    Whether an archived diary row is a wearable-only day: its imported flag,
+    or for rows archived before migration 15 added one, the rule that
+    migration used — nothing but steps / sleep.
+    """
+    if row.get("imported") is not None:
+        return bool(row["imported"])
+    return not any(v for c, v in row.items() if c not in _IMPORT_COLUMNS)
+
+
+def rebuild_runs(con):
+    """
+    Refill archived_diary_runs from the daily_diary archive (see stage()).
+    Returns the number of runs.
+    """
+    con.execute("DELETE FROM archived_diary_runs")
+    if not stage(con):
+        return 0
+    for kind, where in (("logged", "imported = 0"), ("diet", "diet_followed = 1")):
+        spans = ("SELECT username, julianday(entry_date) AS s, julianday(entry_date) AS e "
+                 f"FROM temp.archived_daily_diary WHERE {where}")
+        con.execute(f"""
+            INSERT INTO archived_diary_runs(username, kind, run_start, run_end)
+            SELECT username, '{kind}', run_start, run_end FROM ({streaks.runs_sql(spans)})
+        """)
+    return con.execute("SELECT COUNT(*) FROM archived_diary_runs").fetchone()[0]
+
+
+# ──────────────────────────────────────────────────────────────
+# READING ARCHIVED ROWS
+# ──────────────────────────────────────────────────────────────
+
+_datasets = {}   # (path, pruned_at) -> pyarrow Dataset
+
+
+def _dataset(state, table):
+    key = (os.path.join(state[1], table), state[2])
+    if key not in _datasets:
+        _require()
+        _datasets.clear()
+        partitioning = ds.partitioning(pa.schema([("year", pa.int32())]), flavor="hive")
+        dset = ds.dataset(key[0], format="parquet", partitioning=partitioning)
+        # files written before a column was added lack it: read it as null there
+        schema = pa.unify_schemas([dset.schema] + [f.physical_schema for f in dset.get_fragments()])
+        _datasets[key] = ds.dataset(key[0], schema=schema, format="parquet", partitioning=partitioning)
+    return _datasets[key]
+
+
+def read(con, table, username, start=None, end=None, columns=None):
+    """
+    Archived rows of `table` for `username` dated start..end (inclusive,
+    ISO dates; open ends allowed), oldest first, as dicts. When a row was
+    archived more than once the newest copy wins. [] if nothing is archived.
+    """
+    state = horizon(con, table)
+    if state is None or (start and str(start) >= state[0]) or not os.path.isdir(os.path.join(state[1], table)):
+        return []
+    date_col = PRUNABLE[table]
+    dset = _dataset(state, table)
+    f = ds.field("username") == username
+    if start:
+        f &= (ds.field("year") >= int(str(start)[:4])) & (ds.field(date_col) >= str(start))
+    if end:
+        f &= (ds.field("year") <= int(str(end)[:4])) & (ds.field(date_col) <= str(end))
+    wanted = None if columns is None else [c for c in dict.fromkeys([date_col, *columns, "archived_at"])
+                                           if c in dset.schema.names]   # newer columns: absent from the rows
+    rows = dset.to_table(columns=wanted, filter=f).to_pylist()
+    newest = {}
+    for r in sorted(rows, key=lambda r: r["archived_at"]):
+        newest[r[date_col]] = r
+    out = []
+    for day in sorted(newest):
+        r = newest[day]
+        r.pop("archived_at")
+        r.pop("year", None)
+        out.append(r if columns is None else {c: r[c] for c in wanted if c in r})
+    return out
+
+
+def stage(con, username=None):
+    """
+    Fill the TEMP table archived_daily_diary (daily_diary's columns plus
+    archived_at) with the newest archived copy of every diary row — of
+    `username`, or everyone — that is not back in the hot table, imported
+    filled in for rows archived before it existed. Set-based rebuilds read
+    it next to daily_diary. Returns the row count; the table is created
+    empty when nothing is archived.
+    """
+    con.execute("DROP TABLE IF EXISTS temp.archived_daily_diary")
+    con.execute("CREATE TEMP TABLE archived_daily_diary AS SELECT *, '' AS archived_at FROM main.daily_diary WHERE 0")
+    state = horizon(con, "daily_diary")
+    if state is None or not os.path.isdir(os.path.join(state[1], "daily_diary")):
+        return 0
+    cols = [r[1] for r in con.execute("PRAGMA temp.table_info(archived_daily_diary)")]
+    insert = f"INSERT INTO temp.archived_daily_diary({', '.join(cols)}) VALUES({', '.join('?' * len(cols))})"
+    dset = _dataset(state, "daily_diary")
+    for batch in dset.to_batches(filter=None if username is None else ds.field("username") == username):
+        rows = batch.to_pylist()
+        for r in rows:
+            r["imported"] = int(imported(r))
+        con.executemany(insert, [[r.get(c) for c in cols] for r in rows])
+    con.execute("CREATE INDEX temp.idx_archived_daily_diary ON archived_daily_diary(username, entry_date)")
+    con.execute("""
+        DELETE FROM temp.archived_daily_diary WHERE rowid IN (
+            SELECT a.rowid FROM temp.archived_daily_diary a
+            WHERE EXISTS (SELECT 1 FROM main.daily_diary d
+                          WHERE d.username = a.username AND d.entry_date = a.entry_date)
+               OR EXISTS (SELECT 1 FROM temp.archived_daily_diary b
+                          WHERE b.username = a.username AND b.entry_date = a.entry_date
+                            AND b.archived_at > a.archived_at))
+    """)
+    return con.execute("SELECT COUNT(*) FROM temp.archived_daily_diary").fetchone()[0]
+
+
+def merge(con, table, username, rows, start=None, end=None):
+    """
+    Hot `rows` (dicts) plus archived rows between start and end on days they
+    don't have, oldest first — or `rows` as given when nothing archived applies.
+    """
+    date_col = PRUNABLE[table]
+    archived = read(con, table, username, start, end)
+    if not archived:
+        return rows
+    have = {r[date_col] for r in rows}
+    return sorted(list(rows) + [r for r in archived if r[date_col] not in have], key=lambda r: r[date_col])
+
+
+def restore(con, table, username, days):
+    """
+    Put archived rows for `days` back into the hot table before they are
+    written to. Returns how many came back.
+    """
+    state = horizon(con, table)
+    days = sorted(d for d in days if state and d < state[0])
+    if not days:
+        return 0
+    wanted = set(days)
+    rows = [r for r in read(con, table, username, days[0], days[-1]) if r[PRUNABLE[table]] in wanted]
+    if not rows:
+        return 0
+    if table == "daily_diary":
+        for r in rows:
+            r["imported"] = int(imported(r))
+    cols = list(rows[0])
+    # NOT NULL columns added since the rows were archived come back as their default
+    defaults = {r[1]: r[4] for r in con.execute(f"PRAGMA table_info({table})") if r[3] and r[4] is not None}
+    values = ", ".join(f"COALESCE(?, {defaults[c]})" if c in defaults else "?" for c in cols)
+    con.executemany(
+        f"INSERT OR IGNORE INTO {table}({', '.join(cols)}) VALUES({values})",
+        [[r[c] for c in cols] for r in rows]
+    )
+    return len(rows)
+
+
+if __name__ == "__main__":
+    from database_pool import connect, transaction
+    from migrations import bootstrap
+
+    ap = argparse.ArgumentParser(description="Export history to columnar files or archive old diary rows.")
+    ap.add_argument("--db", default="routinex.db")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    e = sub.add_parser("export", help="write datasets to partitioned Parquet / Arrow files")
+    e.add_argument("--out", required=True)
+    e.add_argument("--format", choices=("parquet", "arrow"), default="parquet")
+    e.add_argument("--tables", nargs="+", choices=sorted(DATASETS))
+    p = sub.add_parser("prune", help="archive and delete diary rows past the retention horizon")
+    p.add_argument("--keep-days", type=int, default=DEFAULT_KEEP_DAYS)
+    p.add_argument("--dir", default=ARCHIVE_DIR)
+    sub.add_parser("status", help="show what has been archived")
+    args = ap.parse_args()
+
+    bootstrap(args.db)
+    if args.cmd == "export":
+        con = connect(args.db, readonly=True)
+        started = datetime.now()
+        counts = export(con, args.out, args.tables, args.format)
+        con.close()
+        secs = (datetime.now() - started).total_seconds()
+        for name, n in counts.items():
+            print(f"{name:<16} {n:>10,} rows")
+        print(f"Exported {sum(counts.values()):,} rows to {args.out} in {secs:.1f}s")
+    elif args.cmd == "prune":
+        before = (date.today() - timedelta(days=args.keep_days)).isoformat()
+        with transaction(args.db) as con:
+            n = prune(con, before, args.dir)
+        print(f"Archived {n:,} daily_diary rows dated before {before} to {os.path.abspath(args.dir)}")
+    else:
+        con = connect(args.db, readonly=True)
+        for row in con.execute("SELECT * FROM archive_state"):
+            print(" | ".join(str(v) for v in row))
+        con.close()
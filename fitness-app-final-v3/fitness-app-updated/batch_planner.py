@@ -0,0 +1,356 @@
+"""
+Batch Plan Generator for RoutineX
+Generates combined workout + weekly diet plans for a whole cohort from a
+CSV or NDJSON profile file, without going through the Streamlit forms.
+
+    python batch_planner.py cohort.csv --out plans.ndjson --save-db
+
+Profile columns (CSV header or NDJSON keys):
+    id, username, age, weight_kg, height_cm, gender, goal, experience,
+    duration_months, activity_level, diet_type, cuisine, meals_per_day,
+    allergies, injuries, medical_conditions, available_days, additional_info
+List columns (allergies, injuries, medical_conditions) are ';'-separated in CSV.
+
+Progress is checkpointed after every profile, so re-running the same command
+after an interruption skips everything already generated: a profile counts
+as done once its --out record or checkpoint line is written, and with
+--save-db its two plans are saved in one transaction that a resumed run
+won't repeat. Failed profiles are retried on every run; the failures file
+(plans.failed.ndjson above) is rewritten per run, so it lists exactly the
+ones still outstanding.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from engine.ai_handler import set_rate_limit
+from engine.nutrition import calculate_nutritional_needs
+from engine.scheduler import agenerate_workout_plan
+from engine.diet_generator_weekly import agenerate_weekly_diet_plan
+
+# Same mapping the combined planner form uses
+GOAL_TO_DIET_GOAL = {
+    "Fat Loss":    "fat_loss",
+    "Muscle Gain": "muscle_gain",
+    "Strength":    "muscle_gain",
+    "Endurance":   "endurance",
+    "Flexibility": "general_fitness",
+}
+
+LIST_FIELDS = ("allergies", "injuries", "medical_conditions")
+
+DEFAULTS = {
+    "gender": "Male",
+    "goal": "Fat Loss",
+    "experience": "Beginner",
+    "duration_months": 1,
+    "activity_level": "moderately_active",
+    "diet_type": "Omnivore",
+    "cuisine": "General",
+    "meals_per_day": 4,
+    "available_days": 4,
+    "additional_info": "",
+}
+
+
+# ──────────────────────────────────────────────────────────────
+# INPUT
+# ──────────────────────────────────────────────────────────────
+
+def read_profiles(path):
+    """Yield raw profile dicts from a .csv or .ndjson/.jsonl file."""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                yield {k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k}
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def normalize_profile(raw, line_no):
+    """Fill defaults and coerce types. Raises ValueError on unusable rows."""
+    p = {**DEFAULTS, **{k: v for k, v in raw.items() if v not in (None, "")}}
+    p["id"] = str(p.get("id") or p.get("username") or f"row-{line_no}")
+
+    for field in ("age", "weight_kg", "height_cm"):
+        if field not in p:
+            raise ValueError(f"missing '{field}'")
+    p["age"] = int(float(p["age"]))
+    p["weight_kg"] = float(p["weight_kg"])
+    p["height_cm"] = float(p["height_cm"])
+    p["duration_months"] = max(1, min(12, int(float(p["duration_months"]))))
+    p["meals_per_day"] = int(float(p["meals_per_day"]))
+    p["available_days"] = int(float(p["available_days"]))
+
+    for field in LIST_FIELDS:
+        value = p.get(field) or []
+        if isinstance(value, str):
+            value = [v.strip() for v in value.split(";")]
+        p[field] = [v for v in value if v and v != "None"]
+    return p
+
+
+# ──────────────────────────────────────────────────────────────
+# CHECKPOINT
+# ──────────────────────────────────────────────────────────────
+
+def load_checkpoint(*paths):
+    """Ids recorded in the checkpoint and --out files; a line cut off by a crash is ignored."""
+    done = set()
+    for path in paths:
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        done.add(json.loads(line)["id"])
+                    except (ValueError, KeyError):
+                        continue
+    return done
+
+
+def open_append(path):
+    cut = False
+    if os.path.exists(path) and os.path.getsize(path):
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            cut = f.read(1) != b"\n"
+    f = open(path, "a", encoding="utf-8")
+    if cut:
+        f.write("\n")   # don't glue the next record onto a line cut off by a crash
+    return f
+
+
+# ──────────────────────────────────────────────────────────────
+# GENERATION
+# ──────────────────────────────────────────────────────────────
+
+async def generate_for_profile(p, adaptive=None):
+    """
+    Workout + diet for one profile, generated concurrently. `adaptive` is the
+    user's energy summary (see database_tracker.get_energy_summary), if known.
+    """
+    profile_workout = {
+        "age": p["age"],
+        "weight": p["weight_kg"],
+        "height": p["height_cm"],
+        "experience": p["experience"],
+        "gender": p["gender"],
+        "available_days": p["available_days"],
+        "medical_conditions": p["medical_conditions"],
+        "injuries": p["injuries"],
+    }
+    nutri_profile = {
+        "weight_kg": p["weight_kg"],
+        "height_cm": p["height_cm"],
+        "age": p["age"],
+        "gender": p["gender"],
+    }
+    gen_profile = {
+        "diet_type": p["diet_type"],
+        "cuisine": p["cuisine"],
+        "region": p["cuisine"],
+        "allergies": p["allergies"],
+        "meals_per_day": p["meals_per_day"],
+    }
+    diet_goal = GOAL_TO_DIET_GOAL.get(p["goal"], "general_fitness")
+    targets = calculate_nutritional_needs(nutri_profile, diet_goal, p["activity_level"], adaptive)
+
+    workout, diet = await asyncio.gather(
+        agenerate_workout_plan(profile_workout, p["goal"], p["duration_months"], p["additional_info"]),
+        agenerate_weekly_diet_plan(targets, gen_profile),
+    )
+    return targets, workout, diet
+
+
+def save_to_db(p, targets, workout, diet, activate, batch):
+    """Both plans in one transaction; False if `batch` had already saved this profile."""
+    from database_tracker import save_batch_plans
+    return save_batch_plans(
+        p["username"], batch, p["id"],
+        workout={
+            "plan_name": f"{p['goal']} – {p['duration_months']} months",
+            "goal": p["goal"],
+            "duration_months": p["duration_months"],
+            "plan_data": workout,
+        },
+        diet={
+            "plan_name": f"{p['goal']} Diet – {p['diet_type']}",
+            "goal": p["goal"],
+            "calories": targets["calories"],
+            "plan_data": diet,
+        },
+        set_active=activate,
+    )
+
+
+class BatchRun:
+    def __init__(self, args):
+        self.args = args
+        self.done = load_checkpoint(args.checkpoint, args.out)
+        self.out = open_append(args.out) if args.out else None
+        self.failures = open(args.failures, "w", encoding="utf-8")
+        self.ckpt = open_append(args.checkpoint)
+        self.ok = 0
+        self.failed = 0
+        self.skipped = 0
+        self.started = time.monotonic()
+
+    def close(self):
+        if self.out:
+            self.out.close()
+        self.failures.close()
+        self.ckpt.close()
+
+    def rate(self):
+        minutes = (time.monotonic() - self.started) / 60
+        return self.ok / minutes if minutes > 0 else 0.0
+
+    def emit(self, record):
+        # Failures are retried on resume, so they go to the per-run failures
+        # file instead of accumulating in --out.
+        f = self.failures if "error" in record else self.out
+        if f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+
+    def mark_done(self, profile_id):
+        # Only successes are checkpointed, so failed rows are retried on resume.
+        self.ckpt.write(json.dumps({"id": profile_id, "at": datetime.now().isoformat(timespec="seconds")}) + "\n")
+        self.ckpt.flush()
+
+    async def process(self, p):
+        adaptive = None
+        if self.args.save_db:
+            # Existing users: correct the formula with their logged weight trend
+            from database_tracker import get_energy_summary
+            adaptive = await asyncio.to_thread(get_energy_summary, p["username"])
+        targets, workout, diet = await generate_for_profile(p, adaptive)
+        errors = {k: v for k, v in (("workout", workout), ("diet", diet)) if "error" in v}
+        record = {"id": p["id"], "username": p.get("username"), "targets": targets}
+
+        if errors:
+            self.failed += 1
+            record["error"] = {k: v.get("error") for k, v in errors.items()}
+            self.emit(record)
+            print(f"  ✗ {p['id']}: {record['error']}")
+            return
+
+        if self.args.save_db:
+            saved = await asyncio.to_thread(save_to_db, p, targets, workout, diet, not self.args.no_activate,
+                                            os.path.abspath(self.args.checkpoint))
+            if not saved:
+                print(f"  · {p['id']}: plans already saved by this batch, kept those")
+        record.update(workout=workout, diet=diet)
+        # The --out record doubles as the checkpoint (load_checkpoint reads both),
+        # so a crash between the two writes can't duplicate it on resume.
+        self.emit(record)
+        self.mark_done(p["id"])
+        self.ok += 1
+
+    async def worker(self, queue):
+        while True:
+            p = await queue.get()
+            try:
+                await self.process(p)
+            except Exception as e:
+                self.failed += 1
+                self.emit({"id": p["id"], "error": f"unexpected: {e}"})
+                print(f"  ✗ {p['id']}: {e}")
+            finally:
+                queue.task_done()
+
+    async def reporter(self):
+        while True:
+            await asyncio.sleep(self.args.report_every)
+            print(f"  … {self.ok} ok / {self.failed} failed — {self.rate():.1f} plans/min")
+
+    async def run(self, profiles):
+        # Bounded queue keeps memory flat no matter how large the input is.
+        queue = asyncio.Queue(maxsize=self.args.concurrency * 2)
+        workers = [asyncio.create_task(self.worker(queue)) for _ in range(self.args.concurrency)]
+        reporter = asyncio.create_task(self.reporter())
+
+        for line_no, raw in enumerate(profiles, start=1):
+            try:
+                p = normalize_profile(raw, line_no)
+            except (ValueError, TypeError) as e:
+                self.failed += 1
+                self.emit({"id": raw.get("id") or f"row-{line_no}", "error": f"invalid profile: {e}"})
+                print(f"  ✗ row {line_no}: invalid profile ({e})")
+                continue
+            if p["id"] in self.done:
+                self.skipped += 1
+                continue
+            if self.args.save_db and not p.get("username"):
+                self.failed += 1
+                self.emit({"id": p["id"], "error": "username is required with --save-db"})
+                continue
+            await queue.put(p)
+
+        await queue.join()
+        for w in workers + [reporter]:
+            w.cancel()
+        await asyncio.gather(*workers, reporter, return_exceptions=True)
+
+
+# ──────────────────────────────────────────────────────────────
+# CLI
+# ──────────────────────────────────────────────────────────────
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Bulk-generate RoutineX workout + diet plans.")
+    ap.add_argument("profiles", help="CSV or NDJSON file with one profile per row")
+    ap.add_argument("--out", help="append generated plans as NDJSON to this file")
+    ap.add_argument("--save-db", action="store_true",
+                    help="store plans in saved_workout_plans / saved_diet_plans (needs a username column)")
+    ap.add_argument("--no-activate", action="store_true", help="save plans without making them active")
+    ap.add_argument("--concurrency", type=int, default=8, help="profiles generated in parallel (default 8)")
+    ap.add_argument("--rpm", type=int, default=60, help="max LLM calls started per minute, 0 = unlimited (default 60)")
+    ap.add_argument("--failures", help="failed profiles of this run, rewritten each run "
+                                       "(default: <out or profiles>.failed.ndjson)")
+    ap.add_argument("--checkpoint", help="progress file (default: <profiles>.checkpoint)")
+    ap.add_argument("--report-every", type=float, default=30, help="seconds between progress lines")
+    args = ap.parse_args(argv)
+    if not args.out and not args.save_db:
+        ap.error("nothing to do: pass --out and/or --save-db")
+    args.checkpoint = args.checkpoint or args.profiles + ".checkpoint"
+    args.failures = args.failures or os.path.splitext(args.out or args.profiles)[0] + ".failed.ndjson"
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    set_rate_limit(args.rpm)
+    if args.save_db:
+        from database_tracker import init_tracker_db
+        init_tracker_db()
+
+    run = BatchRun(args)
+    print(f"RoutineX batch: {args.profiles} (concurrency {args.concurrency}, {args.rpm or '∞'} calls/min)")
+    if run.done:
+        print(f"Resuming — {len(run.done)} profiles already done")
+    try:
+        asyncio.run(run.run(read_profiles(args.profiles)))
+    except KeyboardInterrupt:
+        print("\nInterrupted — re-run the same command to resume.")
+    finally:
+        run.close()
+
+    elapsed = time.monotonic() - run.started
+    print(f"Done: {run.ok} generated, {run.failed} failed, {run.skipped} skipped "
+          f"in {elapsed:.0f}s — {run.rate():.1f} plans/min")
+    return 0 if run.failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,320 @@
+"""
+cohorts.py
+Cross-user analytics for the admin dashboard: daily / weekly / monthly
+active users, weekly check-in retention by first-check-in cohort, the
+workout plan funnel (saved → activated → scheduled → trained → adherent) and
+average mood / sleep / energy by goal type.
+
+Everything is computed with set-based SQL over indexed ranges — daily_diary
+check-ins by (entry_date, username), the diary_rollups period index,
+workout_calendar by date — and stored in small summary tables. Days only a
+wearable import wrote (imported = 1, days_logged 0 in the rollups) don't
+make anyone active:
+
+    cohort_activity(period, period_start, active_users)    'day' | 'week' | 'month'
+    cohort_members(username, cohort_week)                  week of the first check-in
+    cohort_retention(cohort_week, active_week, users)
+    cohort_funnel(as_of, position, stage, users)           one snapshot per day
+    cohort_goal_stats(as_of, goal_type, users, ...)        one snapshot per day
+    cohort_refresh(id, refreshed_at, refreshed_on)
+
+refresh() is incremental: it re-derives the cohort of users whose streak row
+changed since the previous refresh, recounts only periods from LOOKBACK_DAYS
+before it (or from the earliest cohort week that moved, e.g. after a bulk
+import), and adds the funnel / goal snapshots for yesterday (the last
+complete day) if they are missing. The first refresh builds everything from
+history. Diary edits older than the lookback are picked up by a rebuild.
+
+    python cohorts.py refresh
+    python cohorts.py rebuild
+
+Every function takes an open connection so it runs inside the caller's
+transaction (database_tracker and migrations).
+"""
+
+import argparse
+from datetime import date, timedelta
+
+from rollups import period_start
+
+LOOKBACK_DAYS = 7            # diary days can still be back-filled this far after the fact
+DAY_HISTORY_DAYS = 400       # daily counts are kept this far back
+REFRESH_S = 300              # refresh() is a no-op when the last one is newer than this
+ADHERENCE_DAYS = 28          # funnel window for the scheduled / trained / adherent stages
+ADHERENT_SHARE = 0.5         # share of planned workouts done to count as adherent
+GOAL_MONTHS = 3              # calendar months (incl. the current one) behind the goal stats
+
+FUNNEL_STAGES = [
+    ("signed_up", "Signed up"),
+    ("saved_plan", "Saved a workout plan"),
+    ("activated", "Activated a plan"),
+    ("scheduled", f"Had workouts scheduled (last {ADHERENCE_DAYS}d)"),
+    ("trained", "Logged a planned workout"),
+    ("adherent", f"Did ≥ {ADHERENT_SHARE:.0%} of planned workouts"),
+]
+
+
+# ──────────────────────────────────────────────────────────────
+# REFRESH
+# ──────────────────────────────────────────────────────────────
+
+def _activity(con, since, today):
+    """Recount active users per day / week / month from `since` (None: all history) on."""
+    day_since = max(since or "", (date.fromisoformat(today) - timedelta(days=DAY_HISTORY_DAYS)).isoformat())
+    con.execute("DELETE FROM cohort_activity WHERE period = 'day' AND period_start >= ?", (day_since,))
+    con.execute("""
+        INSERT INTO cohort_activity(period, period_start, active_users)
+        SELECT 'day', entry_date, COUNT(*) FROM daily_diary
+        WHERE entry_date >= ? AND imported = 0 GROUP BY entry_date
+    """, (day_since,))
+    for p in ("week", "month"):
+        start = period_start(p, since) if since else ""
+        con.execute("DELETE FROM cohort_activity WHERE period = ? AND period_start >= ?", (p, start))
+        con.execute("""
+            INSERT INTO cohort_activity(period, period_start, active_users)
+            SELECT period, period_start, COUNT(*) FROM diary_rollups
+            WHERE period = ? AND period_start >= ? AND days_logged > 0
+            GROUP BY period_start
+        """, (p, start))
+
+
+def _members(con, changed_since):
+    """
+    Re-derive the cohort week of users whose streak row changed since
+    `changed_since` (everyone when None). Returns the earliest cohort week
+    that moved, or None.
+    """
+    where, args = ("WHERE s.updated_at >= ?", (changed_since,)) if changed_since else ("", ())
+    rows = con.execute(f"""
+        SELECT username, first_week, old_week FROM (
+            SELECT s.username,
+                   (SELECT MIN(r.period_start) FROM diary_rollups r
+                     WHERE r.username = s.username AND r.period = 'week' AND r.days_logged > 0) AS first_week,
+                   m.cohort_week AS old_week
+            FROM user_streaks s LEFT JOIN cohort_members m ON m.username = s.username
+            {where}
+        ) WHERE first_week IS NOT NULL AND first_week IS NOT old_week
+    """, args).fetchall()
+    con.executemany("""
+        INSERT INTO cohort_members(username, cohort_week) VALUES(?, ?)
+        ON CONFLICT(username) DO UPDATE SET cohort_week = excluded.cohort_week
+    """, [(r[0], r[1]) for r in rows])
+    weeks = [w for r in rows for w in (r[1], r[2]) if w]
+    return min(weeks) if weeks else None
+
+
+def _retention(con, since_week):
+    """Recount cohort x active-week users for active weeks from `since_week` on."""
+    start = since_week or ""
+    con.execute("DELETE FROM cohort_retention WHERE active_week >= ?", (start,))
+    con.execute("""
+        INSERT INTO cohort_retention(cohort_week, active_week, users)
+        SELECT m.cohort_week, r.period_start, COUNT(*)
+        FROM diary_rollups r JOIN cohort_members m ON m.username = r.username
+        WHERE r.period = 'week' AND r.period_start >= ? AND r.days_logged > 0
+        GROUP BY m.cohort_week, r.period_start
+    """, (start,))
+
+
+def _funnel(con, as_of):
+    lo = (date.fromisoformat(as_of) - timedelta(days=ADHERENCE_DAYS - 1)).isoformat()
+    signed_up = con.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    saved, activated = con.execute("""
+        SELECT COUNT(DISTINCT username), COUNT(DISTINCT CASE WHEN started_on IS NOT NULL THEN username END)
+        FROM saved_workout_plans WHERE created_at < ?
+    """, ((date.fromisoformat(as_of) + timedelta(days=1)).isoformat(),)).fetchone()
+    scheduled, trained, adherent = con.execute("""
+        SELECT COUNT(*), COALESCE(SUM(done > 0), 0), COALESCE(SUM(done >= ? * planned), 0)
+        FROM (SELECT c.username, COUNT(*) AS planned, SUM(COALESCE(d.workout_done, 0) = 1) AS done
+              FROM workout_calendar c
+              LEFT JOIN daily_diary d ON d.username = c.username AND d.entry_date = c.cal_date
+              WHERE c.cal_date BETWEEN ? AND ? AND c.day_id IS NOT NULL
+              GROUP BY c.username)
+    """, (ADHERENT_SHARE, lo, as_of)).fetchone()
+    counts = (signed_up, saved, activated, scheduled, trained, adherent)
+    con.executemany(
+        "INSERT OR REPLACE INTO cohort_funnel(as_of, position, stage, users) VALUES(?, ?, ?, ?)",
+        [(as_of, i, stage, n) for i, ((stage, _), n) in enumerate(zip(FUNNEL_STAGES, counts))]
+    )
+
+
+def _goal_stats(con, as_of):
+    first = date.fromisoformat(as_of).replace(day=1)
+    for _ in range(GOAL_MONTHS - 1):
+        first = (first - timedelta(days=1)).replace(day=1)
+    con.execute("DELETE FROM cohort_goal_stats WHERE as_of = ?", (as_of,))
+    # Sum each user's months first, then look up their newest active goal once.
+    con.execute("""
+        INSERT INTO cohort_goal_stats(as_of, goal_type, users, days_logged, avg_mood, avg_sleep, avg_energy)
+        SELECT ?, COALESCE(goal_type, 'none'), COUNT(*), SUM(days),
+               ROUND(SUM(mood_sum) / NULLIF(SUM(mood_n), 0), 2),
+               ROUND(SUM(sleep_sum) / NULLIF(SUM(sleep_n), 0), 2),
+               ROUND(SUM(energy_sum) / NULLIF(SUM(energy_n), 0), 2)
+        FROM (SELECT r.username, SUM(r.days_logged) AS days,
+                     SUM(r.mood_sum) AS mood_sum, SUM(r.mood_n) AS mood_n,
+                     SUM(r.sleep_sum) AS sleep_sum, SUM(r.sleep_n) AS sleep_n,
+                     SUM(r.energy_sum) AS energy_sum, SUM(r.energy_n) AS energy_n,
+                     (SELECT g.goal_type FROM user_goals g
+                       WHERE g.username = r.username AND g.is_active = 1
+                       ORDER BY g.created_at DESC LIMIT 1) AS goal_type
+              FROM diary_rollups r
+              WHERE r.period = 'month' AND r.period_start BETWEEN ? AND ?
+              GROUP BY r.username HAVING days > 0)
+        GROUP BY COALESCE(goal_type, 'none')
+    """, (as_of, first.isoformat(), as_of))
+
+
+def _today(con):
+    return con.execute("SELECT date('now', 'localtime')").fetchone()[0]
+
+
+def due(con):
+    """Whether the last refresh is REFRESH_S or more old (a read; refresh() checks again)."""
+    return bool(con.execute(
+        "SELECT COALESCE(MAX((julianday('now', 'localtime') - julianday(refreshed_at)) * 86400 >= ?), 1) "
+        "FROM cohort_refresh WHERE id = 1", (REFRESH_S,)
+    ).fetchone()[0])
+
+
+def refresh(con, today=None, force=False):
+    """
+    Bring every summary table up to date (see the module docstring).
+    Returns False without doing anything when the last refresh is less than
+    REFRESH_S old and `force` is not set.
+    """
+    if not force and not due(con):
+        return False
+    last = con.execute("SELECT refreshed_at, refreshed_on FROM cohort_refresh WHERE id = 1").fetchone()
+    today = str(today or _today(con))
+    started = con.execute("SELECT datetime('now', 'localtime')").fetchone()[0]
+    since = None
+    if last:
+        since = (date.fromisoformat(min(last[1], today)) - timedelta(days=LOOKBACK_DAYS)).isoformat()
+    moved = _members(con, last[0] if last else None)
+    if since and moved:
+        since = min(since, moved)         # a new or moved cohort brings older weeks with it
+    _activity(con, since, today)
+    _retention(con, period_start("week", since) if since else None)
+    as_of = (date.fromisoformat(today) - timedelta(days=1)).isoformat()
+    if not con.execute("SELECT 1 FROM cohort_funnel WHERE as_of = ?", (as_of,)).fetchone():
+        _funnel(con, as_of)
+        _goal_stats(con, as_of)
+    con.execute("""
+        INSERT INTO cohort_refresh(id, refreshed_at, refreshed_on) VALUES(1, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET refreshed_at = excluded.refreshed_at, refreshed_on = excluded.refreshed_on
+    """, (started, today))
+    return True
+
+
+def rebuild(con, today=None):
+    """Drop every summary row and build them again from history."""
+    for table in ("cohort_activity", "cohort_members", "cohort_retention",
+                  "cohort_funnel", "cohort_goal_stats", "cohort_refresh"):
+        con.execute(f"DELETE FROM {table}")
+    refresh(con, today, force=True)
+
+
+# ──────────────────────────────────────────────────────────────
+# READ-SIDE
+# ──────────────────────────────────────────────────────────────
+
+def activity(con, period, since):
+    """[{"period_start", "active_users"}, ...] oldest first, for periods starting on/after `since`."""
+    rows = con.execute("""
+        SELECT period_start, active_users FROM cohort_activity
+        WHERE period = ? AND period_start >= ? ORDER BY period_start
+    """, (period, str(since))).fetchall()
+    return [{"period_start": r[0], "active_users": r[1]} for r in rows]
+
+
+def retention(con, cohorts=12, weeks=12):
+    """
+    The newest `cohorts` weekly cohorts, oldest first, each
+    {"cohort_week", "size", "retention": [% of the cohort active in week 0, 1, …]}
+    for up to `weeks` weeks (fewer for cohorts that are younger).
+    """
+    starts = [r[0] for r in con.execute(
+        "SELECT DISTINCT cohort_week FROM cohort_retention ORDER BY cohort_week DESC LIMIT ?", (cohorts,)
+    )]
+    if not starts:
+        return []
+    out = {w: {"cohort_week": w, "size": 0, "retention": []} for w in reversed(starts)}
+    for cohort_week, active_week, users in con.execute("""
+        SELECT cohort_week, active_week, users FROM cohort_retention
+        WHERE cohort_week >= ? ORDER BY cohort_week, active_week
+    """, (min(starts),)):
+        offset = (date.fromisoformat(active_week) - date.fromisoformat(cohort_week)).days // 7
+        c = out[cohort_week]
+        if offset == 0:
+            c["size"] = users
+        if offset < weeks and c["size"]:
+            c["retention"] += [0.0] * (offset - len(c["retention"]))
+            c["retention"].append(round(100 * users / c["size"], 1))
+    return list(out.values())
+
+
+def retention_curve(cohorts):
+    """Size-weighted average of retention() rows, per week offset."""
+    curve = []
+    for k in range(max((len(c["retention"]) for c in cohorts), default=0)):
+        rows = [c for c in cohorts if len(c["retention"]) > k]
+        size = sum(c["size"] for c in rows)
+        curve.append(round(sum(c["retention"][k] * c["size"] for c in rows) / size, 1) if size else None)
+    return curve
+
+
+def funnel(con, as_of=None):
+    """The newest funnel snapshot (or the one for `as_of`): [{"stage", "label", "users"}, ...]."""
+    as_of = as_of or con.execute("SELECT MAX(as_of) FROM cohort_funnel").fetchone()[0]
+    labels = dict(FUNNEL_STAGES)
+    rows = con.execute("SELECT stage, users FROM cohort_funnel WHERE as_of = ? ORDER BY position",
+                       (as_of,)).fetchall()
+    return [{"stage": r[0], "label": labels.get(r[0], r[0]), "users": r[1]} for r in rows]
+
+
+def goal_stats(con, as_of=None):
+    """The newest per-goal-type averages (or the ones for `as_of`), largest group first."""
+    as_of = as_of or con.execute("SELECT MAX(as_of) FROM cohort_goal_stats").fetchone()[0]
+    cols = ("goal_type", "users", "days_logged", "avg_mood", "avg_sleep", "avg_energy")
+    rows = con.execute(f"SELECT {', '.join(cols)} FROM cohort_goal_stats WHERE as_of = ? ORDER BY users DESC",
+                       (as_of,)).fetchall()
+    return [dict(zip(cols, r)) for r in rows]
+
+
+def report(con, days=90, cohorts=12, weeks=12, today=None):
+    """Everything the admin page shows, from the summary tables only."""
+    today = date.fromisoformat(str(today or _today(con)))
+    since = today - timedelta(days=days - 1)
+    refreshed = con.execute("SELECT refreshed_at FROM cohort_refresh WHERE id = 1").fetchone()
+    rows = retention(con, cohorts, weeks)
+    funnel_rows = funnel(con)
+    return {
+        "refreshed_at": refreshed[0] if refreshed else None,
+        "dau": activity(con, "day", since),
+        "wau": activity(con, "week", period_start("week", since)),
+        "mau": activity(con, "month", period_start("month", since)),
+        "retention": rows,
+        "retention_curve": retention_curve(rows),
+        "funnel": funnel_rows,
+        "goal_stats": goal_stats(con),
+    }
+
+
+if __name__ == "__main__":
+    from database_pool import transaction
+    from migrations import bootstrap
+
+    ap = argparse.ArgumentParser(description="Refresh or rebuild the cross-user analytics tables.")
+    ap.add_argument("--db", default="routinex.db")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("refresh", help="recount recent periods and add today's snapshots")
+    sub.add_parser("rebuild", help="rebuild every summary table from history")
+    args = ap.parse_args()
+
+    bootstrap(args.db)
+    with transaction(args.db) as con:
+        if args.cmd == "rebuild":
+            rebuild(con)
+        else:
+            refresh(con, force=True)
+    print(f"Cohort analytics {args.cmd} done")
@@ -385,7 +385,6 @@ def render_workout_results(plan_data: dict, user):
 
     # Activate for check-in
     if user:
-        from database_extended import save_workout_for_checkin
         from database_tracker import save_workout_plan
         st.markdown("---")
         col1, col2, col3 = st.columns([1, 2, 1])
@@ -396,21 +395,15 @@ def render_workout_results(plan_data: dict, user):
                 months_key = st.session_state.get("combo_months", 1)
                 plan_name = f"{goal_key} – {months_key} months"
                 schedule = plan_data.get("schedule", [])
-                # Old checkin system
-                save_workout_for_checkin(
-                    username=user,
-                    workout_data=plan_data,
-                    plan_name=plan_name,
-                    duration_weeks=len(schedule)
-                )
-                # New tracker DB
+                # One write: the Daily Check-in reads the active saved plan
                 save_workout_plan(
                     username=user,
                     plan_name=plan_name,
                     goal=goal_key,
                     duration_months=months_key,
                     plan_data=plan_data,
-                    set_active=True
+                    set_active=True,
+                    duration_weeks=len(schedule)
                 )
                 st.success("🎉 Workout activated!")
     else:
@@ -710,7 +703,9 @@ def render_combined_planner(user=None):
         # ── NUTRITION CALC ───────────────────────────────────
         with progress_col2:
             with st.spinner("🔬 Calculating nutritional targets…"):
-                targets = calculate_nutritional_needs(nutri_profile, diet_goal_key, activity_level)
+                from database_tracker import get_energy_summary
+                adaptive = get_energy_summary(user) if user else None
+                targets = calculate_nutritional_needs(nutri_profile, diet_goal_key, activity_level, adaptive)
 
         # ── WEEKLY DIET ──────────────────────────────────────
         with st.spinner("🥗 AI Chef crafting your 7-day meal plan…"):
@@ -0,0 +1,184 @@
+"""
+content_pool.py
+Pre-generated affirmation pool for the Mind Reset tab.
+
+Affirmations are batch-generated (hundreds per AI call), deduplicated,
+tagged by mood/theme and stored in SQLite. The "New Thought" button is served
+straight from the pool; when the number of never-served affirmations drops
+below LOW_WATERMARK a background thread refills it up to HIGH_WATERMARK.
+
+    python content_pool.py refill --target 500    # pre-fill from the CLI
+    python content_pool.py stats
+"""
+
+import argparse
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from database_pool import connect
+from migrations import bootstrap
+from engine.ai_handler import run_sync
+from engine.coach import agenerate_affirmation_batch, DEFAULT_AFFIRMATION
+from engine.telemetry import record_llm_call, FEATURE_AFFIRMATION, OUTCOME_OK
+
+DB_NAME = "routinex.db"
+
+LOW_WATERMARK = 50      # unserved affirmations left before a refill starts
+HIGH_WATERMARK = 300    # refill target
+BATCH_SIZE = 200        # affirmations requested per AI call
+MAX_EMPTY_BATCHES = 3   # give up a refill after this many calls add nothing
+
+_refill_lock = threading.Lock()
+_refilling = threading.Event()
+
+
+def _conn():
+    return connect(DB_NAME, row_factory=sqlite3.Row)
+
+
+def init_pool_db():
+    bootstrap(DB_NAME)
+
+
+def _text_key(text):
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", "", text.lower())).strip()
+
+
+# ──────────────────────────────────────────────────────────────
+# STORE
+# ──────────────────────────────────────────────────────────────
+
+def add_affirmations(items):
+    """Insert tagged affirmations, skipping duplicates. Returns how many were new."""
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows = [(i["text"], _text_key(i["text"]), i.get("mood"), i.get("theme"), now)
+            for i in items if _text_key(i["text"])]
+    con = _conn()
+    before = con.total_changes
+    con.executemany("""
+        INSERT OR IGNORE INTO affirmation_pool(text,text_key,mood,theme,created_at)
+        VALUES(?,?,?,?,?)
+    """, rows)
+    added = con.total_changes - before
+    con.commit(); con.close()
+    return added
+
+
+def count_unserved(mood=None):
+    con = _conn()
+    if mood:
+        row = con.execute(
+            "SELECT COUNT(*) FROM affirmation_pool WHERE served_count=0 AND mood=?", (mood,)
+        ).fetchone()
+    else:
+        row = con.execute("SELECT COUNT(*) FROM affirmation_pool WHERE served_count=0").fetchone()
+    con.close()
+    return row[0]
+
+
+def get_pool_stats():
+    con = _conn()
+    rows = con.execute("""
+        SELECT COALESCE(mood, '—') AS mood, COUNT(*) AS total,
+               SUM(served_count = 0) AS unserved, SUM(served_count) AS served
+        FROM affirmation_pool GROUP BY mood ORDER BY mood
+    """).fetchall()
+    con.close()
+    return [dict(r) for r in rows]
+
+
+# ──────────────────────────────────────────────────────────────
+# SERVE
+# ──────────────────────────────────────────────────────────────
+
+def serve_affirmation(mood=None):
+    """
+    Least-served affirmation for `mood` (any mood if none are tagged with it),
+    picked at random among ties. Never calls the AI; may start a background refill.
+    """
+    started = time.perf_counter()
+    con = _conn()
+    row = None
+    for m in ([mood] if mood else []) + [None]:
+        where, args = ("WHERE mood=?", (m,)) if m else ("", ())
+        row = con.execute(f"""
+            SELECT id, text FROM affirmation_pool {where}
+            ORDER BY served_count ASC, RANDOM() LIMIT 1
+        """, args).fetchone()
+        if row:
+            break
+    if row:
+        con.execute(
+            "UPDATE affirmation_pool SET served_count=served_count+1, last_served_at=? WHERE id=?",
+            (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), row["id"])
+        )
+        con.commit()
+    con.close()
+
+    maybe_refill()
+    if not row:
+        return DEFAULT_AFFIRMATION
+    record_llm_call(FEATURE_AFFIRMATION, OUTCOME_OK, provider="pool", cache_hit=True,
+                    latency_ms=(time.perf_counter() - started) * 1000)
+    return row["text"]
+
+
+# ──────────────────────────────────────────────────────────────
+# REFILL
+# ──────────────────────────────────────────────────────────────
+
+async def arefill_pool(target=HIGH_WATERMARK, batch_size=BATCH_SIZE):
+    """Generate batches until at least `target` affirmations are unserved."""
+    added_total = 0
+    empty_batches = 0
+    while count_unserved() < target and empty_batches < MAX_EMPTY_BATCHES:
+        items = await agenerate_affirmation_batch(batch_size)
+        added = add_affirmations(items) if items else 0
+        added_total += added
+        empty_batches = empty_batches + 1 if added == 0 else 0
+    return added_total
+
+
+def maybe_refill(low=LOW_WATERMARK, target=HIGH_WATERMARK):
+    """Start a background refill if the pool is below the watermark. Returns immediately."""
+    if _refilling.is_set() or count_unserved() >= low:
+        return False
+    with _refill_lock:
+        if _refilling.is_set():
+            return False
+        _refilling.set()
+
+    def _run():
+        try:
+            run_sync(arefill_pool(target))
+        except Exception as e:
+            print(f"Affirmation pool refill failed: {e}")
+        finally:
+            _refilling.clear()
+
+    threading.Thread(target=_run, name="affirmation-refill", daemon=True).start()
+    return True
+
+
+# ──────────────────────────────────────────────────────────────
+# CLI
+# ──────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Manage the Mind Reset affirmation pool.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("refill", help="generate until the pool has --target unserved affirmations")
+    r.add_argument("--target", type=int, default=HIGH_WATERMARK)
+    r.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    sub.add_parser("stats", help="show pool size per mood")
+    args = ap.parse_args()
+
+    init_pool_db()
+    if args.cmd == "refill":
+        added = run_sync(arefill_pool(args.target, args.batch_size))
+        print(f"Added {added} affirmations ({count_unserved()} unserved)")
+    for s in get_pool_stats():
+        print(f"{s['mood']:<8} total={s['total']:<5} unserved={s['unserved']:<5} served={s['served']}")
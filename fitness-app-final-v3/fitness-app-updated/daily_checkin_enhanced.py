@@ -1,11 +1,11 @@
 import streamlit as st
 from datetime import datetime, timedelta
-from database_extended import (
-    get_active_workout,
+from database_tracker import (
+    get_today_workout,
     save_daily_checkin,
     get_daily_checkin,
     get_checkin_history,
-    get_streak_count
+    get_streak
 )
 
 def show_daily_checkin_enhanced():
@@ -209,7 +209,7 @@ def show_daily_checkin_enhanced():
     """.format(datetime.now().strftime('%A, %B %d, %Y')), unsafe_allow_html=True)
     
     # Get data for stats
-    streak = get_streak_count(username)
+    streak = get_streak(username)
     history = get_checkin_history(username, limit=7)
     
     if history:
@@ -251,61 +251,27 @@ def show_daily_checkin_enhanced():
     """, unsafe_allow_html=True)
     
     # Active Workout Section
-    active_workout = get_active_workout(username)
+    todays_workout = get_today_workout(username)
     
-    if active_workout:
+    if todays_workout:
         with st.expander("💪 Today's Workout Plan", expanded=True):
-            st.markdown(f"**{active_workout['plan_name']}**")
-            st.caption(f"Started: {active_workout['created_at'][:10]}")
+            st.markdown(f"**{todays_workout['plan_name']}**")
+            if todays_workout['started_on']:
+                st.caption(f"Started: {todays_workout['started_on']}")
             
-            # Display today's exercises
-            workout_data = active_workout['workout_data']
-            
-            # Calculate which week and day we're in
-            start_date = datetime.strptime(active_workout['created_at'][:10], "%Y-%m-%d")
-            days_elapsed = (datetime.now() - start_date).days
-            week_num = days_elapsed // 7
-            day_of_week = datetime.now().weekday()  # 0 = Monday
-            
-            st.markdown(f"**Week {week_num + 1}, Day {day_of_week + 1}**")
-            
-            # Try to find today's workout from the schedule
-            exercises_found = False
-            
-            if 'schedule' in workout_data and isinstance(workout_data['schedule'], list):
-                # Check if we have data for the current week
-                if week_num < len(workout_data['schedule']):
-                    week_data = workout_data['schedule'][week_num]
-                    
-                    # The week_data should have 'workouts' which is a list of daily workouts
-                    if isinstance(week_data, dict) and 'workouts' in week_data:
-                        workouts = week_data['workouts']
-                        
-                        # Find today's workout by matching day name
-                        day_names = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
-                        today_name = day_names[day_of_week]
-                        
-                        for day_workout in workouts:
-                            if isinstance(day_workout, dict):
-                                day_key = day_workout.get('day', '').lower()
-                                
-                                # Match today's day
-                                if today_name in day_key:
-                                    exercises = day_workout.get('exercises', [])
-                                    
-                                    if exercises and len(exercises) > 0:
-                                        exercises_found = True
-                                        st.markdown("**Today's Exercises:**")
-                                        for ex in exercises:
-                                            # Just display the exercise text
-                                            st.markdown(f"• {ex}")
-                                    else:
-                                        st.info("🌟 Rest day - Recovery is important!")
-                                        exercises_found = True
-                                    break
-            
-            if not exercises_found:
-                st.info("💡 Check your Profile → Workouts tab to see your full workout schedule!")
+            if todays_workout['week_number'] is None:
+                st.info("🏁 This plan is complete! Activate a new one from the Planner.")
+            else:
+                st.markdown(f"**Week {todays_workout['week_number']}, Day {datetime.now().weekday() + 1}**")
+                
+                if todays_workout['exercises']:
+                    st.markdown("**Today's Exercises:**")
+                    for ex in todays_workout['exercises']:
+                        st.markdown(f"• {ex}")
+                elif todays_workout['day_id']:
+                    st.info("🌟 Rest day - Recovery is important!")
+                else:
+                    st.info("💡 Check your Profile → Workouts tab to see your full workout schedule!")
     else:
         st.info("💡 **No active workout yet!** Go to Planner → Generate a workout plan, then click 'Activate for Daily Check-in'")
     
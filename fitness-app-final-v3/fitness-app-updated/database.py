@@ -1,8 +1,11 @@
 import sqlite3
 import hashlib
-import json
 from datetime import datetime
 
+from database_pool import connect
+from migrations import bootstrap
+from plan_codec import encode as encode_plan, decode as decode_plan
+
 # Database file name
 DB_NAME = "routinex.db"
 
@@ -12,115 +15,9 @@ DB_NAME = "routinex.db"
 
 def init_db():
     """
-    Creates the necessary tables if they do not exist.
+    Creates/upgrades every table (see migrations.py). Runs once per process.
     """
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-
-    # 1. USERS TABLE
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            username TEXT PRIMARY KEY,
-            password_hash TEXT NOT NULL,
-            created_at TEXT
-        )
-    ''')
-
-    # 2. PLANS TABLE (Diet Plans Only)
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS saved_plans (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT,
-            plan_data TEXT,
-            created_at TEXT,
-            FOREIGN KEY(username) REFERENCES users(username)
-        )
-    ''')
-
-    # 3. MENTAL HEALTH LOGS
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS mental_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT,
-            mood_score INTEGER,
-            mood_label TEXT,
-            stress_factors TEXT,
-            notes TEXT,
-            date TEXT,
-            FOREIGN KEY(username) REFERENCES users(username)
-        )
-    ''')
-
-    # 4. WORKOUT CHECK-INS (NEW)
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS workout_checkins (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL,
-            workout_data TEXT NOT NULL,
-            plan_name TEXT,
-            duration_weeks INTEGER,
-            created_at TEXT NOT NULL,
-            is_active INTEGER DEFAULT 1,
-            FOREIGN KEY(username) REFERENCES users(username)
-        )
-    ''')
-
-    # 5. DAILY CHECK-IN LOGS (NEW)
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS daily_checkin_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL,
-            date TEXT NOT NULL,
-            workout_completed INTEGER DEFAULT 0,
-            water_intake INTEGER DEFAULT 0,
-            meditation INTEGER DEFAULT 0,
-            sleep_quality INTEGER,
-            notes TEXT,
-            created_at TEXT NOT NULL,
-            FOREIGN KEY(username) REFERENCES users(username),
-            UNIQUE(username, date)
-        )
-    ''')
-
-    # 6. CANVAS ENTRIES (NEW)
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS canvas_entries (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL,
-            content TEXT NOT NULL,
-            mood TEXT,
-            created_at TEXT NOT NULL,
-            FOREIGN KEY(username) REFERENCES users(username)
-        )
-    ''')
-
-    # 7. DAILY WINS (NEW)
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS daily_wins (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL,
-            win1 TEXT,
-            win2 TEXT,
-            win3 TEXT,
-            win_date TEXT NOT NULL,
-            created_at TEXT NOT NULL,
-            FOREIGN KEY(username) REFERENCES users(username)
-        )
-    ''')
-
-    conn.commit()
-    
-    # MIGRATION: Add win_date column to existing tables if it doesn't exist
-    try:
-        c.execute("SELECT win_date FROM daily_wins LIMIT 1")
-    except sqlite3.OperationalError:
-        # Column doesn't exist, add it
-        c.execute("ALTER TABLE daily_wins ADD COLUMN win_date TEXT DEFAULT '1970-01-01'")
-        # Update existing records to use created_at date
-        c.execute("UPDATE daily_wins SET win_date = DATE(created_at) WHERE win_date IS NULL OR win_date = '1970-01-01'")
-        conn.commit()
-    
-    conn.close()
+    bootstrap(DB_NAME)
 
 # ---------------------------------------------------------
 # HELPER: PASSWORD HASHING
@@ -134,7 +31,7 @@ def make_hash(password):
 # ---------------------------------------------------------
 
 def add_user(username, password):
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect(DB_NAME)
     c = conn.cursor()
     
     password_hash = make_hash(password)
@@ -151,7 +48,7 @@ def add_user(username, password):
         conn.close()
 
 def verify_user(username, password):
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect(DB_NAME, readonly=True)
     c = conn.cursor()
     
     password_hash = make_hash(password)
@@ -169,20 +66,20 @@ def verify_user(username, password):
 # ---------------------------------------------------------
 
 def save_plan(username, plan_data):
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect(DB_NAME)
     c = conn.cursor()
     
-    plan_json = json.dumps(plan_data)
+    plan_blob = encode_plan(plan_data)
     created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
     c.execute('INSERT INTO saved_plans (username, plan_data, created_at) VALUES (?, ?, ?)', 
-              (username, plan_json, created_at))
+              (username, plan_blob, created_at))
     
     conn.commit()
     conn.close()
 
 def get_user_plans(username):
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect(DB_NAME, readonly=True)
     c = conn.cursor()
     
     c.execute('SELECT id, plan_data, created_at FROM saved_plans WHERE username = ? ORDER BY created_at DESC', 
@@ -195,14 +92,14 @@ def get_user_plans(username):
     for row in rows:
         results.append({
             "id": row[0],
-            "plan": json.loads(row[1]),
+            "plan": decode_plan(row[1]),
             "created_at": row[2]
         })
         
     return results
 
 def delete_plan(plan_id):
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect(DB_NAME)
     c = conn.cursor()
     c.execute('DELETE FROM saved_plans WHERE id = ?', (plan_id,))
     conn.commit()
@@ -213,7 +110,7 @@ def delete_plan(plan_id):
 # ---------------------------------------------------------
 
 def log_mood(username, mood_score, mood_label, stress_factors, notes):
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect(DB_NAME)
     c = conn.cursor()
     
     # Store date as YYYY-MM-DD for simple daily uniqueness
@@ -242,7 +139,7 @@ def log_mood(username, mood_score, mood_label, stress_factors, notes):
     conn.close()
 
 def get_mood_history(username):
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect(DB_NAME, readonly=True)
     c = conn.cursor()
     # Get last 7 entries for the chart
     c.execute("SELECT date, mood_score FROM mental_logs WHERE username = ? ORDER BY date ASC LIMIT 7", (username,))
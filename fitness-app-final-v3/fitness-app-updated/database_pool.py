@@ -0,0 +1,258 @@
+"""
+database_pool.py
+Shared SQLite connection manager for every RoutineX database module.
+
+    con = connect()                      # read/write
+    con = connect(readonly=True)         # dashboards and other pure reads
+    ...
+    con.close()                          # returns the connection to the pool
+
+Connections are opened once, tuned (WAL journal, NORMAL sync, bigger page
+cache, mmap, busy timeout) and reused, so the usual
+`con = ...; ...; con.commit(); con.close()` pattern no longer pays for a
+fresh open per call and concurrent Streamlit sessions wait on a lock instead
+of failing with "database is locked".
+
+Run `python database_pool.py` for an ops/sec benchmark under concurrent sessions.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_NAME = "routinex.db"
+
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KB = 16 * 1024          # negative cache_size = KiB
+MMAP_SIZE = 128 * 1024 * 1024
+POOL_SIZE = 8                      # idle connections kept per (database, mode)
+
+_pools = {}
+_pools_lock = threading.Lock()
+_wal_checked = set()
+_tracers = {}                      # absolute path -> callback(sql), see trace()
+
+
+def _open(path, readonly):
+    con = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+    if path not in _wal_checked:
+        # journal_mode is persistent in the file; only needs setting once per process.
+        con.execute("PRAGMA journal_mode=WAL")
+        _wal_checked.add(path)
+    con.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    con.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    con.execute("PRAGMA temp_store=MEMORY")
+    if readonly:
+        con.execute("PRAGMA query_only=ON")
+    tracer = _tracers.get(os.path.abspath(path))
+    if tracer:
+        con.set_trace_callback(tracer)
+    return con
+
+
+def _pool(path, readonly):
+    key = (os.path.abspath(path), readonly)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(key, queue.LifoQueue(maxsize=POOL_SIZE))
+    return pool
+
+
+class PooledConnection:
+    """
+    Thin wrapper around a pooled sqlite3.Connection. Behaves like the real
+    connection except that close() rolls back anything uncommitted and hands
+    it back to the pool.
+    """
+
+    __slots__ = ("_con", "_pool")
+
+    def __init__(self, con, pool):
+        object.__setattr__(self, "_con", con)
+        object.__setattr__(self, "_pool", pool)
+
+    def __getattr__(self, name):
+        con = self._con
+        if con is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return getattr(con, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._con, name, value)
+
+    def __enter__(self):
+        self._con.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._con.__exit__(*exc)
+
+    def close(self):
+        con = self._con
+        if con is None:
+            return
+        object.__setattr__(self, "_con", None)
+        try:
+            if con.in_transaction:
+                con.rollback()
+            self._pool.put_nowait(con)
+        except (queue.Full, sqlite3.Error):
+            con.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def connect(db_name=DB_NAME, readonly=False, row_factory=None):
+    """Check a connection out of the pool (opening one if none is idle)."""
+    pool = _pool(db_name, readonly)
+    try:
+        con = pool.get_nowait()
+    except queue.Empty:
+        con = _open(db_name, readonly)
+    con.row_factory = row_factory
+    return PooledConnection(con, pool)
+
+
+@contextmanager
+def transaction(db_name=DB_NAME, row_factory=None):
+    """
+    `with transaction() as con:` — one BEGIN IMMEDIATE ... COMMIT, rolled back
+    on any exception. Takes the write lock up front so the block can't fail
+    half-way with SQLITE_BUSY.
+    """
+    con = connect(db_name, row_factory=row_factory)
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        yield con
+        con.commit()
+    except BaseException:
+        con.rollback()
+        raise
+    finally:
+        con.close()
+
+
+def trace(db_name, callback):
+    """
+    Have connections to `db_name` opened from now on call `callback(sql)` for
+    every statement they run (None stops it). Diagnostics only — see
+    migrations.check_query_plans.
+    """
+    path = os.path.abspath(db_name)
+    if callback is None:
+        _tracers.pop(path, None)
+    else:
+        _tracers[path] = callback
+
+
+def discard_idle(db_name=DB_NAME):
+    """Close idle connections to one database, e.g. after a schema change."""
+    path = os.path.abspath(db_name)
+    with _pools_lock:
+        pools = [p for (key, _), p in _pools.items() if key == path]
+    for pool in pools:
+        while True:
+            try:
+                pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def close_all():
+    """Close every idle pooled connection (tests, benchmarks, shutdown)."""
+    with _pools_lock:
+        for pool in _pools.values():
+            while True:
+                try:
+                    pool.get_nowait().close()
+                except queue.Empty:
+                    break
+        _pools.clear()
+
+
+# ──────────────────────────────────────────────────────────────
+# BENCHMARK
+# ──────────────────────────────────────────────────────────────
+
+def _benchmark(sessions, ops, db_path):
+    """Run `ops` diary/weight writes + reads per simulated session, pooled vs unpooled."""
+    import time
+    from datetime import date, timedelta
+    import database_tracker
+    import migrations
+    # When run as a script this module is __main__; use the copy the data modules imported.
+    import database_pool as pool
+
+    def unpooled_connect(db_name=DB_NAME, readonly=False, row_factory=None):
+        # What every module did before: fresh connection, default pragmas.
+        con = sqlite3.connect(db_name)
+        con.row_factory = row_factory
+        return con
+
+    def session(i, errors):
+        user = f"bench{i}"
+        day0 = date(2024, 1, 1)
+        for n in range(ops):
+            d = (day0 + timedelta(days=n % 365)).isoformat()
+            try:
+                database_tracker.upsert_diary(user, d, mood=3, water_glasses=n % 10)
+                database_tracker.log_weight(user, d, 80 - n * 0.01)
+                database_tracker.get_diary_last_n(user, 7)
+                database_tracker.get_latest_weight(user)
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+
+    results = {}
+    for label, pooled in (("unpooled", False), ("pooled", True)):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        pool.close_all()
+        pool._wal_checked.discard(db_path)
+        database_tracker.DB_NAME = db_path
+        original = database_tracker.connect
+        if not pooled:
+            database_tracker.connect = unpooled_connect
+        try:
+            migrations._ready.discard(os.path.abspath(db_path))
+            database_tracker.init_tracker_db()
+            if not pooled:
+                pool.close_all()
+                plain = sqlite3.connect(db_path)
+                plain.execute("PRAGMA journal_mode=DELETE")
+                plain.close()
+            errors = []
+            threads = [threading.Thread(target=session, args=(i, errors)) for i in range(sessions)]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            database_tracker.connect = original
+        total = sessions * ops * 4
+        results[label] = total / elapsed
+        print(f"{label:<9} {total:>7} ops in {elapsed:6.2f}s  {total / elapsed:9.0f} ops/s  "
+              f"{len(errors)} 'locked' errors")
+    print(f"speed-up: {results['pooled'] / results['unpooled']:.1f}x")
+
+
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+    ap = argparse.ArgumentParser(description="Benchmark pooled vs unpooled SQLite access.")
+    ap.add_argument("--sessions", type=int, default=8, help="concurrent simulated sessions (threads)")
+    ap.add_argument("--ops", type=int, default=200, help="write+read rounds per session")
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        _benchmark(args.sessions, args.ops, os.path.join(tmp, "bench.db"))
@@ -1,332 +1,593 @@
 """
 database_tracker.py
-Full SQLite database layer for the RoutineX Smart Daily Tracker.
-Handles: daily diary entries, weight logs, goals, weekly reviews,
-         saved workout plans, saved diet plans, canvas journal entries.
+Full SQLite database layer for RoutineX — the one place each entity is read
+and written. Handles: daily diary / check-ins, weight logs, goals, weekly
+reviews, saved workout plans, saved diet plans, canvas journal entries,
+daily wins, to-dos, full-text search.
+
+Rows are returned as plain dicts; the TypedDicts below document their shape.
+
+Per-user reads are wrapped in @cached and every write in @invalidates
+(user_cache.py): repeat renders with no writes in between are served from
+memory, so don't mutate what a getter returns.
 """
 
 import sqlite3
 import json
 from datetime import datetime, timedelta, date
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, TypedDict
+
+from database_pool import connect, transaction
+from migrations import bootstrap
+import archive
+import cohorts
+import energy
+import insights
+import plan_calendar
+import rollups
+import search
+import streaks
+import timeseries
+from user_cache import cached, invalidates
+from plan_codec import encode as encode_plan, decode as decode_plan
 
 DB_NAME = "routinex.db"
 
 
-def _conn():
-    c = sqlite3.connect(DB_NAME)
-    c.row_factory = sqlite3.Row
-    return c
+def _read_conn():
+    """Read-only pooled connection for dashboard/history reads."""
+    return connect(DB_NAME, readonly=True, row_factory=sqlite3.Row)
+
+
+def _read(fetch, *args):
+    """Run `fetch(con, *args)` on a read-only connection."""
+    con = _read_conn()
+    try:
+        return fetch(con, *args)
+    finally:
+        con.close()
+
+
+def _tx():
+    """`with _tx() as con:` — one write transaction, rolled back on error."""
+    return transaction(DB_NAME, row_factory=sqlite3.Row)
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+# ──────────────────────────────────────────────────────────────
+# ROW TYPES
+# ──────────────────────────────────────────────────────────────
+
+class Goal(TypedDict):
+    id: int
+    username: str
+    goal_type: str
+    description: Optional[str]
+    start_weight: Optional[float]
+    target_weight: Optional[float]
+    start_date: str
+    target_date: Optional[str]
+    is_active: int
+    created_at: str
+
+
+class DiaryEntry(TypedDict):
+    id: int
+    username: str
+    entry_date: str
+    mood: Optional[int]
+    mood_label: Optional[str]
+    energy_level: Optional[int]
+    sleep_hours: Optional[float]
+    water_glasses: Optional[int]
+    workout_done: int
+    workout_notes: Optional[str]
+    diet_followed: int
+    diet_notes: Optional[str]
+    journal_text: Optional[str]
+    stress_level: Optional[int]
+    steps_count: Optional[int]
+    water_goal_met: int          # Daily Check-in checkbox
+    meditation_done: int         # Daily Check-in checkbox
+    sleep_quality: Optional[int] # Daily Check-in 1-5
+    checkin_notes: Optional[str] # Daily Check-in notes (journal_text is the Smart Check-in journal)
+    imported: int                # 1 while only a wearable import has written the day (not a check-in)
+    created_at: str
+    updated_at: str
+
+
+class WeightEntry(TypedDict):
+    log_date: str
+    weight_kg: float
+    notes: Optional[str]
+
+
+class WeeklyReview(TypedDict):
+    id: int
+    username: str
+    week_start: str
+    week_end: str
+    avg_mood: Optional[float]
+    avg_energy: Optional[float]
+    avg_sleep: Optional[float]
+    avg_water: Optional[float]
+    workouts_completed: int
+    days_diet_followed: int
+    weight_change: Optional[float]
+    ai_summary: Optional[str]
+    ai_suggestion: Optional[str]
+    on_track: Optional[int]
+    created_at: str
+
+
+class StreakSummary(TypedDict):
+    current: int                 # consecutive days ending today
+    longest: int
+    last_logged: Optional[str]
+
+
+class WeekOutline(TypedDict):
+    week: int
+    focus: Optional[str]
+    training_days: int
+
+
+class PlanSummary(TypedDict, total=False):
+    id: int
+    plan_name: str
+    goal: Optional[str]
+    duration_months: Optional[int]   # workout plans
+    duration_weeks: Optional[int]    # workout plans
+    outline: List[WeekOutline]     # workout plans, from get_workout_plan_summaries
+    calories: Optional[int]          # diet plans
+    is_active: int
+    created_at: str
+
+
+class Plan(PlanSummary, total=False):
+    username: str
+    plan_data: dict
+    started_on: Optional[str]        # workout plans: week 1 of the calendar
+
+
+class TodayWorkout(TypedDict):
+    plan_id: int
+    plan_name: str
+    duration_weeks: Optional[int]
+    started_on: Optional[str]
+    week_number: Optional[int]       # None once the plan has ended
+    day_id: Optional[int]            # None = nothing scheduled today
+    day_label: Optional[str]
+    focus: Optional[str]
+    exercise_count: Optional[int]
+    exercises: List[str]
+
+
+class CanvasEntry(TypedDict):
+    id: int
+    username: str
+    content: str
+    mood: Optional[str]
+    tags: Optional[str]
+    created_at: str
+
+
+class DailyWins(TypedDict):
+    id: int
+    username: str
+    win1: str
+    win2: str
+    win3: str
+    win_date: str
+    created_at: str
+
+
+class Todo(TypedDict):
+    id: int
+    username: str
+    todo_date: str
+    task_text: str
+    is_done: int
+    created_at: str
+
+
+class Page(TypedDict):
+    items: list
+    next_cursor: Optional[Tuple[str, int]]   # pass as `after` for the next page; None = last page
+
+
+class EnergySummary(TypedDict):
+    trend_kg: float
+    trend_date: str
+    rate_kg_week: float          # trend slope, negative = losing
+    tdee: int
+    tdee_sd: int
+    confident: bool
+    weigh_ins: int
+    projected_date: Optional[str]   # active goal's target weight reached at the current rate
+    days_to_goal: Optional[int]
+
+
+class SeriesPoint(TypedDict, total=False):
+    date: str
+    value: float
+    min: float                   # method="buckets" only
+    max: float
+    n: int
+
+
+class SearchHit(TypedDict):
+    source: str                  # 'diary' | 'canvas' | 'wins'
+    id: int                      # row id in that source's table
+    entry_date: str
+    snippet: str                 # matches wrapped in **bold**
+    rank: float                  # bm25, lower is better
+
+
+class UserSnapshot(TypedDict):
+    date: str
+    diary: Optional[DiaryEntry]
+    todos: List[Todo]
+    streak: StreakSummary
+    goal: Optional[Goal]
+    latest_weight: Optional[dict]
+    workout: Optional[TodayWorkout]
+    diet: Optional[Plan]
+    today_meals: List[dict]
+    latest_review: Optional[WeeklyReview]
+    energy: Optional[EnergySummary]
 
 
 # ──────────────────────────────────────────────────────────────
-# INIT — creates every table if not present (safe to re-run)
+# INIT — schema lives in migrations.py (applied once per process)
 # ──────────────────────────────────────────────────────────────
 
 def init_tracker_db():
-    con = _conn()
-    cur = con.cursor()
-
-    # ── 1. USER GOALS ──────────────────────────────────────────
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS user_goals (
-            id          INTEGER PRIMARY KEY AUTOINCREMENT,
-            username    TEXT NOT NULL,
-            goal_type   TEXT NOT NULL,          -- e.g. 'weight_loss','muscle_gain','endurance'
-            description TEXT,                   -- free text: "Lose 2 kg in 2 months"
-            start_weight REAL,                  -- kg at goal creation
-            target_weight REAL,                 -- kg target (nullable)
-            start_date  TEXT NOT NULL,          -- YYYY-MM-DD
-            target_date TEXT,                   -- YYYY-MM-DD
-            is_active   INTEGER DEFAULT 1,
-            created_at  TEXT NOT NULL,
-            FOREIGN KEY(username) REFERENCES users(username)
-        )
-    """)
-
-    # ── 2. DAILY DIARY ─────────────────────────────────────────
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS daily_diary (
-            id                  INTEGER PRIMARY KEY AUTOINCREMENT,
-            username            TEXT NOT NULL,
-            entry_date          TEXT NOT NULL,    -- YYYY-MM-DD
-            mood                INTEGER,          -- 1-5
-            mood_label          TEXT,
-            energy_level        INTEGER,          -- 1-5
-            sleep_hours         REAL,
-            water_glasses       INTEGER,
-            workout_done        INTEGER DEFAULT 0, -- 0/1
-            workout_notes       TEXT,
-            diet_followed       INTEGER DEFAULT 0, -- 0/1
-            diet_notes          TEXT,
-            journal_text        TEXT,             -- diary / reflection
-            stress_level        INTEGER,          -- 1-5
-            steps_count         INTEGER,
-            created_at          TEXT NOT NULL,
-            updated_at          TEXT NOT NULL,
-            UNIQUE(username, entry_date),
-            FOREIGN KEY(username) REFERENCES users(username)
-        )
-    """)
-
-    # ── 3. WEIGHT LOG ──────────────────────────────────────────
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS weight_log (
-            id          INTEGER PRIMARY KEY AUTOINCREMENT,
-            username    TEXT NOT NULL,
-            log_date    TEXT NOT NULL,   -- YYYY-MM-DD
-            weight_kg   REAL NOT NULL,
-            notes       TEXT,
-            created_at  TEXT NOT NULL,
-            UNIQUE(username, log_date),
-            FOREIGN KEY(username) REFERENCES users(username)
-        )
-    """)
-
-    # ── 4. WEEKLY REVIEWS ──────────────────────────────────────
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS weekly_reviews (
-            id                  INTEGER PRIMARY KEY AUTOINCREMENT,
-            username            TEXT NOT NULL,
-            week_start          TEXT NOT NULL,   -- YYYY-MM-DD (Monday)
-            week_end            TEXT NOT NULL,   -- YYYY-MM-DD (Sunday)
-            avg_mood            REAL,
-            avg_energy          REAL,
-            avg_sleep           REAL,
-            avg_water           REAL,
-            workouts_completed  INTEGER,
-            days_diet_followed  INTEGER,
-            weight_change       REAL,            -- kg delta vs prev week
-            ai_summary          TEXT,            -- AI generated weekly insight
-            ai_suggestion       TEXT,            -- AI recommended next steps
-            created_at          TEXT NOT NULL,
-            UNIQUE(username, week_start),
-            FOREIGN KEY(username) REFERENCES users(username)
-        )
-    """)
-
-    # ── 5. SAVED WORKOUT PLANS (full data) ─────────────────────
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS saved_workout_plans (
-            id          INTEGER PRIMARY KEY AUTOINCREMENT,
-            username    TEXT NOT NULL,
-            plan_name   TEXT NOT NULL,
-            goal        TEXT,
-            duration_months INTEGER,
-            plan_data   TEXT NOT NULL,   -- JSON
-            is_active   INTEGER DEFAULT 0,
-            created_at  TEXT NOT NULL,
-            FOREIGN KEY(username) REFERENCES users(username)
-        )
-    """)
-
-    # ── 6. SAVED DIET PLANS (full data) ────────────────────────
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS saved_diet_plans (
-            id          INTEGER PRIMARY KEY AUTOINCREMENT,
-            username    TEXT NOT NULL,
-            plan_name   TEXT NOT NULL,
-            goal        TEXT,
-            calories    INTEGER,
-            plan_data   TEXT NOT NULL,   -- JSON
-            is_active   INTEGER DEFAULT 0,
-            created_at  TEXT NOT NULL,
-            FOREIGN KEY(username) REFERENCES users(username)
-        )
-    """)
-
-    # ── 7. CANVAS / JOURNAL ENTRIES ────────────────────────────
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS canvas_entries (
-            id          INTEGER PRIMARY KEY AUTOINCREMENT,
-            username    TEXT NOT NULL,
-            content     TEXT NOT NULL,
-            mood        TEXT,
-            tags        TEXT,            -- comma-separated
-            created_at  TEXT NOT NULL,
-            FOREIGN KEY(username) REFERENCES users(username)
-        )
-    """)
-
-    # ── 8. DAILY WINS ──────────────────────────────────────────
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS daily_wins (
-            id          INTEGER PRIMARY KEY AUTOINCREMENT,
-            username    TEXT NOT NULL,
-            win1        TEXT,
-            win2        TEXT,
-            win3        TEXT,
-            win_date    TEXT NOT NULL,   -- YYYY-MM-DD
-            created_at  TEXT NOT NULL,
-            FOREIGN KEY(username) REFERENCES users(username)
-        )
-    """)
-
-    # ── 9. TO-DO LIST (daily tasks) ────────────────────────────
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS daily_todos (
-            id          INTEGER PRIMARY KEY AUTOINCREMENT,
-            username    TEXT NOT NULL,
-            todo_date   TEXT NOT NULL,   -- YYYY-MM-DD
-            task_text   TEXT NOT NULL,
-            is_done     INTEGER DEFAULT 0,
-            created_at  TEXT NOT NULL,
-            FOREIGN KEY(username) REFERENCES users(username)
-        )
-    """)
+    bootstrap(DB_NAME)
 
-    con.commit()
-    con.close()
+
+# ──────────────────────────────────────────────────────────────
+# HISTORY PAGES — keyset pagination, newest first
+# ──────────────────────────────────────────────────────────────
+# A page is the `limit` rows before a cursor (key, id) in (key DESC, id DESC)
+# order, read straight off the (username, key) index — which ends in the
+# rowid, i.e. id — so page 50 costs the same as page 1. A cursor stays valid
+# when rows are added or deleted, unlike an OFFSET.
+
+def _fetch_page(con, select, key, username, after, limit):
+    """
+    Run `select` (a query ending in "WHERE <alias.>username = ?") as one
+    keyset page ordered by `key` (column, optionally alias-qualified).
+    """
+    alias, _, col = key.rpartition(".")
+    id_col = f"{alias}.id" if alias else "id"
+    args = [username]
+    if after is not None:
+        select += f" AND ({key}, {id_col}) < (?, ?)"
+        args += list(after)
+    rows = con.execute(f"{select} ORDER BY {key} DESC, {id_col} DESC LIMIT ?",
+                       args + [limit + 1]).fetchall()
+    items = [dict(r) for r in rows[:limit]]
+    more = len(rows) > limit
+    return {"items": items, "next_cursor": (items[-1][col], items[-1]["id"]) if more else None}
+
+
+def load_pages(get_page: Callable[..., Page], username, pages=1, **kwargs) -> Page:
+    """
+    The first `pages` pages joined into one, for "load more" lists: keep the
+    page count in session state and add one to show another page. Each page
+    starts from the next_cursor of the page just fetched, so rows added or
+    deleted in between never show up twice or go missing. Every page is
+    cached on its own.
+    """
+    items, cursor = [], None
+    for _ in range(pages):
+        page = get_page(username, cursor, **kwargs)
+        items += page["items"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    return {"items": items, "next_cursor": cursor}
 
 
 # ──────────────────────────────────────────────────────────────
 # GOALS
 # ──────────────────────────────────────────────────────────────
 
+@invalidates()
 def save_goal(username, goal_type, description, start_weight, target_weight, start_date, target_date):
-    con = _conn()
-    cur = con.cursor()
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    # deactivate previous
-    cur.execute("UPDATE user_goals SET is_active=0 WHERE username=?", (username,))
-    cur.execute("""
-        INSERT INTO user_goals
-        (username,goal_type,description,start_weight,target_weight,start_date,target_date,is_active,created_at)
-        VALUES(?,?,?,?,?,?,?,1,?)
-    """, (username, goal_type, description, start_weight, target_weight, start_date, target_date, now))
-    con.commit(); con.close()
-
-
-def get_active_goal(username):
-    con = _conn()
+    with _tx() as con:
+        # deactivate previous
+        con.execute("UPDATE user_goals SET is_active=0 WHERE username=? AND is_active=1", (username,))
+        con.execute("""
+            INSERT INTO user_goals
+            (username,goal_type,description,start_weight,target_weight,start_date,target_date,is_active,created_at)
+            VALUES(?,?,?,?,?,?,?,1,?)
+        """, (username, goal_type, description, start_weight, target_weight, start_date, target_date, _now()))
+
+
+def _fetch_active_goal(con, username):
     row = con.execute(
         "SELECT * FROM user_goals WHERE username=? AND is_active=1 ORDER BY created_at DESC LIMIT 1",
         (username,)
     ).fetchone()
-    con.close()
     return dict(row) if row else None
 
 
+@cached
+def get_active_goal(username) -> Optional[Goal]:
+    return _read(_fetch_active_goal, username)
+
+
 # ──────────────────────────────────────────────────────────────
 # DAILY DIARY
 # ──────────────────────────────────────────────────────────────
 
-def upsert_diary(username, entry_date, **fields):
-    """Insert or update a diary row. Pass only the fields you want to save."""
-    con = _conn()
-    cur = con.cursor()
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    existing = cur.execute(
-        "SELECT id FROM daily_diary WHERE username=? AND entry_date=?",
-        (username, entry_date)
-    ).fetchone()
+def _diary_upsert_sql(field_names):
+    # imported only ever goes 1 -> 0: a user's own write makes the day a check-in,
+    # an import into a day they logged leaves it one
+    cols = ["username", "entry_date", "created_at", "updated_at", "imported"] + list(field_names)
+    sets = "".join(f", {k}=excluded.{k}" for k in field_names)
+    return (f"INSERT INTO daily_diary ({','.join(cols)}) VALUES({','.join('?' * len(cols))}) "
+            f"ON CONFLICT(username, entry_date) DO UPDATE SET updated_at=excluded.updated_at, "
+            f"imported=MIN(daily_diary.imported, excluded.imported){sets}")
 
-    if existing:
-        sets = ", ".join(f"{k}=?" for k in fields)
-        vals = list(fields.values()) + [now, existing["id"]]
-        cur.execute(f"UPDATE daily_diary SET {sets}, updated_at=? WHERE id=?", vals)
-    else:
-        cols = ["username", "entry_date", "created_at", "updated_at"] + list(fields.keys())
-        vals = [username, entry_date, now, now] + list(fields.values())
-        placeholders = ",".join(["?"] * len(cols))
-        cur.execute(f"INSERT INTO daily_diary ({','.join(cols)}) VALUES({placeholders})", vals)
 
-    con.commit(); con.close()
+# The columns the rollups are built from, as stored before an upsert.
+_DIARY_OLD_SQL = (f"SELECT {', '.join(rollups.SOURCE_COLUMNS)} FROM daily_diary "
+                  f"WHERE username=? AND entry_date=?")
 
 
-def get_diary_entry(username, entry_date):
-    con = _conn()
+@invalidates()
+def upsert_diary(username, entry_date, **fields):
+    """Insert or update a diary row. Pass only the fields you want to save."""
+    now = _now()
+    with _tx() as con:
+        archive.restore(con, "daily_diary", username, [entry_date])
+        old = con.execute(_DIARY_OLD_SQL, (username, entry_date)).fetchone()
+        con.execute(_diary_upsert_sql(fields), [username, entry_date, now, now, 0] + list(fields.values()))
+        old = dict(old) if old else None
+        new = {**(old or {}), **fields, "imported": 0}
+        rollups.apply(con, username, entry_date, old, new)
+        energy.record_diary(con, username, entry_date, old, new)
+        if old is None or old["imported"]:
+            streaks.record_day(con, username, entry_date)
+
+
+@invalidates()
+def upsert_diary_many(username, entries: Iterable[dict], imported=False):
+    """
+    Upsert many days in one transaction. Each entry is a dict with
+    `entry_date` plus the fields to save; entries with the same field set
+    share one executemany. With `imported` (wearables.py), days this creates
+    are flagged as imported: they keep their values but don't count as
+    check-ins for streaks, days_logged, insights or cohorts until the user
+    saves the day themselves.
+    """
+    now = _now()
+    entries = list(entries)
+    if not entries:
+        return 0
+    groups: Dict[tuple, list] = {}
+    for e in entries:
+        fields = {k: v for k, v in e.items() if k != "entry_date"}
+        groups.setdefault(tuple(fields), []).append(
+            [username, e["entry_date"], now, now, int(imported)] + list(fields.values())
+        )
+    dates = [e["entry_date"] for e in entries]
+    with _tx() as con:
+        archive.restore(con, "daily_diary", username, dates)
+        old_rows = {r["entry_date"]: dict(r) for r in con.execute(
+            f"SELECT entry_date, {', '.join(rollups.SOURCE_COLUMNS)} FROM daily_diary "
+            f"WHERE username=? AND entry_date BETWEEN ? AND ?", (username, min(dates), max(dates))
+        )}
+        for field_names, rows in groups.items():
+            con.executemany(_diary_upsert_sql(field_names), rows)
+        changes, merged = [], {}
+        for e in entries:
+            d = e["entry_date"]
+            before = merged.get(d, old_rows.get(d))
+            after = {**(before or {}), **{k: v for k, v in e.items() if k != "entry_date"},
+                     "imported": min((before or {}).get("imported", 1), int(imported))}
+            changes.append((d, before, after))
+            merged[d] = after
+        rollups.apply_many(con, username, changes)
+        streaks.recompute(con, username)
+        if any("diet_followed" in field_names for field_names in groups):
+            energy.recompute(con, username)
+    return sum(len(r) for r in groups.values())
+
+
+def _fetch_diary_entry(con, username, entry_date):
     row = con.execute(
         "SELECT * FROM daily_diary WHERE username=? AND entry_date=?",
         (username, entry_date)
     ).fetchone()
-    con.close()
-    return dict(row) if row else None
+    if row:
+        return dict(row)
+    archived = archive.read(con, "daily_diary", username, entry_date, entry_date)
+    return archived[0] if archived else None
+
 
+@cached
+def get_diary_entry(username, entry_date) -> Optional[DiaryEntry]:
+    return _read(_fetch_diary_entry, username, entry_date)
 
-def get_diary_range(username, start_date, end_date):
-    con = _conn()
+
+def _fetch_diary_range(con, username, start_date, end_date):
     rows = con.execute(
         "SELECT * FROM daily_diary WHERE username=? AND entry_date BETWEEN ? AND ? ORDER BY entry_date ASC",
         (username, start_date, end_date)
     ).fetchall()
-    con.close()
-    return [dict(r) for r in rows]
+    return archive.merge(con, "daily_diary", username, [dict(r) for r in rows], start_date, end_date)
 
 
-def get_diary_last_n(username, n=30):
-    con = _conn()
-    rows = con.execute(
+@cached
+def get_diary_range(username, start_date, end_date) -> List[DiaryEntry]:
+    return _read(_fetch_diary_range, username, start_date, end_date)
+
+
+def _fetch_diary_last_n(con, username, n):
+    rows = [dict(r) for r in con.execute(
         "SELECT * FROM daily_diary WHERE username=? ORDER BY entry_date DESC LIMIT ?",
         (username, n)
-    ).fetchall()
-    con.close()
-    return [dict(r) for r in rows]
+    )]
+    if len(rows) < n:
+        # fewer hot rows than asked for: the rest may be archived
+        rows = sorted(archive.merge(con, "daily_diary", username, rows),
+                      key=lambda r: r["entry_date"], reverse=True)[:n]
+    return rows
+
+
+@cached
+def get_diary_last_n(username, n=30) -> List[DiaryEntry]:
+    return _read(_fetch_diary_last_n, username, n)
+
+
+# ──────────────────────────────────────────────────────────────
+# DAILY CHECK-IN (Mental Health › Daily Check-in) — stored in daily_diary
+# ──────────────────────────────────────────────────────────────
+
+def _checkin_from_diary(row):
+    return {
+        "workout_completed": row["workout_done"] == 1,
+        "water_intake": row["water_goal_met"] == 1,
+        "meditation": row["meditation_done"] == 1,
+        "sleep_quality": row["sleep_quality"],
+        "notes": row.get("checkin_notes"),   # absent on rows archived before migration 13
+    }
+
+
+def save_daily_checkin(username, date, workout_done, water, meditation, sleep, notes):
+    """Save or update the check-in part of a day's diary row."""
+    upsert_diary(username, date, workout_done=workout_done, water_goal_met=water,
+                 meditation_done=meditation, sleep_quality=sleep, checkin_notes=notes)
+
+
+@cached
+def get_daily_checkin(username, date) -> Optional[dict]:
+    row = get_diary_entry(username, date)
+    if not row:
+        return None
+    return {**_checkin_from_diary(row), "created_at": row["updated_at"]}
+
+
+@cached
+def get_checkin_history(username, limit=7) -> List[dict]:
+    return [{"date": r["entry_date"], **_checkin_from_diary(r)}
+            for r in get_diary_last_n(username, limit)]
 
 
 # ──────────────────────────────────────────────────────────────
 # WEIGHT LOG
 # ──────────────────────────────────────────────────────────────
 
+_WEIGHT_UPSERT = """
+    INSERT INTO weight_log(username,log_date,weight_kg,notes,created_at)
+    VALUES(?,?,?,?,?)
+    ON CONFLICT(username,log_date) DO UPDATE SET weight_kg=excluded.weight_kg, notes=excluded.notes
+"""
+
+
+@invalidates()
 def log_weight(username, log_date, weight_kg, notes=""):
-    con = _conn()
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    con.execute("""
-        INSERT INTO weight_log(username,log_date,weight_kg,notes,created_at)
-        VALUES(?,?,?,?,?)
-        ON CONFLICT(username,log_date) DO UPDATE SET weight_kg=excluded.weight_kg, notes=excluded.notes
-    """, (username, log_date, weight_kg, notes, now))
-    con.commit(); con.close()
-
-
-def get_weight_history(username, limit=52):
-    con = _conn()
+    with _tx() as con:
+        con.execute(_WEIGHT_UPSERT, (username, log_date, weight_kg, notes, _now()))
+        energy.record_weight(con, username, log_date, weight_kg)
+
+
+@invalidates()
+def log_weights(username, rows: Iterable[tuple]):
+    """Upsert many (log_date, weight_kg[, notes]) rows in one transaction."""
+    now = _now()
+    params = [(username, r[0], r[1], r[2] if len(r) > 2 else "", now) for r in rows]
+    with _tx() as con:
+        con.executemany(_WEIGHT_UPSERT, params)
+        energy.recompute(con, username)
+    return len(params)
+
+
+@cached
+def get_weight_history(username, limit=52) -> List[WeightEntry]:
+    """The newest `limit` weigh-ins, oldest first (use get_series for long ranges)."""
+    con = _read_conn()
+    rows = con.execute("""
+        SELECT * FROM (SELECT log_date, weight_kg, notes FROM weight_log
+                       WHERE username=? ORDER BY log_date DESC LIMIT ?)
+        ORDER BY log_date ASC
+    """, (username, limit)).fetchall()
+    con.close()
+    return [dict(r) for r in rows]
+
+
+@cached
+def get_weight_range(username, start_date, end_date) -> List[WeightEntry]:
+    """Weigh-ins between start_date and end_date (inclusive), oldest first."""
+    con = _read_conn()
     rows = con.execute(
-        "SELECT log_date, weight_kg, notes FROM weight_log WHERE username=? ORDER BY log_date ASC LIMIT ?",
-        (username, limit)
+        "SELECT log_date, weight_kg, notes FROM weight_log WHERE username=? AND log_date BETWEEN ? AND ? "
+        "ORDER BY log_date", (username, start_date, end_date)
     ).fetchall()
     con.close()
     return [dict(r) for r in rows]
 
 
-def get_latest_weight(username):
-    con = _conn()
+def _fetch_latest_weight(con, username):
     row = con.execute(
         "SELECT weight_kg, log_date FROM weight_log WHERE username=? ORDER BY log_date DESC LIMIT 1",
         (username,)
     ).fetchone()
-    con.close()
     return dict(row) if row else None
 
 
+@cached
+def get_latest_weight(username) -> Optional[dict]:
+    return _read(_fetch_latest_weight, username)
+
+
 # ──────────────────────────────────────────────────────────────
 # WEEKLY REVIEWS
 # ──────────────────────────────────────────────────────────────
 
 def save_weekly_review(username, week_start, week_end, avg_mood, avg_energy,
                         avg_sleep, avg_water, workouts_completed, days_diet,
-                        weight_change, ai_summary, ai_suggestion):
-    con = _conn()
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    con.execute("""
-        INSERT INTO weekly_reviews
-        (username,week_start,week_end,avg_mood,avg_energy,avg_sleep,avg_water,
-         workouts_completed,days_diet_followed,weight_change,ai_summary,ai_suggestion,created_at)
-        VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?)
-        ON CONFLICT(username,week_start) DO UPDATE SET
-            avg_mood=excluded.avg_mood, avg_energy=excluded.avg_energy,
-            avg_sleep=excluded.avg_sleep, avg_water=excluded.avg_water,
-            workouts_completed=excluded.workouts_completed,
-            days_diet_followed=excluded.days_diet_followed,
-            weight_change=excluded.weight_change,
-            ai_summary=excluded.ai_summary, ai_suggestion=excluded.ai_suggestion
-    """, (username, week_start, week_end, avg_mood, avg_energy, avg_sleep,
-          avg_water, workouts_completed, days_diet, weight_change, ai_summary, ai_suggestion, now))
-    con.commit(); con.close()
-
-
-def get_weekly_reviews(username, limit=12):
-    con = _conn()
+                        weight_change, ai_summary, ai_suggestion, on_track=None):
+    save_weekly_reviews([(username, week_start, week_end, avg_mood, avg_energy,
+                          avg_sleep, avg_water, workouts_completed, days_diet,
+                          weight_change, ai_summary, ai_suggestion, on_track)])
+
+
+@invalidates(None)
+def save_weekly_reviews(rows):
+    """
+    Upsert many reviews in one transaction. Each row follows save_weekly_review's
+    argument order; a None AI summary keeps the one already saved, if any.
+    """
+    now = _now()
+    with _tx() as con:
+        con.executemany("""
+            INSERT INTO weekly_reviews
+            (username,week_start,week_end,avg_mood,avg_energy,avg_sleep,avg_water,
+             workouts_completed,days_diet_followed,weight_change,ai_summary,ai_suggestion,on_track,created_at)
+            VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+            ON CONFLICT(username,week_start) DO UPDATE SET
+                avg_mood=excluded.avg_mood, avg_energy=excluded.avg_energy,
+                avg_sleep=excluded.avg_sleep, avg_water=excluded.avg_water,
+                workouts_completed=excluded.workouts_completed,
+                days_diet_followed=excluded.days_diet_followed,
+                weight_change=excluded.weight_change,
+                ai_summary=COALESCE(excluded.ai_summary, weekly_reviews.ai_summary),
+                ai_suggestion=COALESCE(excluded.ai_suggestion, weekly_reviews.ai_suggestion),
+                on_track=COALESCE(excluded.on_track, weekly_reviews.on_track)
+        """, [tuple(r) + (None,) * (13 - len(r)) + (now,) for r in rows])
+
+
+@cached
+def get_weekly_reviews(username, limit=12) -> List[WeeklyReview]:
+    con = _read_conn()
     rows = con.execute(
         "SELECT * FROM weekly_reviews WHERE username=? ORDER BY week_start DESC LIMIT ?",
         (username, limit)
@@ -335,34 +596,78 @@ def get_weekly_reviews(username, limit=12):
     return [dict(r) for r in rows]
 
 
-def get_latest_weekly_review(username):
-    con = _conn()
+@cached
+def get_weekly_reviews_page(username, after=None, limit=8) -> Page:
+    """Weekly reviews, newest week first, `limit` per page (see load_pages)."""
+    return _read(_fetch_page, "SELECT * FROM weekly_reviews WHERE username = ?",
+                 "week_start", username, after, limit)
+
+
+@cached
+def get_weekly_review(username, week_start) -> Optional[WeeklyReview]:
+    con = _read_conn()
+    row = con.execute(
+        "SELECT * FROM weekly_reviews WHERE username=? AND week_start=?",
+        (username, week_start)
+    ).fetchone()
+    con.close()
+    return dict(row) if row else None
+
+
+def _fetch_latest_weekly_review(con, username):
     row = con.execute(
         "SELECT * FROM weekly_reviews WHERE username=? ORDER BY week_start DESC LIMIT 1",
         (username,)
     ).fetchone()
-    con.close()
     return dict(row) if row else None
 
 
+@cached
+def get_latest_weekly_review(username) -> Optional[WeeklyReview]:
+    return _read(_fetch_latest_weekly_review, username)
+
+
 # ──────────────────────────────────────────────────────────────
 # SAVED WORKOUT PLANS
 # ──────────────────────────────────────────────────────────────
 
-def save_workout_plan(username, plan_name, goal, duration_months, plan_data, set_active=True):
-    con = _conn()
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+@invalidates()
+def save_workout_plan(username, plan_name, goal, duration_months, plan_data, set_active=True,
+                      duration_weeks=None) -> int:
+    """
+    Save a generated plan and (by default) make it the one the Daily Check-in
+    tracks. The plan is serialized once and the deactivate/insert runs in one
+    transaction, so a user never ends up with zero or two active plans.
+    Returns the new plan id.
+    """
+    plan_blob = encode_plan(plan_data)
+    with _tx() as con:
+        return _insert_workout_plan(con, username, plan_name, goal, duration_months, plan_data,
+                                    set_active, duration_weeks, plan_blob)
+
+
+def _insert_workout_plan(con, username, plan_name, goal, duration_months, plan_data, set_active=True,
+                         duration_weeks=None, plan_blob=None):
+    if duration_weeks is None:
+        duration_weeks = len(plan_data.get("schedule", []))
     if set_active:
-        con.execute("UPDATE saved_workout_plans SET is_active=0 WHERE username=?", (username,))
-    con.execute("""
-        INSERT INTO saved_workout_plans(username,plan_name,goal,duration_months,plan_data,is_active,created_at)
-        VALUES(?,?,?,?,?,?,?)
-    """, (username, plan_name, goal, duration_months, json.dumps(plan_data), 1 if set_active else 0, now))
-    con.commit(); con.close()
+        con.execute("UPDATE saved_workout_plans SET is_active=0 WHERE username=? AND is_active=1", (username,))
+    cur = con.execute("""
+        INSERT INTO saved_workout_plans
+        (username,plan_name,goal,duration_months,duration_weeks,plan_data,is_active,started_on,created_at)
+        VALUES(?,?,?,?,?,?,?,?,?)
+    """, (username, plan_name, goal, duration_months, duration_weeks, plan_blob or encode_plan(plan_data),
+          1 if set_active else 0, date.today().isoformat() if set_active else None, _now()))
+    plan_id = cur.lastrowid
+    plan_calendar.store_plan_structure(con, plan_id, plan_data)
+    if set_active:
+        plan_calendar.fill_calendar(con, username, plan_id)
+    return plan_id
 
 
-def get_active_workout_plan(username):
-    con = _conn()
+@cached
+def get_active_workout_plan(username) -> Optional[Plan]:
+    con = _read_conn()
     row = con.execute(
         "SELECT * FROM saved_workout_plans WHERE username=? AND is_active=1 ORDER BY created_at DESC LIMIT 1",
         (username,)
@@ -370,77 +675,242 @@ def get_active_workout_plan(username):
     con.close()
     if row:
         d = dict(row)
-        d["plan_data"] = json.loads(d["plan_data"])
+        d["plan_data"] = decode_plan(d["plan_data"])
         return d
     return None
 
 
-def get_all_workout_plans(username):
-    con = _conn()
+@cached
+def get_all_workout_plans(username) -> List[PlanSummary]:
+    con = _read_conn()
     rows = con.execute(
-        "SELECT id,plan_name,goal,duration_months,is_active,created_at FROM saved_workout_plans WHERE username=? ORDER BY created_at DESC",
+        "SELECT id,plan_name,goal,duration_months,duration_weeks,is_active,created_at FROM saved_workout_plans WHERE username=? ORDER BY created_at DESC",
         (username,)
     ).fetchall()
     con.close()
     return [dict(r) for r in rows]
 
 
-def get_workout_plan_by_id(plan_id):
-    con = _conn()
+_PLAN_SUMMARY_SQL = """
+    SELECT p.id, p.plan_name, p.goal, p.duration_months, p.duration_weeks,
+           p.is_active, p.started_on, p.created_at,
+           (SELECT json_group_array(json_object(
+                       'week', w.week_number, 'focus', w.focus,
+                       'training_days', (SELECT COUNT(*) FROM workout_plan_days d
+                                         WHERE d.plan_id = w.plan_id AND d.week_number = w.week_number
+                                           AND d.exercise_count > 0)))
+            FROM workout_plan_weeks w WHERE w.plan_id = p.id) AS outline
+    FROM saved_workout_plans p
+    WHERE p.username = ?
+"""
+
+
+def _with_outline(summaries):
+    for d in summaries:
+        d["outline"] = sorted(json.loads(d["outline"]), key=lambda w: w["week"])
+    return summaries
+
+
+@cached
+def get_workout_plan_summaries(username) -> List[PlanSummary]:
+    """
+    Every saved workout plan with a week-by-week outline, in one query and
+    without decoding any plan_data — for list pages. Each summary's "outline"
+    is [{"week", "focus", "training_days"}, ...]; load the full schedule with
+    get_workout_plan_by_id only when a plan is opened.
+    """
+    con = _read_conn()
+    rows = con.execute(_PLAN_SUMMARY_SQL + " ORDER BY p.created_at DESC, p.id DESC", (username,)).fetchall()
+    con.close()
+    return _with_outline([dict(r) for r in rows])
+
+
+@cached
+def get_workout_plan_summaries_page(username, after=None, limit=10) -> Page:
+    """get_workout_plan_summaries one keyset page at a time (see load_pages)."""
+    page = _read(_fetch_page, _PLAN_SUMMARY_SQL, "p.created_at", username, after, limit)
+    _with_outline(page["items"])
+    return page
+
+
+def get_workout_plan_by_id(plan_id) -> Optional[Plan]:
+    con = _read_conn()
     row = con.execute("SELECT * FROM saved_workout_plans WHERE id=?", (plan_id,)).fetchone()
     con.close()
     if row:
         d = dict(row)
-        d["plan_data"] = json.loads(d["plan_data"])
+        d["plan_data"] = decode_plan(d["plan_data"])
         return d
     return None
 
 
+@invalidates()
 def activate_workout_plan(username, plan_id):
-    con = _conn()
-    con.execute("UPDATE saved_workout_plans SET is_active=0 WHERE username=?", (username,))
-    con.execute("UPDATE saved_workout_plans SET is_active=1 WHERE id=?", (plan_id,))
-    con.commit(); con.close()
+    """Make an existing plan the active one, starting again from week 1 today."""
+    with _tx() as con:
+        con.execute("UPDATE saved_workout_plans SET is_active=0 WHERE username=? AND is_active=1", (username,))
+        cur = con.execute(
+            "UPDATE saved_workout_plans SET is_active=1, started_on=? WHERE id=? AND username=?",
+            (date.today().isoformat(), plan_id, username)
+        )
+        if cur.rowcount:
+            plan_calendar.fill_calendar(con, username, plan_id)
+
+
+@invalidates(None)
+def deactivate_workout_plan(plan_id):
+    """Archive a plan; its days from today on are taken off the calendar."""
+    with _tx() as con:
+        row = con.execute(
+            "SELECT username FROM saved_workout_plans WHERE id=? AND is_active=1", (plan_id,)
+        ).fetchone()
+        if row:
+            con.execute("UPDATE saved_workout_plans SET is_active=0 WHERE id=?", (plan_id,))
+            plan_calendar.clear_calendar(con, row["username"], date.today())
 
 
+@invalidates(None)
 def delete_workout_plan(plan_id):
-    con = _conn()
-    con.execute("DELETE FROM saved_workout_plans WHERE id=?", (plan_id,))
-    con.commit(); con.close()
+    with _tx() as con:
+        plan_calendar.delete_plan_structure(con, plan_id)
+        con.execute("DELETE FROM saved_workout_plans WHERE id=?", (plan_id,))
+
+
+def _fetch_today_workout(con, username, on):
+    row = con.execute("""
+        SELECT p.id AS plan_id, p.plan_name, p.duration_weeks, p.started_on,
+               c.week_number, c.day_id, d.day_label, d.focus, d.exercise_count,
+               (SELECT json_group_array(text) FROM
+                   (SELECT text FROM workout_plan_exercises WHERE day_id = c.day_id ORDER BY position)
+               ) AS exercises
+        FROM saved_workout_plans p
+        LEFT JOIN workout_calendar c
+               ON c.username = p.username AND c.cal_date = ? AND c.plan_id = p.id
+        LEFT JOIN workout_plan_days d ON d.id = c.day_id
+        WHERE p.username = ? AND p.is_active = 1
+    """, (on, username)).fetchone()
+    if not row:
+        return None
+    out = dict(row)
+    out["exercises"] = json.loads(out["exercises"])
+    return out
+
+
+# ──────────────────────────────────────────────────────────────
+# WORKOUT CALENDAR
+# ──────────────────────────────────────────────────────────────
+
+@cached
+def get_today_workout(username, on=None) -> Optional[TodayWorkout]:
+    """
+    The active plan and what it schedules for `on` (default today), from the
+    materialized calendar — no plan_data parsing. None without an active plan;
+    week_number is None once the plan has run its course.
+    """
+    return _read(_fetch_today_workout, username, (on or date.today()).isoformat())
+
+
+@cached
+def get_workout_adherence(username, start, end) -> dict:
+    """Planned vs completed workouts between two dates (inclusive), per day and in total."""
+    con = _read_conn()
+    rows = con.execute("""
+        SELECT c.cal_date, c.plan_id, c.week_number, d.focus,
+               COALESCE(d.exercise_count, 0) > 0 AS planned,
+               COALESCE(dd.workout_done, 0)      AS workout_done
+        FROM workout_calendar c
+        LEFT JOIN workout_plan_days d ON d.id = c.day_id
+        LEFT JOIN daily_diary dd ON dd.username = c.username AND dd.entry_date = c.cal_date
+        WHERE c.username = ? AND c.cal_date BETWEEN ? AND ?
+        ORDER BY c.cal_date
+    """, (username, str(start), str(end))).fetchall()
+    con.close()
+    days = [dict(r) for r in rows]
+    planned = sum(d["planned"] for d in days)
+    completed = sum(1 for d in days if d["planned"] and d["workout_done"])
+    return {
+        "planned": planned,
+        "completed": completed,
+        "rate": round(completed / planned * 100) if planned else None,
+        "days": days,
+    }
 
 
 # ──────────────────────────────────────────────────────────────
 # SAVED DIET PLANS
 # ──────────────────────────────────────────────────────────────
 
+@invalidates()
 def save_diet_plan(username, plan_name, goal, calories, plan_data, set_active=True):
-    con = _conn()
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    plan_blob = encode_plan(plan_data)
+    with _tx() as con:
+        _insert_diet_plan(con, username, plan_name, goal, calories, plan_data, set_active, plan_blob)
+
+
+def _insert_diet_plan(con, username, plan_name, goal, calories, plan_data, set_active=True, plan_blob=None):
     if set_active:
-        con.execute("UPDATE saved_diet_plans SET is_active=0 WHERE username=?", (username,))
-    con.execute("""
+        con.execute("UPDATE saved_diet_plans SET is_active=0 WHERE username=? AND is_active=1", (username,))
+    cur = con.execute("""
         INSERT INTO saved_diet_plans(username,plan_name,goal,calories,plan_data,is_active,created_at)
         VALUES(?,?,?,?,?,?,?)
-    """, (username, plan_name, goal, calories, json.dumps(plan_data), 1 if set_active else 0, now))
-    con.commit(); con.close()
-
-
-def get_active_diet_plan(username):
-    con = _conn()
+    """, (username, plan_name, goal, calories, plan_blob or encode_plan(plan_data),
+          1 if set_active else 0, _now()))
+    energy.recompute(con, username)   # on-plan days now count this plan's calories
+    return cur.lastrowid
+
+
+@invalidates()
+def save_batch_plans(username, batch, profile_id, workout, diet, set_active=True) -> bool:
+    """
+    Save one batch profile's workout and diet plan together (keyword arguments
+    of save_workout_plan / save_diet_plan, minus username and set_active).
+    A profile `batch` has already saved is left alone, so a resumed run
+    never saves it twice. Returns whether anything was saved.
+    """
+    workout_blob, diet_blob = encode_plan(workout["plan_data"]), encode_plan(diet["plan_data"])
+    with _tx() as con:
+        if con.execute("SELECT 1 FROM batch_plan_saves WHERE batch=? AND profile_id=?",
+                       (batch, profile_id)).fetchone():
+            return False
+        workout_id = _insert_workout_plan(con, username, set_active=set_active, plan_blob=workout_blob, **workout)
+        diet_id = _insert_diet_plan(con, username, set_active=set_active, plan_blob=diet_blob, **diet)
+        con.execute("""
+            INSERT INTO batch_plan_saves(batch,profile_id,username,workout_plan_id,diet_plan_id,saved_at)
+            VALUES(?,?,?,?,?,?)
+        """, (batch, profile_id, username, workout_id, diet_id, _now()))
+        return True
+
+
+def _fetch_active_diet_plan(con, username):
     row = con.execute(
         "SELECT * FROM saved_diet_plans WHERE username=? AND is_active=1 ORDER BY created_at DESC LIMIT 1",
         (username,)
     ).fetchone()
-    con.close()
     if row:
         d = dict(row)
-        d["plan_data"] = json.loads(d["plan_data"])
+        d["plan_data"] = decode_plan(d["plan_data"])
         return d
     return None
 
 
-def get_all_diet_plans(username):
-    con = _conn()
+@cached
+def get_active_diet_plan(username) -> Optional[Plan]:
+    return _read(_fetch_active_diet_plan, username)
+
+
+def todays_meals(diet_plan, on=None) -> list:
+    """The meals a diet plan lists for `on`'s weekday (default today)."""
+    if not diet_plan:
+        return []
+    day_name = (on or date.today()).strftime("%A").lower()
+    days = (diet_plan.get("plan_data") or {}).get("days", [])
+    day = next((d for d in days if d.get("day", "").lower() == day_name), None)
+    return day.get("meals", []) if day else []
+
+
+@cached
+def get_all_diet_plans(username) -> List[PlanSummary]:
+    con = _read_conn()
     rows = con.execute(
         "SELECT id,plan_name,goal,calories,is_active,created_at FROM saved_diet_plans WHERE username=? ORDER BY created_at DESC",
         (username,)
@@ -449,28 +919,39 @@ def get_all_diet_plans(username):
     return [dict(r) for r in rows]
 
 
+@cached
+def get_diet_plans_page(username, after=None, limit=10) -> Page:
+    """get_all_diet_plans one keyset page at a time (see load_pages)."""
+    return _read(_fetch_page,
+                 "SELECT id,plan_name,goal,calories,is_active,created_at FROM saved_diet_plans WHERE username = ?",
+                 "created_at", username, after, limit)
+
+
+@invalidates(None)
 def delete_diet_plan(plan_id):
-    con = _conn()
-    con.execute("DELETE FROM saved_diet_plans WHERE id=?", (plan_id,))
-    con.commit(); con.close()
+    with _tx() as con:
+        row = con.execute("SELECT username FROM saved_diet_plans WHERE id=?", (plan_id,)).fetchone()
+        con.execute("DELETE FROM saved_diet_plans WHERE id=?", (plan_id,))
+        if row:
+            energy.recompute(con, row["username"])
 
 
 # ──────────────────────────────────────────────────────────────
 # CANVAS / JOURNAL
 # ──────────────────────────────────────────────────────────────
 
+@invalidates()
 def save_canvas_entry(username, content, mood="", tags=""):
-    con = _conn()
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    con.execute(
-        "INSERT INTO canvas_entries(username,content,mood,tags,created_at) VALUES(?,?,?,?,?)",
-        (username, content, mood, tags, now)
-    )
-    con.commit(); con.close()
+    with _tx() as con:
+        con.execute(
+            "INSERT INTO canvas_entries(username,content,mood,tags,created_at) VALUES(?,?,?,?,?)",
+            (username, content, mood, tags, _now())
+        )
 
 
-def get_canvas_entries(username, limit=50):
-    con = _conn()
+@cached
+def get_canvas_entries(username, limit=50) -> List[CanvasEntry]:
+    con = _read_conn()
     rows = con.execute(
         "SELECT * FROM canvas_entries WHERE username=? ORDER BY created_at DESC LIMIT ?",
         (username, limit)
@@ -479,129 +960,370 @@ def get_canvas_entries(username, limit=50):
     return [dict(r) for r in rows]
 
 
+@cached
+def get_canvas_page(username, after=None, limit=20) -> Page:
+    """Journal entries, newest first, `limit` per page (see load_pages)."""
+    return _read(_fetch_page, "SELECT * FROM canvas_entries WHERE username = ?",
+                 "created_at", username, after, limit)
+
+
+@invalidates(None)
 def delete_canvas_entry(entry_id):
-    con = _conn()
-    con.execute("DELETE FROM canvas_entries WHERE id=?", (entry_id,))
-    con.commit(); con.close()
+    with _tx() as con:
+        con.execute("DELETE FROM canvas_entries WHERE id=?", (entry_id,))
 
 
 # ──────────────────────────────────────────────────────────────
 # DAILY WINS
 # ──────────────────────────────────────────────────────────────
 
+@invalidates()
 def save_wins(username, win_date, win1, win2, win3):
-    con = _conn()
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    # one wins record per day (upsert by deleting old then inserting)
-    con.execute("DELETE FROM daily_wins WHERE username=? AND win_date=?", (username, win_date))
-    con.execute(
-        "INSERT INTO daily_wins(username,win1,win2,win3,win_date,created_at) VALUES(?,?,?,?,?,?)",
-        (username, win1 or "", win2 or "", win3 or "", win_date, now)
-    )
-    con.commit(); con.close()
-
-
-def get_wins(username, limit=20):
-    con = _conn()
+    with _tx() as con:
+        # one wins record per day (upsert by deleting old then inserting)
+        con.execute("DELETE FROM daily_wins WHERE username=? AND win_date=?", (username, win_date))
+        con.execute(
+            "INSERT INTO daily_wins(username,win1,win2,win3,win_date,created_at) VALUES(?,?,?,?,?,?)",
+            (username, win1 or "", win2 or "", win3 or "", win_date, _now())
+        )
+
+
+@cached
+def get_wins(username, limit=20) -> List[DailyWins]:
+    con = _read_conn()
     rows = con.execute(
-        "SELECT * FROM daily_wins WHERE username=? ORDER BY win_date DESC LIMIT ?",
+        "SELECT * FROM daily_wins WHERE username=? ORDER BY win_date DESC, created_at DESC LIMIT ?",
         (username, limit)
     ).fetchall()
     con.close()
     return [dict(r) for r in rows]
 
 
+@cached
+def get_wins_page(username, after=None, limit=20) -> Page:
+    """
+    Daily wins, newest win_date first, `limit` per page (see load_pages).
+    Keyed on win_date rather than created_at: re-saving an old day's wins
+    re-inserts the row, which must not move it to the top.
+    """
+    return _read(_fetch_page, "SELECT * FROM daily_wins WHERE username = ?",
+                 "win_date", username, after, limit)
+
+
+@invalidates(None)
 def delete_wins(win_id):
-    con = _conn()
-    con.execute("DELETE FROM daily_wins WHERE id=?", (win_id,))
-    con.commit(); con.close()
+    with _tx() as con:
+        con.execute("DELETE FROM daily_wins WHERE id=?", (win_id,))
 
 
 # ──────────────────────────────────────────────────────────────
 # TO-DO
 # ──────────────────────────────────────────────────────────────
 
+@invalidates()
 def add_todo(username, todo_date, task_text):
-    con = _conn()
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    con.execute(
-        "INSERT INTO daily_todos(username,todo_date,task_text,is_done,created_at) VALUES(?,?,?,0,?)",
-        (username, todo_date, task_text, now)
-    )
-    con.commit(); con.close()
+    with _tx() as con:
+        con.execute(
+            "INSERT INTO daily_todos(username,todo_date,task_text,is_done,created_at) VALUES(?,?,?,0,?)",
+            (username, todo_date, task_text, _now())
+        )
 
 
-def get_todos(username, todo_date):
-    con = _conn()
+def _fetch_todos(con, username, todo_date):
     rows = con.execute(
         "SELECT * FROM daily_todos WHERE username=? AND todo_date=? ORDER BY created_at ASC",
         (username, todo_date)
     ).fetchall()
-    con.close()
     return [dict(r) for r in rows]
 
 
+@cached
+def get_todos(username, todo_date) -> List[Todo]:
+    return _read(_fetch_todos, username, todo_date)
+
+
+@invalidates(None)
 def toggle_todo(todo_id, is_done):
-    con = _conn()
-    con.execute("UPDATE daily_todos SET is_done=? WHERE id=?", (1 if is_done else 0, todo_id))
-    con.commit(); con.close()
+    with _tx() as con:
+        con.execute("UPDATE daily_todos SET is_done=? WHERE id=?", (1 if is_done else 0, todo_id))
 
 
+@invalidates(None)
 def delete_todo(todo_id):
-    con = _conn()
-    con.execute("DELETE FROM daily_todos WHERE id=?", (todo_id,))
-    con.commit(); con.close()
+    with _tx() as con:
+        con.execute("DELETE FROM daily_todos WHERE id=?", (todo_id,))
 
 
 # ──────────────────────────────────────────────────────────────
 # ANALYTICS HELPERS
 # ──────────────────────────────────────────────────────────────
 
-def get_streak(username):
-    con = _conn()
-    rows = con.execute(
-        "SELECT entry_date FROM daily_diary WHERE username=? ORDER BY entry_date DESC",
+def get_streak(username) -> int:
+    """Consecutive logged days ending today — one summary-row read (see streaks.py)."""
+    return get_streak_summary(username)["current"]
+
+
+def _fetch_streak_summary(con, username, on=None):
+    row = con.execute(
+        "SELECT run_start, last_logged, current_run, longest_run FROM user_streaks WHERE username=?",
         (username,)
+    ).fetchone()
+    return {
+        "current": streaks.current_streak(row, on),
+        "longest": row["longest_run"] if row else 0,
+        "last_logged": row["last_logged"] if row else None,
+    }
+
+
+@cached
+def get_streak_summary(username) -> StreakSummary:
+    return _read(_fetch_streak_summary, username)
+
+
+@invalidates()
+def rebuild_streaks(username=None) -> int:
+    """Recompute streak rows from daily_diary (one user, or everyone). Returns users rebuilt."""
+    with _tx() as con:
+        if username:
+            streaks.recompute(con, username)
+            return 1
+        return streaks.backfill(con)
+
+
+@cached
+def get_rollups(username, period="week", limit=12) -> List[dict]:
+    """
+    Newest `limit` weeks/months/quarters of diary averages, oldest first:
+    period_start, days_logged, avg_mood, avg_energy, avg_sleep, avg_water,
+    avg_steps, workouts_completed, days_diet_followed.
+    """
+    con = _read_conn()
+    rows = con.execute(
+        "SELECT * FROM diary_rollups WHERE username=? AND period=? ORDER BY period_start DESC LIMIT ?",
+        (username, period, limit)
     ).fetchall()
     con.close()
-    dates = [r["entry_date"] for r in rows]
-    if not dates:
-        return 0
-    streak = 0
-    check = date.today()
-    for ds in dates:
-        d = date.fromisoformat(ds)
-        if d == check:
-            streak += 1
-            check -= timedelta(days=1)
-        elif d == check + timedelta(days=1):
-            streak += 1
-            check = d - timedelta(days=1)
-        else:
-            break
-    return streak
+    return [rollups.averages(r) for r in reversed(rows)]
 
 
-def get_weekly_stats(username, week_start_str):
-    """Aggregate diary entries for a given week (Mon-Sun)."""
+@cached
+def get_weekly_stats(username, week_start_str, include_entries=True):
+    """Aggregates for a given week (Mon-Sun), read from the weekly rollup row."""
+    con = _read_conn()
+    row = con.execute(
+        "SELECT * FROM diary_rollups WHERE username=? AND period='week' AND period_start=?",
+        (username, week_start_str)
+    ).fetchone()
+    con.close()
+    if not row or not row["days_logged"]:
+        return None
+    stats = rollups.averages(row)
+    del stats["period_start"], stats["avg_steps"]
+    if include_entries:
+        we = date.fromisoformat(week_start_str) + timedelta(days=6)
+        stats["entries"] = get_diary_range(username, week_start_str, we.isoformat())
+    return stats
+
+
+def _fetch_energy_summary(con, username):
+    return energy.summary(energy.load(con, username), _fetch_active_goal(con, username))
+
+
+@cached
+def get_energy_summary(username) -> Optional[EnergySummary]:
+    """
+    Trend weight, weekly rate, adaptive TDEE (with its standard deviation)
+    and the projected date for the active goal's target weight; None before
+    the first weigh-in. Pass to engine.nutrition.calculate_nutritional_needs.
+    """
+    return _read(_fetch_energy_summary, username)
+
+
+@cached
+def get_insights(username) -> Optional[dict]:
+    """
+    Lagged cross-metric correlations, weekday adherence, rolling averages and
+    anomaly flags over the user's whole history (insights.py); None before
+    anything is logged. Computed once per data version: any write for the
+    user invalidates it.
+    """
+    return _read(insights.insights, username)
+
+
+@cached
+def get_series(username, metric, start=None, end=None, points=200, method="lttb") -> List[SeriesPoint]:
+    """
+    weight / mood / sleep / energy / water / steps between start and end
+    (default: all history), downsampled to at most `points` points — see
+    timeseries.py.
+    """
+    return _read(timeseries.series, username, metric, start, end, points, method)
+
+
+@invalidates()
+def rebuild_rollups(username=None) -> int:
+    """Recompute diary rollups from daily_diary and the archive (one user, or everyone). Returns rows written."""
+    with _tx() as con:
+        return rollups.rebuild(con, username)
+
+
+def get_weight_change(username, week_start_str):
+    """kg change from the last weigh-in before the week to the last one within it."""
+    changes = get_weekly_weight_changes(week_start_str, [username])
+    return changes.get(username, {}).get("weight_change")
+
+
+# ──────────────────────────────────────────────────────────────
+# SEARCH
+# ──────────────────────────────────────────────────────────────
+
+@cached
+def search_history(username, text, start=None, end=None, limit=20) -> List[SearchHit]:
+    """
+    Ranked full-text search over the user's diary notes, journal entries and
+    wins, optionally limited to entry dates start..end (inclusive).
+    """
+    return _read(search.search, username, text, start, end, None, limit)
+
+
+# ──────────────────────────────────────────────────────────────
+# USER SNAPSHOT (Smart Check-in dashboard)
+# ──────────────────────────────────────────────────────────────
+
+@cached
+def get_user_snapshot(username, on=None) -> UserSnapshot:
+    """
+    Everything the Smart Check-in page shows for `username` on `on` (default
+    today), read on one connection inside one read transaction so the parts
+    are consistent with each other: nine indexed reads, no per-part connect.
+    """
+    on = on or date.today()
+    day = on.isoformat()
+    con = _read_conn()
+    try:
+        con.execute("BEGIN")
+        diet = _fetch_active_diet_plan(con, username)
+        goal = _fetch_active_goal(con, username)
+        snapshot = {
+            "date": day,
+            "diary": _fetch_diary_entry(con, username, day),
+            "todos": _fetch_todos(con, username, day),
+            "streak": _fetch_streak_summary(con, username, on),
+            "goal": goal,
+            "latest_weight": _fetch_latest_weight(con, username),
+            "workout": _fetch_today_workout(con, username, day),
+            "diet": diet,
+            "today_meals": todays_meals(diet, on),
+            "latest_review": _fetch_latest_weekly_review(con, username),
+            "energy": energy.summary(energy.load(con, username), goal, on),
+        }
+        con.commit()
+    finally:
+        con.close()
+    return snapshot
+
+
+# ──────────────────────────────────────────────────────────────
+# COHORT ANALYTICS (admin dashboard)
+# ──────────────────────────────────────────────────────────────
+
+def get_cohort_report(days=90, cohort_weeks=12):
+    """
+    DAU / WAU / MAU over the last `days` days, weekly retention of the newest
+    `cohort_weeks` cohorts, the workout plan funnel and per-goal averages
+    (cohorts.py). Brings the summary tables up to date first — at most once
+    every cohorts.REFRESH_S seconds, and only the recent periods. The write
+    transaction is only opened when a refresh is due.
+    """
+    if _read(cohorts.due):
+        with _tx() as con:
+            cohorts.refresh(con)
+    return _read(cohorts.report, days, cohort_weeks, cohort_weeks)
+
+
+# ──────────────────────────────────────────────────────────────
+# BATCH (scheduled weekly review job)
+# ──────────────────────────────────────────────────────────────
+
+def get_weekly_stats_all(week_start_str):
+    """
+    Weekly aggregates for every user who logged at least one diary entry in
+    the week — one weekly rollup row per user. Same rules as get_weekly_stats:
+    empty/zero values are left out of the averages.
+    """
+    con = _read_conn()
+    rows = con.execute(
+        "SELECT * FROM diary_rollups WHERE period='week' AND period_start=? AND days_logged > 0",
+        (week_start_str,)
+    ).fetchall()
+    con.close()
+    out = {}
+    for r in rows:
+        d = rollups.averages(r)
+        del d["period_start"], d["avg_steps"]
+        out[r["username"]] = d
+    return out
+
+
+def get_weekly_weight_changes(week_start_str, usernames=None):
+    """
+    {username: {"weight_change": kg or None, "latest_weight": kg}} for users
+    with a weigh-in during the week. weight_change is None when there is no
+    earlier weigh-in to compare against.
+    """
     ws = date.fromisoformat(week_start_str)
     we = ws + timedelta(days=6)
-    entries = get_diary_range(username, week_start_str, we.isoformat())
-    if not entries:
-        return None
-    moods    = [e["mood"] for e in entries if e.get("mood")]
-    energies = [e["energy_level"] for e in entries if e.get("energy_level")]
-    sleeps   = [e["sleep_hours"] for e in entries if e.get("sleep_hours")]
-    waters   = [e["water_glasses"] for e in entries if e.get("water_glasses")]
-    workouts = sum(1 for e in entries if e.get("workout_done") == 1)
-    diets    = sum(1 for e in entries if e.get("diet_followed") == 1)
-    return {
-        "avg_mood":    round(sum(moods)/len(moods), 1) if moods else None,
-        "avg_energy":  round(sum(energies)/len(energies), 1) if energies else None,
-        "avg_sleep":   round(sum(sleeps)/len(sleeps), 1) if sleeps else None,
-        "avg_water":   round(sum(waters)/len(waters), 1) if waters else None,
-        "workouts_completed": workouts,
-        "days_diet_followed": diets,
-        "days_logged": len(entries),
-        "entries": entries,
-    }
+    sql = """
+        SELECT u.username,
+               (SELECT weight_kg FROM weight_log w
+                 WHERE w.username = u.username AND w.log_date <= :we
+                 ORDER BY w.log_date DESC LIMIT 1) AS end_weight,
+               (SELECT weight_kg FROM weight_log w
+                 WHERE w.username = u.username AND w.log_date < :ws
+                 ORDER BY w.log_date DESC LIMIT 1) AS prev_weight
+        FROM (SELECT DISTINCT username FROM weight_log
+              WHERE log_date BETWEEN :ws AND :we) u
+    """
+    params = {"ws": week_start_str, "we": we.isoformat()}
+    if usernames is not None:
+        names = list(usernames)
+        if not names:
+            return {}
+        marks = ",".join(f":u{i}" for i in range(len(names)))
+        sql += f" WHERE u.username IN ({marks})"
+        params.update({f"u{i}": n for i, n in enumerate(names)})
+    con = _read_conn()
+    rows = con.execute(sql, params).fetchall()
+    con.close()
+    out = {}
+    for r in rows:
+        change = None
+        if r["end_weight"] is not None and r["prev_weight"] is not None:
+            change = round(r["end_weight"] - r["prev_weight"], 2)
+        out[r["username"]] = {"weight_change": change, "latest_weight": r["end_weight"]}
+    return out
+
+
+def get_active_goals_all(usernames) -> Dict[str, Goal]:
+    """{username: goal dict} for the given users' active goals."""
+    names = list(usernames)
+    if not names:
+        return {}
+    con = _read_conn()
+    rows = con.execute(f"""
+        SELECT * FROM user_goals
+        WHERE is_active=1 AND username IN ({",".join("?" * len(names))})
+        ORDER BY created_at ASC
+    """, names).fetchall()
+    con.close()
+    # ascending order: the newest active goal wins
+    return {r["username"]: dict(r) for r in rows}
+
+
+def get_weekly_reviews_for_week(week_start_str) -> List[WeeklyReview]:
+    con = _read_conn()
+    rows = con.execute(
+        "SELECT * FROM weekly_reviews WHERE week_start=?", (week_start_str,)
+    ).fetchall()
+    con.close()
+    return [dict(r) for r in rows]
@@ -0,0 +1,242 @@
+"""
+energy.py
+Adaptive energy-expenditure (TDEE) and weight-trend estimate per user, kept
+in the energy_state summary row.
+
+    energy_state(username, trend_kg, trend_date, slope_kg_day, tdee, tdee_var,
+                 intake_kcal, intake_days, intake_last, weigh_ins)
+
+Each weigh-in moves an exponentially smoothed trend weight (TREND_ALPHA per
+day) and its slope. Diet-followed diary days since the last weigh-in add the
+calories of the diet plan followed that day (the newest one saved on or
+before it) to an intake tally. At the next weigh-in the interval gives one
+measurement of expenditure —
+
+    measured = mean intake - KCAL_PER_KG * trend change per day
+
+— which updates the TDEE estimate like a one-dimensional Kalman filter: the
+estimate's variance grows with time (TDEE_DRIFT_SD) and each measurement is
+weighted by how many days of the interval were on-plan.
+
+Weigh-ins after the last one and diary days on/after it are O(1) updates made
+inside the write's transaction. Anything else (a back-dated or edited
+weigh-in, an edited closed interval, bulk imports, diet plan changes)
+recomputes the user's row by replaying their history, including the on-plan
+days pruned into the archive (archived_diary_runs, see archive.py).
+
+Every function takes an open connection so it runs inside the caller's
+transaction (database_tracker and migrations).
+"""
+
+import bisect
+from datetime import date, timedelta
+
+KCAL_PER_KG = 7700           # energy in one kg of body-weight change
+TREND_ALPHA = 0.1            # per-day smoothing of the trend weight
+SLOPE_BETA = 0.15            # per-day smoothing of the trend slope
+PRIOR_KCAL_PER_KG = 32       # starting guess: TDEE ≈ 32 kcal per kg
+PRIOR_SD = 600               # ...with this much uncertainty (kcal)
+TDEE_DRIFT_SD = 15           # how far true TDEE may drift per day (kcal)
+MEASURE_SD = 400             # noise of one fully on-plan interval's measurement (kcal)
+CONFIDENT_SD = 250           # below this the estimate beats the formula on its own
+
+_COLUMNS = ("trend_kg", "trend_date", "slope_kg_day", "tdee", "tdee_var",
+            "intake_kcal", "intake_days", "intake_last", "weigh_ins")
+
+
+# ──────────────────────────────────────────────────────────────
+# FILTER STEPS (pure: state dict in, state dict out)
+# ──────────────────────────────────────────────────────────────
+
+def _days(a, b):
+    return date.fromisoformat(b[:10]).toordinal() - date.fromisoformat(a[:10]).toordinal()
+
+
+def _first(day, kg):
+    return {"trend_kg": kg, "trend_date": day, "slope_kg_day": 0.0,
+            "tdee": PRIOR_KCAL_PER_KG * kg, "tdee_var": PRIOR_SD ** 2,
+            "intake_kcal": 0.0, "intake_days": 0, "intake_last": None, "weigh_ins": 1}
+
+
+def weigh_in(state, day, kg):
+    """Fold a weigh-in on `day` (after state["trend_date"]) into `state`."""
+    if state is None:
+        return _first(day, kg)
+    dt = _days(state["trend_date"], day)
+    alpha = 1 - (1 - TREND_ALPHA) ** dt
+    beta = 1 - (1 - SLOPE_BETA) ** dt
+    trend = state["trend_kg"] + alpha * (kg - state["trend_kg"])
+    observed_slope = (trend - state["trend_kg"]) / dt
+    tdee, var = state["tdee"], state["tdee_var"] + TDEE_DRIFT_SD ** 2 * dt
+    # Intake counts for days in [previous weigh-in, this one)
+    coverage = min(state["intake_days"] / dt, 1.0)
+    if coverage > 0:
+        measured = state["intake_kcal"] / state["intake_days"] - KCAL_PER_KG * observed_slope
+        r = MEASURE_SD ** 2 / coverage
+        gain = var / (var + r)
+        tdee += gain * (measured - tdee)
+        var *= 1 - gain
+    return {"trend_kg": trend, "trend_date": day,
+            "slope_kg_day": state["slope_kg_day"] + beta * (observed_slope - state["slope_kg_day"]),
+            "tdee": tdee, "tdee_var": var,
+            "intake_kcal": 0.0, "intake_days": 0, "intake_last": None,
+            "weigh_ins": state["weigh_ins"] + 1}
+
+
+def intake(state, day, kcal, sign=1):
+    """Add (sign=1) or remove (sign=-1) one on-plan day of `kcal` in the open interval."""
+    state = dict(state)
+    state["intake_kcal"] += sign * kcal
+    state["intake_days"] += sign
+    if sign > 0 and (state["intake_last"] is None or day > state["intake_last"]):
+        state["intake_last"] = day
+    return state
+
+
+# ──────────────────────────────────────────────────────────────
+# PERSISTENCE
+# ──────────────────────────────────────────────────────────────
+
+_UPSERT = f"""
+    INSERT INTO energy_state(username, {", ".join(_COLUMNS)}, updated_at)
+    VALUES(?, {", ".join("?" * len(_COLUMNS))}, datetime('now', 'localtime'))
+    ON CONFLICT(username) DO UPDATE SET
+        {", ".join(f"{c}=excluded.{c}" for c in _COLUMNS)}, updated_at=excluded.updated_at
+"""
+
+
+def load(con, username):
+    row = con.execute(f"SELECT {', '.join(_COLUMNS)} FROM energy_state WHERE username = ?",
+                      (username,)).fetchone()
+    return dict(zip(_COLUMNS, row)) if row else None
+
+
+def _save(con, username, state):
+    if state is None:
+        con.execute("DELETE FROM energy_state WHERE username = ?", (username,))
+    else:
+        con.execute(_UPSERT, [username] + [state[c] for c in _COLUMNS])
+
+
+def _plan_kcal(con, username, day):
+    """Calories of the newest diet plan saved on or before `day` (None if there is none)."""
+    row = con.execute(
+        "SELECT calories FROM saved_diet_plans WHERE username = ? AND calories > 0 AND created_at < ? "
+        "ORDER BY created_at DESC LIMIT 1",
+        (username, (date.fromisoformat(day[:10]) + timedelta(days=1)).isoformat())
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _archived_followed(con, username):
+    """On-plan days pruned into the archive (archived_diary_runs), minus days back in daily_diary."""
+    runs = con.execute("SELECT run_start, run_end FROM archived_diary_runs WHERE username = ? AND kind = 'diet'",
+                       (username,)).fetchall()
+    if not runs:
+        return []
+    hot = {r[0] for r in con.execute("SELECT entry_date FROM daily_diary WHERE username = ? AND entry_date <= ?",
+                                     (username, max(r[1] for r in runs)))}
+    days = []
+    for start, end in runs:
+        for n in range(_days(start, end) + 1):
+            day = (date.fromisoformat(start) + timedelta(days=n)).isoformat()
+            if day not in hot:
+                days.append((day,))
+    return days
+
+
+def recompute(con, username):
+    """Rebuild one user's row by replaying their weigh-ins and diet-followed days (archived ones too)."""
+    weights = con.execute("SELECT log_date, weight_kg FROM weight_log WHERE username = ? ORDER BY log_date",
+                          (username,)).fetchall()
+    followed = con.execute("SELECT entry_date FROM daily_diary WHERE username = ? AND diet_followed = 1",
+                           (username,)).fetchall() + _archived_followed(con, username)
+    plans = con.execute("SELECT created_at, calories FROM saved_diet_plans WHERE username = ? "
+                        "AND calories > 0 ORDER BY created_at", (username,)).fetchall()
+    plan_days = [p[0][:10] for p in plans]
+    events = [(w[0], 0, w[1]) for w in weights]       # weigh-ins sort before same-day intake
+    for (day,) in followed:
+        i = bisect.bisect_right(plan_days, day)
+        if i:
+            events.append((day, 1, plans[i - 1][1]))
+    state = None
+    for day, kind, value in sorted(events):
+        if kind == 0:
+            state = weigh_in(state, day, value)
+        elif state is not None:
+            state = intake(state, day, value)
+    _save(con, username, state)
+
+
+def backfill(con):
+    """Recompute every user who has weigh-ins. Returns the number of users."""
+    users = [r[0] for r in con.execute("SELECT DISTINCT username FROM weight_log")]
+    con.execute("DELETE FROM energy_state")
+    for username in users:
+        recompute(con, username)
+    return len(users)
+
+
+def record_weight(con, username, day, kg):
+    """Account for a weigh-in just written (new or changed)."""
+    state = load(con, username)
+    if state is not None and (day <= state["trend_date"]
+                              or (state["intake_last"] and state["intake_last"] >= day)):
+        return recompute(con, username)   # lands inside history already folded in
+    _save(con, username, weigh_in(state, day, kg))
+
+
+def record_diary(con, username, day, old_row, new_row):
+    """Account for a diary upsert whose diet_followed went from old_row's to new_row's."""
+    was = bool(old_row) and old_row.get("diet_followed") == 1
+    now = bool(new_row) and new_row.get("diet_followed") == 1
+    if was == now:
+        return
+    state = load(con, username)
+    if state is None:
+        return                            # intake before the first weigh-in carries no signal
+    if day < state["trend_date"]:
+        return recompute(con, username)   # a closed interval changed
+    kcal = _plan_kcal(con, username, day)
+    if kcal:
+        _save(con, username, intake(state, day, kcal, 1 if now else -1))
+
+
+# ──────────────────────────────────────────────────────────────
+# READ-SIDE
+# ──────────────────────────────────────────────────────────────
+
+def summary(state, goal=None, today=None):
+    """
+    What the UI and the diet generators use: trend weight, weekly rate, TDEE
+    estimate and its standard deviation (`measured` once at least one
+    weigh-in interval has corrected the prior), and — for a goal with a target
+    weight — the date the current trend reaches it (None if it is moving the
+    wrong way or not at all).
+    """
+    if not state:
+        return None
+    today = today or date.today()
+    sd = state["tdee_var"] ** 0.5
+    out = {"trend_kg": round(state["trend_kg"], 2), "trend_date": state["trend_date"],
+           "rate_kg_week": round(state["slope_kg_day"] * 7, 2),
+           "tdee": round(state["tdee"]), "tdee_sd": round(sd), "confident": sd < CONFIDENT_SD,
+           # until an intake interval has updated it, tdee is just the per-kg prior
+           "measured": state["weigh_ins"] >= 2 and state["tdee_var"] < PRIOR_SD ** 2,
+           "weigh_ins": state["weigh_ins"], "projected_date": None, "days_to_goal": None}
+    target = (goal or {}).get("target_weight")
+    if target:
+        remaining = target - state["trend_kg"]
+        slope = state["slope_kg_day"]
+        start = goal.get("start_weight") or state["trend_kg"]
+        if abs(remaining) < 0.1 or (target - start) * remaining < 0:
+            # at the target, or already past it in the goal's direction
+            out["projected_date"], out["days_to_goal"] = today.isoformat(), 0
+        elif slope and remaining / slope > 0:
+            days = round(remaining / slope)
+            if days <= 3650:
+                since = (today - date.fromisoformat(state["trend_date"])).days
+                days = max(days - since, 0)
+                out["days_to_goal"] = days
+                out["projected_date"] = (today + timedelta(days=days)).isoformat()
+    return out
@@ -1,12 +1,24 @@
 """
 AI API Handler for RoutineX
 Supports separate API keys and Native JSON Mode for stability.
+
+The provider calls are natively async (Gemini's `generate_content_async`,
+OpenAI's `AsyncOpenAI`), so one process can keep hundreds of generations in
+flight. `generate_with_ai` is a thin sync wrapper for the Streamlit pages.
 """
 
 import os
 import json
+import asyncio
+import threading
+import weakref
 import google.generativeai as genai
+from google.ai import generativelanguage as glm
 from dotenv import load_dotenv
+from .telemetry import (
+    CallTimer, record_llm_call, FEATURE_GENERAL,
+    OUTCOME_OK, OUTCOME_ERROR, OUTCOME_EMPTY,
+)
 
 load_dotenv()
 
@@ -18,94 +30,260 @@ MODELS_TO_TRY = [
     'gemini-flash-latest'
 ]
 
-def generate_with_ai(prompt, max_tokens=8192, key_type='workout', json_mode=False):
+# Upper bound on provider calls in flight per event loop (override via .env)
+MAX_CONCURRENT_CALLS = int(os.getenv("AI_MAX_CONCURRENCY", "64"))
+
+# Optional cap on provider calls started per minute (0 = unlimited).
+# Batch jobs lower this with set_rate_limit() to stay inside provider quotas.
+_rate_limit = {"rpm": int(os.getenv("AI_MAX_CALLS_PER_MINUTE", "0"))}
+
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+]
+
+# asyncio primitives and async HTTP/gRPC clients are bound to the loop that
+# created them, and every sync wrapper call runs on a fresh loop.
+_loop_semaphores = weakref.WeakKeyDictionary()
+_loop_openai_clients = weakref.WeakKeyDictionary()
+_loop_rate_limiters = weakref.WeakKeyDictionary()
+_loop_gemini_clients = weakref.WeakKeyDictionary()
+
+
+def generate_with_ai(prompt, max_tokens=8192, key_type='workout', json_mode=False, models=None,
+                     feature=FEATURE_GENERAL, attempt=1):
     """
     Generate content using available AI APIs.
-    
+
     Args:
         prompt: The prompt to send to the AI
         max_tokens: Maximum tokens in response
-        key_type: Either 'workout' or 'diet'
-        json_mode: If True, forces the model to output valid JSON (Gemini only)
+        key_type: 'diet' for GEMINI_API_KEY_DIET, anything else ('workout',
+            'coach', ...) for GEMINI_API_KEY_WORKOUT; both fall back to GEMINI_API_KEY
+        json_mode: If True, forces the model to output valid JSON
+        models: Optional list of Gemini models to try instead of MODELS_TO_TRY
+        feature: Telemetry label of the calling feature (see engine.telemetry)
+        attempt: Caller-level retry number, recorded with every provider call
     """
-    
+    return run_sync(agenerate_with_ai(prompt, max_tokens, key_type, json_mode, models, feature, attempt))
+
+
+async def agenerate_with_ai(prompt, max_tokens=8192, key_type='workout', json_mode=False, models=None,
+                            feature=FEATURE_GENERAL, attempt=1):
+    """Async version of `generate_with_ai`. Returns (success, text, error)."""
+
     # 1. SELECT API KEY
-    if key_type == 'diet':
-        gemini_key = os.getenv("GEMINI_API_KEY_DIET") or os.getenv("GEMINI_API_KEY")
-    else:
-        gemini_key = os.getenv("GEMINI_API_KEY_WORKOUT") or os.getenv("GEMINI_API_KEY")
-    
+    gemini_key = _select_gemini_key(key_type)
+    call_info = {"feature": feature, "key_type": key_type, "attempt": attempt}
+
     gemini_error = None
-    
+
     # 2. TRY GEMINI
     if gemini_key:
-        success, response, error = _generate_with_gemini(prompt, gemini_key, max_tokens, json_mode)
+        success, response, error = await _agenerate_with_gemini(
+            prompt, gemini_key, max_tokens, json_mode, models or MODELS_TO_TRY, call_info
+        )
         if success:
             return True, response, None
         gemini_error = error
     else:
         gemini_error = f"No GEMINI_API_KEY_{key_type.upper()} found in .env"
-    
+
     # 3. FALLBACK TO OPENAI (If configured)
     openai_key = os.getenv("OPENAI_API_KEY")
     if openai_key:
-        success, response, error = _generate_with_openai(prompt, openai_key, max_tokens, json_mode)
+        success, response, error = await _agenerate_with_openai(prompt, openai_key, max_tokens, json_mode, call_info)
         if success:
             return True, response, None
         return False, None, {"gemini_error": gemini_error, "openai_error": error}
-    
+
     return False, None, {"error": "No working API key found", "details": gemini_error}
 
 
-def _generate_with_gemini(prompt, api_key, max_tokens, json_mode):
-    """Try to generate with Gemini API using JSON mode if requested"""
+async def gather_bounded(coros, limit=None):
+    """
+    `asyncio.gather` with at most `limit` of the given coroutines running at once.
+    Results come back in input order. Provider calls are additionally capped by
+    MAX_CONCURRENT_CALLS regardless of `limit`.
+    """
+    if not limit:
+        return await asyncio.gather(*coros)
+    sem = asyncio.Semaphore(limit)
+
+    async def _bounded(coro):
+        async with sem:
+            return await coro
+
+    return await asyncio.gather(*(_bounded(c) for c in coros))
+
+
+def set_rate_limit(calls_per_minute):
+    """Cap provider calls started per minute across the process (0/None = unlimited)."""
+    _rate_limit["rpm"] = int(calls_per_minute or 0)
+    _loop_rate_limiters.clear()
+
+
+class AsyncRateLimiter:
+    """Spaces acquisitions evenly so at most `per_minute` start in any minute."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def run_sync(coro):
+    """Run a coroutine to completion from synchronous code."""
     try:
-        genai.configure(api_key=api_key)
-        
-        generation_config = {
-            'temperature': 0.7,
-            'top_p': 0.95,
-            'top_k': 40,
-            'max_output_tokens': max_tokens,
-        }
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
 
-        # ENABLE NATIVE JSON MODE
-        if json_mode:
-            generation_config['response_mime_type'] = 'application/json'
-        
-        safety_settings = [
-            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-        ]
-        
+    # Called from inside a running loop (e.g. a notebook): use a helper thread.
+    outcome = {}
+
+    def _runner():
+        try:
+            outcome["value"] = asyncio.run(coro)
+        except BaseException as e:
+            outcome["error"] = e
+
+    worker = threading.Thread(target=_runner)
+    worker.start()
+    worker.join()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["value"]
+
+
+def _select_gemini_key(key_type):
+    if key_type == 'diet':
+        return os.getenv("GEMINI_API_KEY_DIET") or os.getenv("GEMINI_API_KEY")
+    return os.getenv("GEMINI_API_KEY_WORKOUT") or os.getenv("GEMINI_API_KEY")
+
+
+async def _throttle():
+    if not _rate_limit["rpm"]:
+        return
+    loop = asyncio.get_running_loop()
+    limiter = _loop_rate_limiters.get(loop)
+    if limiter is None:
+        limiter = AsyncRateLimiter(_rate_limit["rpm"])
+        _loop_rate_limiters[loop] = limiter
+    await limiter.acquire()
+
+
+def _call_semaphore():
+    loop = asyncio.get_running_loop()
+    sem = _loop_semaphores.get(loop)
+    if sem is None:
+        sem = asyncio.Semaphore(MAX_CONCURRENT_CALLS)
+        _loop_semaphores[loop] = sem
+    return sem
+
+
+def _gemini_client(api_key):
+    """
+    This loop's async Generative Language client for `api_key`. The key goes
+    into the client itself rather than through genai.configure(), whose
+    process-global client sync wrappers on other threads would swap.
+    """
+    loop = asyncio.get_running_loop()
+    clients = _loop_gemini_clients.setdefault(loop, {})
+    if api_key not in clients:
+        clients[api_key] = glm.GenerativeServiceAsyncClient(client_options={"api_key": api_key})
+    return clients[api_key]
+
+
+async def _gemini_generate(model_name, api_key, prompt, generation_config):
+    request = glm.GenerateContentRequest(
+        model=f"models/{model_name}",
+        contents=[glm.Content(role="user", parts=[glm.Part(text=prompt)])],
+        generation_config=glm.GenerationConfig(**generation_config),
+        safety_settings=[glm.SafetySetting(**s) for s in SAFETY_SETTINGS],
+    )
+    response = await _gemini_client(api_key).generate_content(request=request)
+    return genai.types.GenerateContentResponse.from_response(response)
+
+
+def _gemini_generation_config(max_tokens, json_mode):
+    generation_config = {
+        'temperature': 0.7,
+        'top_p': 0.95,
+        'top_k': 40,
+        'max_output_tokens': max_tokens,
+    }
+
+    # ENABLE NATIVE JSON MODE
+    if json_mode:
+        generation_config['response_mime_type'] = 'application/json'
+    return generation_config
+
+
+async def _agenerate_with_gemini(prompt, api_key, max_tokens, json_mode, models, call_info):
+    """Try to generate with Gemini API using JSON mode if requested"""
+    try:
+        generation_config = _gemini_generation_config(max_tokens, json_mode)
         last_error = None
-        
-        for model_name in MODELS_TO_TRY:
+
+        for model_name in models:
+            timer = CallTimer()
             try:
-                model = genai.GenerativeModel(model_name, generation_config=generation_config)
-                response = model.generate_content(prompt, safety_settings=safety_settings)
-                
-                if response and response.text:
-                    return True, response.text, None
-                    
+                await _throttle()
+                async with _call_semaphore():
+                    with timer:
+                        response = await _gemini_generate(model_name, api_key, prompt, generation_config)
+
+                usage = getattr(response, "usage_metadata", None)
+                text = response.text if response else None
+                record_llm_call(
+                    provider="gemini", model=model_name, latency_ms=timer.ms,
+                    outcome=OUTCOME_OK if text else OUTCOME_EMPTY,
+                    prompt_tokens=getattr(usage, "prompt_token_count", None),
+                    response_tokens=getattr(usage, "candidates_token_count", None),
+                    **call_info
+                )
+                if text:
+                    return True, text, None
+
             except Exception as e:
                 last_error = str(e)
+                record_llm_call(provider="gemini", model=model_name, latency_ms=timer.ms,
+                                outcome=OUTCOME_ERROR, error=last_error, **call_info)
                 continue
-                
+
         return False, None, f"All models failed. Last error: {last_error}"
 
     except Exception as e:
         return False, None, f"Gemini setup error: {str(e)}"
 
 
-def _generate_with_openai(prompt, api_key, max_tokens, json_mode):
+def _openai_client(api_key):
+    from openai import AsyncOpenAI
+    loop = asyncio.get_running_loop()
+    clients = _loop_openai_clients.setdefault(loop, {})
+    if api_key not in clients:
+        clients[api_key] = AsyncOpenAI(api_key=api_key)
+    return clients[api_key]
+
+
+async def _agenerate_with_openai(prompt, api_key, max_tokens, json_mode, call_info):
     """Try to generate with OpenAI API"""
+    timer = CallTimer()
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=api_key)
-        
+        client = _openai_client(api_key)
+
         # Force JSON object response for OpenAI if requested
         kwargs = {
             "model": "gpt-4o-mini",
@@ -116,16 +294,30 @@ def _generate_with_openai(prompt, api_key, max_tokens, json_mode):
             "temperature": 0.7,
             "max_tokens": max_tokens,
         }
-        
+
         if json_mode:
             kwargs["response_format"] = {"type": "json_object"}
 
-        response = client.chat.completions.create(**kwargs)
-        
-        if response.choices and response.choices[0].message.content:
-            return True, response.choices[0].message.content, None
+        await _throttle()
+        async with _call_semaphore():
+            with timer:
+                response = await client.chat.completions.create(**kwargs)
+
+        content = response.choices[0].message.content if response.choices else None
+        usage = getattr(response, "usage", None)
+        record_llm_call(
+            provider="openai", model=kwargs["model"], latency_ms=timer.ms,
+            outcome=OUTCOME_OK if content else OUTCOME_EMPTY,
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            response_tokens=getattr(usage, "completion_tokens", None),
+            **call_info
+        )
+        if content:
+            return True, content, None
         else:
             return False, None, "OpenAI returned empty response"
-            
+
     except Exception as e:
-        return False, None, f"OpenAI error: {str(e)}"
\ No newline at end of file
+        record_llm_call(provider="openai", model="gpt-4o-mini", latency_ms=timer.ms,
+                        outcome=OUTCOME_ERROR, error=str(e), **call_info)
+        return False, None, f"OpenAI error: {str(e)}"
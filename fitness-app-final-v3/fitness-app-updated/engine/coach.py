@@ -0,0 +1,186 @@
+"""
+Short-form coaching text for RoutineX: AI weekly reviews and Mind Reset
+affirmations. Sync functions are thin wrappers over the async versions.
+"""
+
+import os
+import json
+from .ai_handler import agenerate_with_ai, gather_bounded, run_sync
+from .telemetry import FEATURE_WEEKLY_REVIEW, FEATURE_AFFIRMATION, record_parse_failure
+
+REVIEW_MODELS = ['gemini-2.5-flash']
+AFFIRMATION_MODELS = ['gemini-1.5-flash']
+
+DEFAULT_REVIEW = ("Great effort this week! Keep logging your progress.", "Stay consistent — every day counts.", True)
+NO_KEY_REVIEW = ("Keep up the great work this week!", "Stay consistent with your plan.", True)
+
+AFFIRMATION_PROMPT = "One short, stoic, powerful sentence about focus. Max 12 words."
+AFFIRMATION_MOODS = ["focus", "energy", "calm", "drive"]
+AFFIRMATION_THEMES = ["discipline", "resilience", "focus", "gratitude", "growth", "rest"]
+AFFIRMATION_MAX_WORDS = 14
+DEFAULT_AFFIRMATION = "The obstacle is the way."
+NO_KEY_AFFIRMATION = "Discipline is freedom."
+
+# Fan-out used by the batch helpers below
+BATCH_CONCURRENCY = 32
+
+
+def _has_api_key():
+    return bool(os.getenv("GEMINI_API_KEY") or os.getenv("OPENAI_API_KEY"))
+
+
+# ─────────────────────────────────────────────────────────────
+# WEEKLY REVIEW
+# ─────────────────────────────────────────────────────────────
+
+def _weekly_review_prompt(stats, goal, latest_weight, start_weight, target_date_str):
+    weight_delta = ""
+    if latest_weight and start_weight:
+        delta = latest_weight - start_weight
+        weight_delta = f"Current weight: {latest_weight} kg (started at {start_weight} kg, delta: {delta:+.1f} kg)."
+
+    goal_info = ""
+    if goal:
+        goal_info = (f"Goal: {goal.get('description','')}, "
+                     f"Target weight: {goal.get('target_weight','N/A')} kg by {target_date_str}.")
+
+    return f"""
+You are a supportive fitness coach reviewing a user's weekly data.
+Be concise, warm, motivating. Use 2-3 sentences max per section.
+
+WEEKLY DATA:
+- Days logged: {stats.get('days_logged',0)}/7
+- Avg Mood: {stats.get('avg_mood','N/A')}/5
+- Avg Energy: {stats.get('avg_energy','N/A')}/5
+- Avg Sleep: {stats.get('avg_sleep','N/A')} hrs
+- Avg Water: {stats.get('avg_water','N/A')} glasses
+- Workouts completed: {stats.get('workouts_completed',0)} days
+- Diet followed: {stats.get('days_diet_followed',0)} days
+{weight_delta}
+{goal_info}
+
+OUTPUT (JSON only, no markdown):
+{{
+  "summary": "2-3 sentence summary of the week",
+  "suggestion": "1-2 specific actionable next-step recommendations",
+  "on_track": true or false
+}}
+"""
+
+
+def generate_ai_weekly_review(username, stats, goal, latest_weight, start_weight, target_weight, target_date_str):
+    """Call Gemini to produce a short weekly summary + suggestion (None on failure)."""
+    return run_sync(agenerate_ai_weekly_review(
+        username, stats, goal, latest_weight, start_weight, target_weight, target_date_str
+    ))
+
+
+async def agenerate_ai_weekly_review(username, stats, goal, latest_weight, start_weight, target_weight, target_date_str):
+    """
+    Async version of `generate_ai_weekly_review`. Returns (summary,
+    suggestion, on_track), or None when no review could be generated (no
+    key, provider failure, unparsable reply). Show fallback_review() then,
+    but don't save it as the week's review, so the next run retries.
+    """
+    if not _has_api_key():
+        return None
+    try:
+        prompt = _weekly_review_prompt(stats, goal, latest_weight, start_weight, target_date_str)
+        success, txt, _ = await agenerate_with_ai(
+            prompt, max_tokens=1024, key_type='coach', models=REVIEW_MODELS,
+            feature=FEATURE_WEEKLY_REVIEW
+        )
+        if not success:
+            return None
+        txt = txt.strip().strip("```json").strip("```").strip()
+        data = json.loads(txt)
+        return data.get("summary",""), data.get("suggestion",""), data.get("on_track",True)
+    except json.JSONDecodeError as e:
+        record_parse_failure(FEATURE_WEEKLY_REVIEW, error=str(e))
+        return None
+    except Exception:
+        return None
+
+
+def fallback_review():
+    """Generic (summary, suggestion, on_track) to show when generation returned None."""
+    return DEFAULT_REVIEW if _has_api_key() else NO_KEY_REVIEW
+
+
+async def agenerate_ai_weekly_reviews(requests, concurrency=BATCH_CONCURRENCY):
+    """
+    Generate many weekly reviews at once.
+    `requests` is a list of kwargs dicts for `agenerate_ai_weekly_review`;
+    results (None for failures) are returned in the same order.
+    """
+    return await gather_bounded(
+        [agenerate_ai_weekly_review(**r) for r in requests],
+        limit=concurrency,
+    )
+
+
+# ─────────────────────────────────────────────────────────────
+# AFFIRMATIONS
+# ─────────────────────────────────────────────────────────────
+
+def get_affirmation():
+    return run_sync(aget_affirmation())
+
+
+async def aget_affirmation():
+    if not _has_api_key():
+        return NO_KEY_AFFIRMATION
+    success, txt, _ = await agenerate_with_ai(
+        AFFIRMATION_PROMPT, max_tokens=64, key_type='coach', models=AFFIRMATION_MODELS,
+        feature=FEATURE_AFFIRMATION
+    )
+    if success and txt:
+        return txt.strip()
+    return DEFAULT_AFFIRMATION
+
+
+async def aget_affirmations(count, concurrency=BATCH_CONCURRENCY):
+    """Generate `count` independent affirmations concurrently."""
+    return await gather_bounded(
+        [aget_affirmation() for _ in range(count)],
+        limit=concurrency,
+    )
+
+
+async def agenerate_affirmation_batch(count=200):
+    """
+    One call that returns up to `count` tagged affirmations:
+    [{"text": ..., "mood": ..., "theme": ...}]. Invalid items are dropped.
+    """
+    if not _has_api_key():
+        return []
+    prompt = f"""Write {count} distinct, short, stoic, powerful sentences for a focus and
+wellbeing app. Max 12 words each. No numbering, no hashtags, no quotes from famous people.
+Spread them evenly over these moods: {", ".join(AFFIRMATION_MOODS)}
+and these themes: {", ".join(AFFIRMATION_THEMES)}.
+
+Return ONLY valid JSON:
+{{"affirmations": [{{"text": "Sentence.", "mood": "{AFFIRMATION_MOODS[0]}", "theme": "{AFFIRMATION_THEMES[0]}"}}]}}"""
+
+    success, txt, _ = await agenerate_with_ai(
+        prompt, max_tokens=8192, key_type='coach', json_mode=True, feature=FEATURE_AFFIRMATION
+    )
+    if not success:
+        return []
+    try:
+        items = json.loads(txt).get("affirmations", [])
+    except (json.JSONDecodeError, AttributeError) as e:
+        record_parse_failure(FEATURE_AFFIRMATION, error=str(e))
+        return []
+
+    out = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        text = str(item.get("text", "")).strip().strip('"').strip()
+        if not text or len(text.split()) > AFFIRMATION_MAX_WORDS:
+            continue
+        mood = item.get("mood") if item.get("mood") in AFFIRMATION_MOODS else None
+        theme = item.get("theme") if item.get("theme") in AFFIRMATION_THEMES else None
+        out.append({"text": text, "mood": mood, "theme": theme})
+    return out
@@ -1,8 +1,9 @@
 import os
 import json
-import google.generativeai as genai
 from typing import Dict, Any
 from dotenv import load_dotenv
+from .ai_handler import agenerate_with_ai, run_sync
+from .telemetry import FEATURE_DIET_PLAN, record_parse_failure
 
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 DOTENV_PATH = os.path.join(BASE_DIR, ".env")
@@ -18,8 +19,15 @@ MODELS_TO_TRY = [
 
 def generate_diet_plan(targets: Dict[str, Any], profile: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Generates a personalized diet plan using the Gemini API directly.
-    (Same approach as the original working version.)
+    Generates a personalized diet plan using the Gemini API.
+    (Same prompt and model list as the original working version.)
+    """
+    return run_sync(agenerate_diet_plan(targets, profile))
+
+
+async def agenerate_diet_plan(targets: Dict[str, Any], profile: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Async version of `generate_diet_plan`.
     """
 
     # Fetch API key — support both GEMINI_API_KEY_DIET and GEMINI_API_KEY
@@ -81,26 +89,17 @@ REQUIRED JSON FORMAT:
 """
 
     try:
-        genai.configure(api_key=api_key)
-
-        response = None
-        last_error = None
-        for model_name in MODELS_TO_TRY:
-            try:
-                model = genai.GenerativeModel(model_name)
-                response = model.generate_content(prompt)
-                break
-            except Exception as e:
-                last_error = e
-                continue
-
-        if not response:
+        success, response_text, error = await agenerate_with_ai(
+            prompt, key_type='diet', models=MODELS_TO_TRY, feature=FEATURE_DIET_PLAN
+        )
+
+        if not success:
             return {
                 "error": "Could not generate plan with any available model.",
-                "details": f"Last error: {str(last_error)}"
+                "details": f"Last error: {str(error)}"
             }
 
-        raw_text = response.text.strip()
+        raw_text = response_text.strip()
 
         # Remove markdown code blocks if present
         if raw_text.startswith("```json"):
@@ -113,7 +112,8 @@ REQUIRED JSON FORMAT:
         diet_plan = json.loads(raw_text.strip())
         return diet_plan
 
-    except json.JSONDecodeError:
+    except json.JSONDecodeError as e:
+        record_parse_failure(FEATURE_DIET_PLAN, error=str(e))
         return {
             "error": "Failed to parse diet plan.",
             "details": "The AI returned invalid JSON. Please try again."
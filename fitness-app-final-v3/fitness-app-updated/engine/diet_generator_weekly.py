@@ -2,7 +2,8 @@ import os
 import json
 from typing import Dict, Any
 from dotenv import load_dotenv
-from .ai_handler import generate_with_ai
+from .ai_handler import agenerate_with_ai, run_sync
+from .telemetry import FEATURE_WEEKLY_DIET_PLAN, record_parse_failure
 
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 DOTENV_PATH = os.path.join(BASE_DIR, ".env")
@@ -36,6 +37,13 @@ def generate_weekly_diet_plan(targets: Dict[str, Any], profile: Dict[str, Any])
     """
     Generates a personalized WEEKLY (7-day) diet plan.
     """
+    return run_sync(agenerate_weekly_diet_plan(targets, profile))
+
+
+async def agenerate_weekly_diet_plan(targets: Dict[str, Any], profile: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Async version of `generate_weekly_diet_plan`.
+    """
 
     cals = targets['calories']
     prot = targets['macros']['protein']
@@ -91,11 +99,13 @@ IMPORTANT: Generate valid JSON for all 7 days (Monday through Sunday). Do not tr
     for attempt in range(max_retries):
         try:
             # ENABLE JSON MODE HERE
-            success, response_text, error = generate_with_ai(
+            success, response_text, error = await agenerate_with_ai(
                 prompt, 
                 max_tokens=8192, 
                 key_type='diet', 
-                json_mode=True
+                json_mode=True,
+                feature=FEATURE_WEEKLY_DIET_PLAN,
+                attempt=attempt + 1
             )
             
             if not success:
@@ -113,6 +123,7 @@ IMPORTANT: Generate valid JSON for all 7 days (Monday through Sunday). Do not tr
             
         except (json.JSONDecodeError, ValueError) as e:
             print(f"JSON Error (Attempt {attempt+1}): {e}")
+            record_parse_failure(FEATURE_WEEKLY_DIET_PLAN, attempt=attempt + 1, error=str(e))
             if attempt < max_retries - 1: continue
             return {
                 "error": "Failed to parse diet plan.",
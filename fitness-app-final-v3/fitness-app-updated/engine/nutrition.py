@@ -6,6 +6,10 @@ BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 with open(os.path.join(BASE_DIR, "config/diet_rules.json")) as f:
     DIET_RULES = json.load(f)
 
+# How far the formula's TDEE is typically off for an individual (kcal);
+# an adaptive estimate with a smaller spread outweighs it.
+FORMULA_TDEE_SD = 300
+
 def calculate_bmr(weight_kg, height_cm, age, gender):
     """
     Calculates BMR using the Mifflin-St Jeor equation.
@@ -21,9 +25,27 @@ def calculate_bmr(weight_kg, height_cm, age, gender):
         # Average for non-binary/other
         return base_bmr - 78
 
-def calculate_nutritional_needs(profile, goal, activity_level):
+def _measured(adaptive):
+    return bool(adaptive and adaptive.get("tdee") and adaptive.get("measured"))
+
+def blend_tdee(formula_tdee, adaptive=None):
+    """
+    Combine the formula TDEE with the user's adaptive estimate
+    (database_tracker.get_energy_summary), each weighted by 1 / variance.
+    An estimate no weigh-in interval has measured yet is only the per-kg
+    prior, not evidence, so the formula is used alone then.
+    """
+    if not _measured(adaptive):
+        return formula_tdee
+    w_formula = 1 / FORMULA_TDEE_SD ** 2
+    w_adaptive = 1 / max(adaptive["tdee_sd"], 1) ** 2
+    return (formula_tdee * w_formula + adaptive["tdee"] * w_adaptive) / (w_formula + w_adaptive)
+
+def calculate_nutritional_needs(profile, goal, activity_level, adaptive=None):
     """
     Returns a dictionary with daily calorie target and macro grams.
+    Pass the user's adaptive energy summary as `adaptive` to correct the
+    formula TDEE with what their weight trend says.
     """
     gender = profile.get("gender", "male") # Default fallback
     weight = profile.get("weight_kg")
@@ -35,7 +57,7 @@ def calculate_nutritional_needs(profile, goal, activity_level):
     
     # 2. Calculate TDEE (Total Daily Energy Expenditure)
     multiplier = DIET_RULES["activity_multipliers"].get(activity_level, 1.2)
-    tdee = bmr * multiplier
+    tdee = blend_tdee(bmr * multiplier, adaptive)
     
     # 3. Adjust for Goal (Surplus/Deficit)
     goal_rules = DIET_RULES["goal_modifiers"].get(goal, DIET_RULES["goal_modifiers"]["general_fitness"])
@@ -57,6 +79,8 @@ def calculate_nutritional_needs(profile, goal, activity_level):
     
     return {
         "calories": daily_calories,
+        "tdee": int(tdee),
+        "adaptive": _measured(adaptive),
         "macros": {
             "protein": protein_grams,
             "fats": fat_grams,
@@ -2,10 +2,14 @@ import os
 import json
 import re
 from dotenv import load_dotenv
-from .ai_handler import generate_with_ai
+from .ai_handler import agenerate_with_ai, gather_bounded, run_sync
+from .telemetry import FEATURE_WORKOUT_PLAN, record_parse_failure
 
 load_dotenv()
 
+# Months of one plan generated in parallel (12-month plans = 12 calls)
+MONTH_CONCURRENCY = 12
+
 def extract_json_from_text(text):
     """Extract JSON from AI response, handling markdown and extra text."""
     text = text.strip()
@@ -32,16 +36,46 @@ def generate_workout_plan(profile, goal, duration_months, additional_info=""):
     """
     Generates a detailed week-by-week workout plan by iterating through each month.
     """
-    
+    return run_sync(agenerate_workout_plan(profile, goal, duration_months, additional_info))
+
+
+async def agenerate_workout_plan(profile, goal, duration_months, additional_info=""):
+    """
+    Async version of `generate_workout_plan`.
+    All months are requested concurrently, then stitched back together in order.
+    """
+
+    results = await gather_bounded(
+        [_agenerate_month(profile, goal, m) for m in range(1, duration_months + 1)],
+        limit=MONTH_CONCURRENCY,
+    )
+
     full_schedule = []
     overall_summary = ""
-    
-    for current_month in range(1, duration_months + 1):
-        
-        start_week = ((current_month - 1) * 4) + 1
-        
-        # Simplified, clearer prompt
-        prompt = f"""Create a 4-week workout plan for Month {current_month}.
+
+    for current_month, (month_data, error) in enumerate(results, start=1):
+        if error:
+            # Same contract as the sequential version: everything before the
+            # first failed month is returned as partial data.
+            error["partial_data"] = full_schedule
+            return error
+
+        full_schedule.extend(month_data["weeks"])
+
+        if current_month == 1:
+            overall_summary = month_data.get("month_summary", "")
+
+    return {
+        "summary": f"A {duration_months}-month progressive plan. {overall_summary}",
+        "schedule": full_schedule
+    }
+
+
+def _month_prompt(profile, goal, current_month):
+    start_week = ((current_month - 1) * 4) + 1
+
+    # Simplified, clearer prompt
+    prompt = f"""Create a 4-week workout plan for Month {current_month}.
 
 USER: Goal={goal}, Experience={profile.get('experience')}, Injuries={', '.join(profile.get('injuries', [])) or 'None'}
 
@@ -56,58 +90,56 @@ Generate weeks {start_week} to {start_week+3}. Return ONLY valid JSON:
     {{"week_number": {start_week+3}, "focus": "Deload", "workouts": [{{"day": "Monday", "focus": "Chest", "exercises": ["Light Bench 3x10"]}}, {{"day": "Tuesday", "focus": "Back", "exercises": ["Light Rows 3x10"]}}, {{"day": "Wednesday", "focus": "Rest", "exercises": []}}, {{"day": "Thursday", "focus": "Legs", "exercises": ["Goblet Squats 3x12"]}}, {{"day": "Friday", "focus": "Shoulders", "exercises": ["Light Press 3x10"]}}, {{"day": "Saturday", "focus": "Walk", "exercises": ["Walking 30min"]}}, {{"day": "Sunday", "focus": "Rest", "exercises": []}}]}}
   ]
 }}"""
+    return prompt
 
-        # Try up to 3 times
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                success, response_text, error = generate_with_ai(prompt, max_tokens=8192, key_type='workout')
-                
-                if not success:
-                    if attempt < max_retries - 1:
-                        continue
-                    return {
-                        "error": f"Could not generate Month {current_month}",
-                        "details": str(error),
-                        "partial_data": full_schedule
-                    }
-                
-                # Extract and parse JSON
-                raw_text = extract_json_from_text(response_text)
-                month_data = json.loads(raw_text)
-                
-                # Validate
-                if "weeks" not in month_data:
-                    raise ValueError("Missing 'weeks' field")
-                
-                # Success!
-                full_schedule.extend(month_data["weeks"])
-                
-                if current_month == 1:
-                    overall_summary = month_data.get("month_summary", "")
-                
-                break
-                
-            except (json.JSONDecodeError, ValueError) as e:
-                if attempt < max_retries - 1:
-                    continue
-                print(f"ERROR Month {current_month}: {str(e)}")
-                print(f"Response: {response_text[:300]}")
-                return {
-                    "error": f"Invalid JSON for Month {current_month}",
-                    "details": f"Parse error: {str(e)}",
-                    "partial_data": full_schedule
-                }
-            except Exception as e:
+
+async def _agenerate_month(profile, goal, current_month):
+    """Returns (month_data, None) on success or (None, error_dict)."""
+    prompt = _month_prompt(profile, goal, current_month)
+    response_text = ""
+
+    # Try up to 3 times
+    max_retries = 3
+    for attempt in range(max_retries):
+        try:
+            success, response_text, error = await agenerate_with_ai(
+                prompt, max_tokens=8192, key_type='workout',
+                feature=FEATURE_WORKOUT_PLAN, attempt=attempt + 1
+            )
+
+            if not success:
                 if attempt < max_retries - 1:
                     continue
-                return {
-                    "error": f"Error Month {current_month}", 
-                    "details": str(e),
-                    "partial_data": full_schedule
+                return None, {
+                    "error": f"Could not generate Month {current_month}",
+                    "details": str(error),
                 }
 
-    return {
-        "summary": f"A {duration_months}-month progressive plan. {overall_summary}",
-        "schedule": full_schedule
-    }
\ No newline at end of file
+            # Extract and parse JSON
+            raw_text = extract_json_from_text(response_text)
+            month_data = json.loads(raw_text)
+
+            # Validate
+            if "weeks" not in month_data:
+                raise ValueError("Missing 'weeks' field")
+
+            # Success!
+            return month_data, None
+
+        except (json.JSONDecodeError, ValueError) as e:
+            record_parse_failure(FEATURE_WORKOUT_PLAN, attempt=attempt + 1, error=str(e))
+            if attempt < max_retries - 1:
+                continue
+            print(f"ERROR Month {current_month}: {str(e)}")
+            print(f"Response: {response_text[:300]}")
+            return None, {
+                "error": f"Invalid JSON for Month {current_month}",
+                "details": f"Parse error: {str(e)}",
+            }
+        except Exception as e:
+            if attempt < max_retries - 1:
+                continue
+            return None, {
+                "error": f"Error Month {current_month}",
+                "details": str(e),
+            }
@@ -0,0 +1,201 @@
+"""
+LLM call telemetry for RoutineX.
+
+Every provider call made by the AI handler is recorded into the `llm_calls`
+table. Records are buffered in memory and written in batches by a background
+thread, so the request path only pays for a list append.
+"""
+
+import atexit
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from database_pool import connect
+from migrations import bootstrap
+
+DB_NAME = "routinex.db"
+
+FLUSH_INTERVAL_S = 2.0     # max delay before a record hits the DB
+FLUSH_BATCH = 200          # flush early once this many records are buffered
+
+FEATURE_GENERAL = "general"
+FEATURE_WORKOUT_PLAN = "workout_plan"
+FEATURE_DIET_PLAN = "diet_plan"
+FEATURE_WEEKLY_DIET_PLAN = "weekly_diet_plan"
+FEATURE_WEEKLY_REVIEW = "weekly_review"
+FEATURE_AFFIRMATION = "affirmation"
+
+OUTCOME_OK = "ok"
+OUTCOME_ERROR = "error"
+OUTCOME_EMPTY = "empty"
+OUTCOME_PARSE_ERROR = "parse_error"
+
+_COLUMNS = ("called_at", "feature", "provider", "model", "key_type", "attempt", "outcome",
+            "latency_ms", "prompt_tokens", "response_tokens", "cache_hit", "error")
+
+_buffer = []
+_lock = threading.Lock()
+_wake = threading.Event()
+_flusher = None
+
+
+# ──────────────────────────────────────────────────────────────
+# RECORDING
+# ──────────────────────────────────────────────────────────────
+
+def record_llm_call(feature, outcome, provider=None, model=None, key_type=None, attempt=1,
+                    latency_ms=None, prompt_tokens=None, response_tokens=None,
+                    cache_hit=False, error=None):
+    """Queue one call record. Never raises and never touches the DB directly."""
+    row = (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), feature or FEATURE_GENERAL, provider,
+           model, key_type, attempt, outcome,
+           round(latency_ms, 1) if latency_ms is not None else None,
+           prompt_tokens, response_tokens, 1 if cache_hit else 0,
+           (error or "")[:500] or None)
+    with _lock:
+        _buffer.append(row)
+        pending = len(_buffer)
+    _ensure_flusher()
+    if pending >= FLUSH_BATCH:
+        _wake.set()
+
+
+def record_parse_failure(feature, attempt=1, error=None):
+    """The provider answered but the text could not be parsed/validated."""
+    record_llm_call(feature, OUTCOME_PARSE_ERROR, attempt=attempt, error=error)
+
+
+class CallTimer:
+    """`with CallTimer() as t: ...` then read `t.ms`."""
+
+    def __init__(self):
+        self.ms = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.ms = (time.perf_counter() - self._start) * 1000
+        return False
+
+
+def _ensure_table():
+    # llm_calls is created by migrations.py; scripts may not have bootstrapped yet.
+    bootstrap(DB_NAME)
+
+
+def flush():
+    """Write everything buffered so far. Safe to call from any thread."""
+    with _lock:
+        if not _buffer:
+            return 0
+        rows = _buffer[:]
+        del _buffer[:]
+    try:
+        _ensure_table()
+        con = connect(DB_NAME)
+        con.executemany(
+            f"INSERT INTO llm_calls ({','.join(_COLUMNS)}) VALUES ({','.join('?' * len(_COLUMNS))})",
+            rows
+        )
+        con.commit(); con.close()
+    except sqlite3.Error as e:
+        # Telemetry must never break generation; drop the batch.
+        print(f"Telemetry flush failed ({len(rows)} rows): {e}")
+        return 0
+    return len(rows)
+
+
+def _flush_loop():
+    while True:
+        _wake.wait(FLUSH_INTERVAL_S)
+        _wake.clear()
+        flush()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None:
+        return
+    with _lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="llm-telemetry", daemon=True)
+            _flusher.start()
+            atexit.register(flush)
+
+
+# ──────────────────────────────────────────────────────────────
+# REPORTING (admin dashboard)
+# ──────────────────────────────────────────────────────────────
+
+def get_llm_call_stats(days=7):
+    """
+    Per (feature, model) stats over the last `days` days:
+    call counts, p50/p95/p99 latency, retry/error rates and token spend.
+    Percentiles are nearest-rank over non-cached calls.
+    """
+    flush()
+    since = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+    _ensure_table()
+    con = connect(DB_NAME, readonly=True, row_factory=sqlite3.Row)
+    rows = con.execute("""
+        WITH calls AS (
+            SELECT * FROM llm_calls
+            WHERE called_at >= ? AND outcome != 'parse_error'
+        ),
+        ranked AS (
+            SELECT feature, model, latency_ms,
+                   ROW_NUMBER() OVER (PARTITION BY feature, model ORDER BY latency_ms) AS rn,
+                   COUNT(*)     OVER (PARTITION BY feature, model)                     AS n
+            FROM calls
+            WHERE latency_ms IS NOT NULL AND cache_hit = 0
+        ),
+        pct AS (
+            SELECT feature, model,
+                   MIN(CASE WHEN rn >= 0.50 * n THEN latency_ms END) AS p50_ms,
+                   MIN(CASE WHEN rn >= 0.95 * n THEN latency_ms END) AS p95_ms,
+                   MIN(CASE WHEN rn >= 0.99 * n THEN latency_ms END) AS p99_ms
+            FROM ranked GROUP BY feature, model
+        )
+        SELECT c.feature, COALESCE(c.model, '—') AS model,
+               COUNT(*)                                        AS calls,
+               SUM(c.outcome = 'ok')                           AS ok_calls,
+               ROUND(AVG(c.attempt > 1) * 100, 1)              AS retry_rate_pct,
+               ROUND(AVG(c.outcome IN ('error','empty')) * 100, 1) AS error_rate_pct,
+               SUM(c.cache_hit)                                AS cache_hits,
+               COALESCE(SUM(c.prompt_tokens), 0)               AS prompt_tokens,
+               COALESCE(SUM(c.response_tokens), 0)             AS response_tokens,
+               p.p50_ms, p.p95_ms, p.p99_ms
+        FROM calls c
+        LEFT JOIN pct p ON p.feature = c.feature AND p.model IS c.model
+        GROUP BY c.feature, c.model
+        ORDER BY c.feature, calls DESC
+    """, (since,)).fetchall()
+
+    parse = con.execute("""
+        SELECT feature, COUNT(*) AS parse_failures
+        FROM llm_calls WHERE called_at >= ? AND outcome = 'parse_error'
+        GROUP BY feature
+    """, (since,)).fetchall()
+    con.close()
+    return [dict(r) for r in rows], {r["feature"]: r["parse_failures"] for r in parse}
+
+
+def get_llm_daily_tokens(days=30):
+    """Token spend per day and feature, for the trend chart."""
+    flush()
+    since = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+    _ensure_table()
+    con = connect(DB_NAME, readonly=True, row_factory=sqlite3.Row)
+    rows = con.execute("""
+        SELECT substr(called_at, 1, 10) AS day, feature,
+               COALESCE(SUM(prompt_tokens), 0) + COALESCE(SUM(response_tokens), 0) AS tokens,
+               COUNT(*) AS calls
+        FROM llm_calls WHERE called_at >= ?
+        GROUP BY day, feature ORDER BY day ASC
+    """, (since,)).fetchall()
+    con.close()
+    return [dict(r) for r in rows]
@@ -0,0 +1,202 @@
+"""
+insights.py
+Cross-metric insights over a user's whole diary and weight history.
+
+load() reads daily_diary and weight_log in one query (plus any archived
+diary days, see archive.py) into a dense (metric x day) float array — NaN
+where nothing was logged — and analyze() answers from that array with whole-array NumPy operations only:
+
+    correlations   Pearson r of every driver metric on day t against every
+                   outcome metric on day t + lag (lag 0 and 1): "does sleep
+                   predict next-day mood?"
+    weekday        workout / diet adherence and average mood per weekday
+    rolling        7- and 28-day averages ending on the last logged day
+    anomalies      recent days more than ANOMALY_Z standard deviations from
+                   the trailing 28-day mean
+
+Empty / zero values are left out like everywhere else (get_weekly_stats,
+rollups.py); workout_done and diet_followed count 0 as "no" on logged days.
+Days only a wearable import wrote (imported = 1) add their steps / sleep but
+are not logged days: their flags are left empty.
+analyze() takes a few milliseconds on multi-year histories, so a cache miss
+costs about as much as the one query; database_tracker.get_insights caches
+the result until the user's next write.
+"""
+
+import numpy as np
+
+import archive
+
+# (name, source column); workout / diet are 0/1 flags, weight comes from weight_log
+METRICS = [("mood", "mood"), ("energy", "energy_level"), ("sleep", "sleep_hours"),
+           ("water", "water_glasses"), ("steps", "steps_count"), ("stress", "stress_level"),
+           ("workout", "workout_done"), ("diet", "diet_followed"), ("weight", "weight_kg")]
+FLAGS = ("workout", "diet")
+DIARY_METRICS = [m for m, _ in METRICS if m != "weight"]
+
+DRIVERS = ("sleep", "water", "steps", "workout", "diet", "stress")
+OUTCOMES = ("mood", "energy", "stress")
+LAGS = (0, 1)
+MIN_PAIRS = 14               # days with both values before a correlation is reported
+MIN_ABS_R = 0.2
+ANOMALY_Z = 2.5
+ANOMALY_DAYS = 30            # how far back anomalies are reported
+WINDOW = 28
+
+DRIVER_LABELS = {"sleep": "More sleep", "water": "More water", "steps": "More steps",
+                 "stress": "Higher stress", "workout": "Workout days", "diet": "On-diet days"}
+
+_INDEX = {m: i for i, (m, _) in enumerate(METRICS)}
+
+_DIARY_COLUMNS = [col for m, col in METRICS if m != "weight"]
+
+_LOAD_SQL = f"""
+    SELECT entry_date, 0, {", ".join(_DIARY_COLUMNS)}, NULL, imported
+    FROM daily_diary WHERE username = ?
+    UNION ALL
+    SELECT log_date, 1, {", ".join("NULL" for m in DIARY_METRICS)}, weight_kg, 0
+    FROM weight_log WHERE username = ?
+"""
+
+
+def load(con, username):
+    """(first day as datetime64[D], metric x day array) for one user; (None, None) if nothing is logged."""
+    rows = con.execute(_LOAD_SQL, (username, username)).fetchall()
+    archived = archive.read(con, "daily_diary", username)
+    if archived:
+        have = {r[0] for r in rows if r[1] == 0}
+        rows += [(r["entry_date"], 0, *(r.get(col) for col in _DIARY_COLUMNS), None, archive.imported(r))
+                 for r in archived if r["entry_date"] not in have]
+    if not rows:
+        return None, None
+    cols = list(zip(*rows))
+    days = np.array([d[:10] for d in cols[0]], dtype="datetime64[D]")
+    is_weight = np.array(cols[1], dtype=bool)
+    values = np.array(cols[2:-1], dtype=float)          # None -> NaN
+    imported = np.array(cols[-1], dtype=bool)
+    first = days.min()
+    idx = (days - first).astype(int)
+    grid = np.full((len(METRICS), idx.max() + 1), np.nan)
+    grid[:-1, idx[~is_weight]] = values[:-1, ~is_weight]
+    grid[-1, idx[is_weight]] = values[-1, is_weight]
+    # empty / zero means "not logged" except for the 0/1 flags
+    scalar = [i for i, (m, _) in enumerate(METRICS) if m not in FLAGS]
+    grid[scalar] = np.where(grid[scalar] == 0, np.nan, grid[scalar])
+    # an imported day's 0 flags are column defaults, not a "no"
+    grid[np.ix_([_INDEX[f] for f in FLAGS], idx[imported])] = np.nan
+    return first, grid
+
+
+def _logged(grid):
+    """Days with a check-in: every diary row but an imported one has its 0/1 flags."""
+    return ~np.isnan(grid[[_INDEX[f] for f in FLAGS]]).all(axis=0)
+
+
+def _correlations(grid):
+    d = grid[[_INDEX[m] for m in DRIVERS]]
+    o = grid[[_INDEX[m] for m in OUTCOMES]]
+    out = []
+    for lag in LAGS:
+        x = d[:, :d.shape[1] - lag] if lag else d
+        y = o[:, lag:]
+        # Pairwise sums over days both values exist, for every driver x
+        # outcome pair at once: masks and values multiplied as matrices.
+        mx, my = (~np.isnan(x)).astype(float), (~np.isnan(y)).astype(float)
+        x0, y0 = np.nan_to_num(x), np.nan_to_num(y)
+        n = mx @ my.T
+        sx, sy = x0 @ my.T, mx @ y0.T
+        sxx, syy, sxy = (x0 * x0) @ my.T, mx @ (y0 * y0).T, x0 @ y0.T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            r = (n * sxy - sx * sy) / np.sqrt((n * sxx - sx * sx) * (n * syy - sy * sy))
+        for i, j in zip(*np.nonzero((n >= MIN_PAIRS) & (np.abs(np.nan_to_num(r)) >= MIN_ABS_R))):
+            if DRIVERS[i] == OUTCOMES[j]:
+                continue
+            out.append({"driver": DRIVERS[i], "outcome": OUTCOMES[j], "lag": lag,
+                        "r": round(float(r[i, j]), 2), "n": int(n[i, j])})
+    return sorted(out, key=lambda c: -abs(c["r"]))
+
+
+def _weekday(grid, first):
+    # 0 = Monday, as datetime.weekday(); 1970-01-01 was a Thursday
+    wd = (np.arange(grid.shape[1]) + first.astype(int) + 3) % 7
+    out = {}
+    for name in ("workout", "diet", "mood"):
+        v = grid[_INDEX[name]]
+        ok = ~np.isnan(v)
+        n = np.bincount(wd[ok], minlength=7)
+        s = np.bincount(wd[ok], weights=v[ok], minlength=7)
+        with np.errstate(invalid="ignore"):
+            avg = s / n
+        out[name] = [None if c == 0 else round(float(a), 2) for a, c in zip(avg, n)]
+    out["logged"] = np.bincount(wd[_logged(grid)], minlength=7).tolist()
+    return out
+
+
+def _trailing(grid, window):
+    """Mean / std of the `window` days before each day (excluding it), and the count used."""
+    ok = ~np.isnan(grid)
+    v = np.where(ok, grid, 0.0)
+    pad = np.zeros((grid.shape[0], 1))
+    c1 = np.concatenate([pad, np.cumsum(v, axis=1)], axis=1)
+    c2 = np.concatenate([pad, np.cumsum(v * v, axis=1)], axis=1)
+    cn = np.concatenate([pad, np.cumsum(ok, axis=1)], axis=1)
+    t = np.arange(grid.shape[1])
+    lo = np.maximum(t - window, 0)
+    n = cn[:, t] - cn[:, lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (c1[:, t] - c1[:, lo]) / n
+        var = (c2[:, t] - c2[:, lo]) / n - mean * mean
+    return mean, np.sqrt(np.maximum(var, 0)), n
+
+
+def _rolling(grid):
+    ok = ~np.isnan(grid)
+    out = {}
+    for days in (7, WINDOW):
+        tail, n = grid[:, -days:], ok[:, -days:].sum(axis=1)
+        with np.errstate(invalid="ignore"):
+            avg = np.where(ok[:, -days:], tail, 0.0).sum(axis=1) / n
+        for (name, _), a, c in zip(METRICS, avg, n):
+            out.setdefault(name, {})[f"{days}d"] = round(float(a), 2) if c else None
+    return out
+
+
+def _anomalies(grid, first):
+    mean, std, n = _trailing(grid, WINDOW)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = (grid - mean) / std
+    scalar = np.array([m not in FLAGS for m, _ in METRICS])
+    recent = np.arange(grid.shape[1]) >= grid.shape[1] - ANOMALY_DAYS
+    hit = (np.abs(np.nan_to_num(z)) >= ANOMALY_Z) & (n >= WINDOW // 2) & (std > 0) \
+        & scalar[:, None] & recent[None, :]
+    out = [{"date": str(first + int(t)), "metric": METRICS[i][0],
+            "value": float(grid[i, t]), "z": round(float(z[i, t]), 1)}
+           for i, t in zip(*np.nonzero(hit))]
+    return sorted(out, key=lambda a: a["date"], reverse=True)
+
+
+def analyze(first, grid):
+    """Every insight for one user's loaded history (see the module docstring)."""
+    if grid is None:
+        return None
+    return {
+        "first_day": str(first),
+        "last_day": str(first + grid.shape[1] - 1),
+        "logged_days": int(_logged(grid).sum()),
+        "correlations": _correlations(grid),
+        "weekday": _weekday(grid, first),
+        "rolling": _rolling(grid),
+        "anomalies": _anomalies(grid, first),
+    }
+
+
+def insights(con, username):
+    return analyze(*load(con, username))
+
+
+def describe(corr):
+    """One line for a correlation, e.g. "More sleep → higher mood the next day (r = +0.42, 310 days)"."""
+    direction = "higher" if corr["r"] > 0 else "lower"
+    when = "the next day" if corr["lag"] else "the same day"
+    return (f"{DRIVER_LABELS[corr['driver']]} → {direction} {corr['outcome']} {when} "
+            f"(r = {corr['r']:+}, {corr['n']} days)")
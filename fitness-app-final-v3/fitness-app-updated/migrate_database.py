@@ -1,55 +1,32 @@
 """
 Database Migration Script for RoutineX
-Fixes the daily_wins table to add the missing win_date column
+Brings routinex.db up to the latest schema version (see migrations.py).
+The app does this automatically on start-up; this script is for running it by hand.
 """
 
 import sqlite3
-from datetime import datetime
 
-DB_NAME = "routinex.db"
+from migrations import DB_NAME, LATEST_VERSION, get_version, migrate
 
 def migrate_database():
     """
-    Add win_date column to daily_wins table if it doesn't exist
+    Apply every pending numbered migration
     """
     print("=" * 60)
     print("RoutineX Database Migration")
     print("=" * 60)
     
     try:
-        conn = sqlite3.connect(DB_NAME)
-        c = conn.cursor()
+        before = get_version(DB_NAME)
+        print(f"📊 Current schema version: {before} (latest: {LATEST_VERSION})")
         
-        # Check if win_date column exists
-        c.execute("PRAGMA table_info(daily_wins)")
-        columns = [col[1] for col in c.fetchall()]
-        
-        if 'win_date' not in columns:
-            print("❌ win_date column is MISSING from daily_wins table")
-            print("🔧 Adding win_date column...")
-            
-            # Add the column with a default value
-            c.execute("ALTER TABLE daily_wins ADD COLUMN win_date TEXT DEFAULT '1970-01-01'")
-            
-            # Update existing records to use the created_at date
-            c.execute("""
-                UPDATE daily_wins 
-                SET win_date = DATE(created_at) 
-                WHERE win_date IS NULL OR win_date = '1970-01-01'
-            """)
-            
-            conn.commit()
-            print("✅ win_date column added successfully!")
-            print(f"✅ Updated {c.rowcount} existing records")
+        if before >= LATEST_VERSION:
+            print("✅ Schema is up to date - no migration needed")
         else:
-            print("✅ win_date column already exists - no migration needed")
-        
-        # Verify the fix
-        c.execute("SELECT COUNT(*) FROM daily_wins")
-        count = c.fetchone()[0]
-        print(f"📊 Total records in daily_wins table: {count}")
+            print("🔧 Applying migrations...")
+            after = migrate(DB_NAME, verbose=True)
+            print(f"✅ Schema upgraded to version {after}")
         
-        conn.close()
         print("\n✅ Database migration completed successfully!")
         
     except sqlite3.Error as e:
@@ -67,7 +44,7 @@ def migrate_database():
     return True
 
 if __name__ == "__main__":
-    print("\nThis script will fix the daily_wins table structure.")
+    print("\nThis script will upgrade the database schema.")
     print("It's safe to run multiple times.\n")
     
     input("Press Enter to continue...")
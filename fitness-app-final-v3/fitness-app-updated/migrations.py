@@ -0,0 +1,1039 @@
+"""
+migrations.py
+Versioned schema for routinex.db.
+
+The schema version lives in `PRAGMA user_version`. bootstrap() applies every
+migration newer than that version, each in its own transaction together with
+the version bump, and then remembers the database as ready for the rest of the
+process — so Streamlit reruns don't re-run any DDL.
+
+To change the schema, append a new (version, description, function) entry to
+MIGRATIONS; never edit one that has shipped. Migrations spell out their own
+DDL; summary tables derived from other tables are filled afterwards by the
+REBUILDS they queue, with whatever code is current then.
+
+    python migrations.py            # migrate routinex.db and print the version
+    python migrations.py --check    # also EXPLAIN QUERY PLAN what the data modules run
+"""
+
+import json
+import os
+import sys
+import threading
+from datetime import date, datetime, timedelta
+
+from database_pool import connect, discard_idle
+import archive
+import cohorts
+import energy
+import rollups
+import search
+import streaks
+
+DB_NAME = "routinex.db"
+
+_ready = set()
+_lock = threading.Lock()
+
+
+def _columns(con, table):
+    return {r[1] for r in con.execute(f"PRAGMA table_info({table})")}
+
+
+# ──────────────────────────────────────────────────────────────
+# MIGRATIONS
+# ──────────────────────────────────────────────────────────────
+
+def _m1_baseline(con):
+    """Every table the app created at start-up before versioning existed."""
+    # Auth, legacy plans, mental health, check-ins (database.py)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            password_hash TEXT NOT NULL,
+            created_at TEXT
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS saved_plans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT,
+            plan_data TEXT,
+            created_at TEXT,
+            FOREIGN KEY(username) REFERENCES users(username)
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS mental_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT,
+            mood_score INTEGER,
+            mood_label TEXT,
+            stress_factors TEXT,
+            notes TEXT,
+            date TEXT,
+            FOREIGN KEY(username) REFERENCES users(username)
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS workout_checkins (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            workout_data TEXT NOT NULL,
+            plan_name TEXT,
+            duration_weeks INTEGER,
+            created_at TEXT NOT NULL,
+            is_active INTEGER DEFAULT 1,
+            FOREIGN KEY(username) REFERENCES users(username)
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS daily_checkin_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            date TEXT NOT NULL,
+            workout_completed INTEGER DEFAULT 0,
+            water_intake INTEGER DEFAULT 0,
+            meditation INTEGER DEFAULT 0,
+            sleep_quality INTEGER,
+            notes TEXT,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY(username) REFERENCES users(username),
+            UNIQUE(username, date)
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS canvas_entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            content TEXT NOT NULL,
+            mood TEXT,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY(username) REFERENCES users(username)
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS daily_wins (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            win1 TEXT,
+            win2 TEXT,
+            win3 TEXT,
+            win_date TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY(username) REFERENCES users(username)
+        )
+    """)
+
+    # Smart Daily Tracker (database_tracker.py)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS user_goals (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            username    TEXT NOT NULL,
+            goal_type   TEXT NOT NULL,          -- e.g. 'weight_loss','muscle_gain','endurance'
+            description TEXT,                   -- free text: "Lose 2 kg in 2 months"
+            start_weight REAL,                  -- kg at goal creation
+            target_weight REAL,                 -- kg target (nullable)
+            start_date  TEXT NOT NULL,          -- YYYY-MM-DD
+            target_date TEXT,                   -- YYYY-MM-DD
+            is_active   INTEGER DEFAULT 1,
+            created_at  TEXT NOT NULL,
+            FOREIGN KEY(username) REFERENCES users(username)
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS daily_diary (
+            id                  INTEGER PRIMARY KEY AUTOINCREMENT,
+            username            TEXT NOT NULL,
+            entry_date          TEXT NOT NULL,    -- YYYY-MM-DD
+            mood                INTEGER,          -- 1-5
+            mood_label          TEXT,
+            energy_level        INTEGER,          -- 1-5
+            sleep_hours         REAL,
+            water_glasses       INTEGER,
+            workout_done        INTEGER DEFAULT 0, -- 0/1
+            workout_notes       TEXT,
+            diet_followed       INTEGER DEFAULT 0, -- 0/1
+            diet_notes          TEXT,
+            journal_text        TEXT,             -- diary / reflection
+            stress_level        INTEGER,          -- 1-5
+            steps_count         INTEGER,
+            created_at          TEXT NOT NULL,
+            updated_at          TEXT NOT NULL,
+            UNIQUE(username, entry_date),
+            FOREIGN KEY(username) REFERENCES users(username)
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS weight_log (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            username    TEXT NOT NULL,
+            log_date    TEXT NOT NULL,   -- YYYY-MM-DD
+            weight_kg   REAL NOT NULL,
+            notes       TEXT,
+            created_at  TEXT NOT NULL,
+            UNIQUE(username, log_date),
+            FOREIGN KEY(username) REFERENCES users(username)
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS weekly_reviews (
+            id                  INTEGER PRIMARY KEY AUTOINCREMENT,
+            username            TEXT NOT NULL,
+            week_start          TEXT NOT NULL,   -- YYYY-MM-DD (Monday)
+            week_end            TEXT NOT NULL,   -- YYYY-MM-DD (Sunday)
+            avg_mood            REAL,
+            avg_energy          REAL,
+            avg_sleep           REAL,
+            avg_water           REAL,
+            workouts_completed  INTEGER,
+            days_diet_followed  INTEGER,
+            weight_change       REAL,            -- kg delta vs prev week
+            ai_summary          TEXT,            -- AI generated weekly insight
+            ai_suggestion       TEXT,            -- AI recommended next steps
+            created_at          TEXT NOT NULL,
+            UNIQUE(username, week_start),
+            FOREIGN KEY(username) REFERENCES users(username)
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS saved_workout_plans (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            username    TEXT NOT NULL,
+            plan_name   TEXT NOT NULL,
+            goal        TEXT,
+            duration_months INTEGER,
+            plan_data   TEXT NOT NULL,   -- JSON
+            is_active   INTEGER DEFAULT 0,
+            created_at  TEXT NOT NULL,
+            FOREIGN KEY(username) REFERENCES users(username)
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS saved_diet_plans (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            username    TEXT NOT NULL,
+            plan_name   TEXT NOT NULL,
+            goal        TEXT,
+            calories    INTEGER,
+            plan_data   TEXT NOT NULL,   -- JSON
+            is_active   INTEGER DEFAULT 0,
+            created_at  TEXT NOT NULL,
+            FOREIGN KEY(username) REFERENCES users(username)
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS daily_todos (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            username    TEXT NOT NULL,
+            todo_date   TEXT NOT NULL,   -- YYYY-MM-DD
+            task_text   TEXT NOT NULL,
+            is_done     INTEGER DEFAULT 0,
+            created_at  TEXT NOT NULL,
+            FOREIGN KEY(username) REFERENCES users(username)
+        )
+    """)
+
+    # LLM telemetry, affirmation pool, vibe cache
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS llm_calls (
+            id              INTEGER PRIMARY KEY AUTOINCREMENT,
+            called_at       TEXT NOT NULL,      -- YYYY-MM-DD HH:MM:SS
+            feature         TEXT NOT NULL,      -- workout_plan, diet_plan, weekly_review, ...
+            provider        TEXT,               -- gemini / openai / pool
+            model           TEXT,
+            key_type        TEXT,
+            attempt         INTEGER DEFAULT 1,  -- caller-level retry number
+            outcome         TEXT NOT NULL,      -- ok / error / empty / parse_error
+            latency_ms      REAL,
+            prompt_tokens   INTEGER,
+            response_tokens INTEGER,
+            cache_hit       INTEGER DEFAULT 0,
+            error           TEXT
+        )
+    """)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_called_at ON llm_calls(called_at)")
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS affirmation_pool (
+            id              INTEGER PRIMARY KEY AUTOINCREMENT,
+            text            TEXT NOT NULL,
+            text_key        TEXT NOT NULL UNIQUE,   -- normalized text, for dedupe
+            mood            TEXT,                   -- focus / energy / calm / drive
+            theme           TEXT,
+            served_count    INTEGER DEFAULT 0,
+            last_served_at  TEXT,
+            created_at      TEXT NOT NULL
+        )
+    """)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_affirmation_pool_mood ON affirmation_pool(mood, served_count)")
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS youtube_vibe_cache (
+            query       TEXT PRIMARY KEY,
+            video_ids   TEXT NOT NULL,      -- JSON list, best match first
+            source      TEXT NOT NULL,      -- catalogue / api
+            fetched_at  REAL NOT NULL       -- epoch seconds
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS youtube_quota (
+            day         TEXT PRIMARY KEY,   -- YYYY-MM-DD
+            units_used  INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+
+def _m2_column_fixes(con):
+    """Columns that used to be patched in at start-up or by migrate_database.py."""
+    if "win_date" not in _columns(con, "daily_wins"):
+        con.execute("ALTER TABLE daily_wins ADD COLUMN win_date TEXT DEFAULT '1970-01-01'")
+        con.execute("UPDATE daily_wins SET win_date = DATE(created_at) "
+                    "WHERE win_date IS NULL OR win_date = '1970-01-01'")
+    if "on_track" not in _columns(con, "weekly_reviews"):
+        con.execute("ALTER TABLE weekly_reviews ADD COLUMN on_track INTEGER")
+    # canvas_entries was first created without tags on most databases
+    if "tags" not in _columns(con, "canvas_entries"):
+        con.execute("ALTER TABLE canvas_entries ADD COLUMN tags TEXT")
+
+
+def _m3_indexes(con):
+    """Secondary indexes for every per-user and per-date query in the data modules."""
+    for sql in (
+        "CREATE INDEX IF NOT EXISTS idx_saved_plans_user ON saved_plans(username, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_mental_logs_user ON mental_logs(username, date)",
+        "CREATE INDEX IF NOT EXISTS idx_workout_checkins_active ON workout_checkins(username, is_active, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_workout_checkins_user ON workout_checkins(username, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_canvas_entries_user ON canvas_entries(username, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_daily_wins_user_date ON daily_wins(username, win_date)",
+        "CREATE INDEX IF NOT EXISTS idx_daily_wins_user ON daily_wins(username, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_user_goals_active ON user_goals(username, is_active, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_daily_diary_date ON daily_diary(entry_date, username)",
+        "CREATE INDEX IF NOT EXISTS idx_weight_log_date ON weight_log(log_date, username)",
+        "CREATE INDEX IF NOT EXISTS idx_weekly_reviews_week ON weekly_reviews(week_start)",
+        "CREATE INDEX IF NOT EXISTS idx_saved_workout_plans_active ON saved_workout_plans(username, is_active, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_saved_workout_plans_user ON saved_workout_plans(username, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_saved_diet_plans_active ON saved_diet_plans(username, is_active, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_saved_diet_plans_user ON saved_diet_plans(username, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_daily_todos_user_date ON daily_todos(username, todo_date, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_affirmation_pool_served ON affirmation_pool(served_count)",
+    ):
+        con.execute(sql)
+
+
+def _m4_merge_checkins(con):
+    """
+    Fold the old Daily Check-in table into daily_diary (one row per user/day)
+    and drop it. Existing diary values win; check-in values fill the gaps.
+    Check-in notes get their own column so they never replace the journal.
+    """
+    cols = _columns(con, "daily_diary")
+    for col, ddl in (("water_goal_met", "INTEGER DEFAULT 0"),
+                     ("meditation_done", "INTEGER DEFAULT 0"),
+                     ("sleep_quality", "INTEGER"),
+                     ("checkin_notes", "TEXT")):
+        if col not in cols:
+            con.execute(f"ALTER TABLE daily_diary ADD COLUMN {col} {ddl}")
+
+    legacy = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='daily_checkin_logs'"
+    ).fetchone()
+    if not legacy:
+        return
+    con.execute("""
+        INSERT INTO daily_diary
+            (username, entry_date, workout_done, water_goal_met, meditation_done,
+             sleep_quality, checkin_notes, created_at, updated_at)
+        SELECT username, date, workout_completed, water_intake, meditation,
+               sleep_quality, NULLIF(notes, ''), created_at, created_at
+        FROM daily_checkin_logs WHERE true
+        ON CONFLICT(username, entry_date) DO UPDATE SET
+            workout_done    = MAX(COALESCE(daily_diary.workout_done, 0), COALESCE(excluded.workout_done, 0)),
+            water_goal_met  = excluded.water_goal_met,
+            meditation_done = excluded.meditation_done,
+            sleep_quality   = COALESCE(daily_diary.sleep_quality, excluded.sleep_quality),
+            checkin_notes   = excluded.checkin_notes
+    """)
+    con.execute("DROP TABLE daily_checkin_logs")
+
+
+def _m5_workout_checkins_view(con):
+    """
+    Activating a plan used to write it twice: once to workout_checkins for
+    the Daily Check-in page and once to saved_workout_plans. Fold the old
+    copies into saved_workout_plans, replace the table with a view over it
+    and allow at most one active plan per user.
+    """
+    if "duration_weeks" not in _columns(con, "saved_workout_plans"):
+        con.execute("ALTER TABLE saved_workout_plans ADD COLUMN duration_weeks INTEGER")
+    if con.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='workout_checkins'").fetchone():
+        # Rows written by the dual write already have an identical plan_data copy.
+        con.execute("""
+            UPDATE saved_workout_plans SET duration_weeks = (
+                SELECT w.duration_weeks FROM workout_checkins w
+                WHERE w.username = saved_workout_plans.username
+                  AND w.workout_data = saved_workout_plans.plan_data
+                ORDER BY w.created_at DESC LIMIT 1)
+            WHERE duration_weeks IS NULL
+        """)
+        con.execute("""
+            INSERT INTO saved_workout_plans
+                (username, plan_name, plan_data, duration_weeks, is_active, created_at)
+            SELECT w.username, COALESCE(w.plan_name, 'Workout plan'), w.workout_data,
+                   w.duration_weeks, 0, w.created_at
+            FROM workout_checkins w
+            WHERE NOT EXISTS (
+                SELECT 1 FROM saved_workout_plans p
+                WHERE p.username = w.username AND p.plan_data = w.workout_data)
+        """)
+        # Daily Check-in tracked workout_checkins; keep that plan active where it has one.
+        con.execute("""
+            UPDATE saved_workout_plans SET is_active = (
+                SELECT COUNT(*) > 0 FROM workout_checkins w
+                WHERE w.username = saved_workout_plans.username
+                  AND w.workout_data = saved_workout_plans.plan_data AND w.is_active = 1)
+            WHERE username IN (SELECT username FROM workout_checkins WHERE is_active = 1)
+        """)
+        con.execute("DROP TABLE workout_checkins")
+    # Newest active plan wins where a user ended up with several.
+    con.execute("""
+        UPDATE saved_workout_plans SET is_active = 0
+        WHERE is_active = 1 AND id <> (
+            SELECT p.id FROM saved_workout_plans p
+            WHERE p.username = saved_workout_plans.username AND p.is_active = 1
+            ORDER BY p.created_at DESC, p.id DESC LIMIT 1)
+    """)
+    con.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_saved_workout_plans_one_active
+        ON saved_workout_plans(username) WHERE is_active = 1
+    """)
+    con.execute("""
+        CREATE VIEW IF NOT EXISTS workout_checkins AS
+        SELECT id, username, plan_data AS workout_data, plan_name,
+               duration_weeks, created_at, is_active
+        FROM saved_workout_plans
+    """)
+
+
+def _m6_plan_calendar(con):
+    """
+    Normalized workout plan rows plus the per-date workout calendar. Existing
+    plans are broken down once; active plans are scheduled from the date the
+    old code counted weeks from (created_at).
+    """
+    if "started_on" not in _columns(con, "saved_workout_plans"):
+        con.execute("ALTER TABLE saved_workout_plans ADD COLUMN started_on TEXT")
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS workout_plan_weeks (
+            plan_id     INTEGER NOT NULL,
+            week_number INTEGER NOT NULL,     -- 1-based position in the schedule
+            focus       TEXT,
+            PRIMARY KEY (plan_id, week_number)
+        ) WITHOUT ROWID
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS workout_plan_days (
+            id             INTEGER PRIMARY KEY AUTOINCREMENT,
+            plan_id        INTEGER NOT NULL,
+            week_number    INTEGER NOT NULL,
+            position       INTEGER NOT NULL,
+            day_label      TEXT,
+            weekday        INTEGER,           -- 0=Monday, NULL if the label names no weekday
+            focus          TEXT,
+            exercise_count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS workout_plan_exercises (
+            day_id   INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            text     TEXT NOT NULL,
+            PRIMARY KEY (day_id, position)
+        ) WITHOUT ROWID
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS workout_calendar (
+            username    TEXT NOT NULL,
+            cal_date    TEXT NOT NULL,
+            plan_id     INTEGER NOT NULL,
+            week_number INTEGER NOT NULL,
+            day_id      INTEGER,              -- NULL = nothing planned that day
+            PRIMARY KEY (username, cal_date)
+        ) WITHOUT ROWID
+    """)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_workout_plan_days_plan ON workout_plan_days(plan_id, week_number, position)")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_workout_calendar_plan ON workout_calendar(plan_id)")
+
+    plans = con.execute(
+        "SELECT id, username, plan_data, is_active, created_at FROM saved_workout_plans"
+    ).fetchall()
+    for plan_id, username, plan_json, is_active, created_at in plans:
+        try:
+            plan_data = json.loads(plan_json)
+        except (TypeError, ValueError):
+            continue
+        _m6_store_plan(con, plan_id, plan_data)
+        if is_active:
+            con.execute("UPDATE saved_workout_plans SET started_on = ? WHERE id = ?",
+                        (created_at[:10], plan_id))
+            _m6_fill_calendar(con, username, plan_id, created_at[:10])
+
+
+# plan_calendar as it stood at version 6, frozen here so migration 6 keeps
+# doing the same thing whatever that module does later.
+
+_M6_WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+
+def _m6_weekday(label):
+    text = (label or "").lower()
+    for i, name in enumerate(_M6_WEEKDAYS):
+        if name in text:
+            return i
+    for i, name in enumerate(_M6_WEEKDAYS):
+        if text.startswith(name[:3]):
+            return i
+    return None
+
+
+def _m6_store_plan(con, plan_id, plan_data):
+    schedule = plan_data.get("schedule", []) if isinstance(plan_data, dict) else []
+    exercises = []
+    for week_number, week in enumerate(schedule, start=1):
+        if not isinstance(week, dict):
+            continue
+        con.execute("INSERT INTO workout_plan_weeks(plan_id, week_number, focus) VALUES(?,?,?)",
+                    (plan_id, week_number, week.get("focus")))
+        for position, day in enumerate(week.get("workouts", [])):
+            if not isinstance(day, dict):
+                continue
+            items = [e if isinstance(e, str) else str(e) for e in day.get("exercises", []) or []]
+            cur = con.execute("""
+                INSERT INTO workout_plan_days
+                (plan_id, week_number, position, day_label, weekday, focus, exercise_count)
+                VALUES(?,?,?,?,?,?,?)
+            """, (plan_id, week_number, position, day.get("day", ""),
+                  _m6_weekday(day.get("day")), day.get("focus"), len(items)))
+            exercises.extend((cur.lastrowid, i, text) for i, text in enumerate(items))
+    con.executemany("INSERT INTO workout_plan_exercises(day_id, position, text) VALUES(?,?,?)", exercises)
+
+
+def _m6_fill_calendar(con, username, plan_id, start):
+    start = datetime.strptime(start[:10], "%Y-%m-%d").date()
+    weeks = con.execute("SELECT COUNT(*) FROM workout_plan_weeks WHERE plan_id = ?", (plan_id,)).fetchone()[0]
+    day_ids = {}
+    for day_id, week_number, weekday in con.execute(
+        "SELECT id, week_number, weekday FROM workout_plan_days WHERE plan_id = ? AND weekday IS NOT NULL "
+        "ORDER BY position DESC", (plan_id,)
+    ):
+        day_ids[(week_number, weekday)] = day_id
+    rows = []
+    for offset in range(weeks * 7):
+        d = start + timedelta(days=offset)
+        rows.append((username, d.isoformat(), plan_id, offset // 7 + 1,
+                     day_ids.get((offset // 7 + 1, d.weekday()))))
+    con.execute("DELETE FROM workout_calendar WHERE username = ? AND cal_date >= ?", (username, start.isoformat()))
+    con.executemany("""
+        INSERT INTO workout_calendar(username, cal_date, plan_id, week_number, day_id)
+        VALUES(?,?,?,?,?)
+    """, rows)
+
+
+def _queue_rebuild(con, name):
+    """Have migrate() run REBUILDS[name] once every pending migration is applied."""
+    con.execute("CREATE TABLE IF NOT EXISTS schema_rebuilds (name TEXT PRIMARY KEY)")
+    con.execute("INSERT OR IGNORE INTO schema_rebuilds(name) VALUES(?)", (name,))
+
+
+def _m7_user_streaks(con):
+    """Per-user streak summary, kept up to date by the diary writes (see streaks.py)."""
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS user_streaks (
+            username    TEXT PRIMARY KEY,
+            run_start   TEXT NOT NULL,   -- first day of the newest run of consecutive days
+            last_logged TEXT NOT NULL,   -- newest diary day
+            current_run INTEGER NOT NULL,
+            longest_run INTEGER NOT NULL,
+            updated_at  TEXT NOT NULL
+        )
+    """)
+    _queue_rebuild(con, "user_streaks")
+
+
+def _m8_diary_rollups(con):
+    """Weekly / monthly / quarterly diary sums per user (see rollups.py)."""
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS diary_rollups (
+            username     TEXT NOT NULL,
+            period       TEXT NOT NULL,      -- 'week' | 'month' | 'quarter'
+            period_start TEXT NOT NULL,      -- first day of the period
+            days_logged  INTEGER NOT NULL DEFAULT 0,
+            mood_sum     REAL NOT NULL DEFAULT 0,  mood_n   INTEGER NOT NULL DEFAULT 0,
+            energy_sum   REAL NOT NULL DEFAULT 0,  energy_n INTEGER NOT NULL DEFAULT 0,
+            sleep_sum    REAL NOT NULL DEFAULT 0,  sleep_n  INTEGER NOT NULL DEFAULT 0,
+            water_sum    REAL NOT NULL DEFAULT 0,  water_n  INTEGER NOT NULL DEFAULT 0,
+            steps_sum    REAL NOT NULL DEFAULT 0,  steps_n  INTEGER NOT NULL DEFAULT 0,
+            workouts     INTEGER NOT NULL DEFAULT 0,
+            diet_days    INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (username, period, period_start)
+        ) WITHOUT ROWID
+    """)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_diary_rollups_period ON diary_rollups(period, period_start)")
+    _queue_rebuild(con, "diary_rollups")
+
+
+def _m9_full_text_search(con):
+    """FTS5 indexes over diary notes, canvas entries and wins, synced by triggers (see search.py)."""
+    for fts, table, cols in (
+        ("diary_fts", "daily_diary", ("journal_text", "workout_notes", "diet_notes")),
+        ("canvas_fts", "canvas_entries", ("content", "tags")),
+        ("wins_fts", "daily_wins", ("win1", "win2", "win3")),
+    ):
+        col_list = ", ".join(cols)
+        new_vals = ", ".join(f"new.{c}" for c in cols)
+        old_vals = ", ".join(f"old.{c}" for c in cols)
+        con.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {col_list}, content='{table}', content_rowid='id',
+                tokenize='porter unicode61 remove_diacritics 2'
+            )
+        """)
+        con.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, {col_list}) VALUES (new.id, {new_vals});
+            END
+        """)
+        con.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', old.id, {old_vals});
+            END
+        """)
+        con.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {col_list} ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', old.id, {old_vals});
+                INSERT INTO {fts}(rowid, {col_list}) VALUES (new.id, {new_vals});
+            END
+        """)
+    _queue_rebuild(con, "search")
+
+
+def _m10_energy_state(con):
+    """Per-user weight trend / adaptive TDEE summary (see energy.py)."""
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS energy_state (
+            username     TEXT PRIMARY KEY,
+            trend_kg     REAL NOT NULL,      -- smoothed weight as of trend_date
+            trend_date   TEXT NOT NULL,      -- newest weigh-in folded in
+            slope_kg_day REAL NOT NULL,
+            tdee         REAL NOT NULL,      -- kcal/day estimate
+            tdee_var     REAL NOT NULL,
+            intake_kcal  REAL NOT NULL,      -- on-plan days since trend_date
+            intake_days  INTEGER NOT NULL,
+            intake_last  TEXT,
+            weigh_ins    INTEGER NOT NULL,
+            updated_at   TEXT NOT NULL
+        )
+    """)
+    _queue_rebuild(con, "energy_state")
+
+
+def _m11_cohort_analytics(con):
+    """Cross-user summary tables for the admin dashboard (see cohorts.py); filled by the first refresh."""
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS cohort_activity (
+            period       TEXT NOT NULL,      -- 'day' | 'week' | 'month'
+            period_start TEXT NOT NULL,
+            active_users INTEGER NOT NULL,   -- users with at least one diary day in the period
+            PRIMARY KEY (period, period_start)
+        ) WITHOUT ROWID
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS cohort_members (
+            username    TEXT PRIMARY KEY,
+            cohort_week TEXT NOT NULL        -- Monday of the user's first diary week
+        ) WITHOUT ROWID
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS cohort_retention (
+            cohort_week TEXT NOT NULL,
+            active_week TEXT NOT NULL,
+            users       INTEGER NOT NULL,
+            PRIMARY KEY (cohort_week, active_week)
+        ) WITHOUT ROWID
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS cohort_funnel (
+            as_of    TEXT NOT NULL,          -- last day of the window
+            position INTEGER NOT NULL,
+            stage    TEXT NOT NULL,
+            users    INTEGER NOT NULL,
+            PRIMARY KEY (as_of, position)
+        ) WITHOUT ROWID
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS cohort_goal_stats (
+            as_of       TEXT NOT NULL,
+            goal_type   TEXT NOT NULL,       -- 'none' for users without an active goal
+            users       INTEGER NOT NULL,
+            days_logged INTEGER NOT NULL,
+            avg_mood    REAL,
+            avg_sleep   REAL,
+            avg_energy  REAL,
+            PRIMARY KEY (as_of, goal_type)
+        ) WITHOUT ROWID
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS cohort_refresh (
+            id           INTEGER PRIMARY KEY CHECK (id = 1),
+            refreshed_at TEXT NOT NULL,      -- datetime('now', 'localtime') of the last refresh
+            refreshed_on TEXT NOT NULL       -- the `today` it ran for
+        )
+    """)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_workout_calendar_date ON workout_calendar(cal_date, day_id)")
+
+
+def _m12_archive_state(con):
+    """Retention horizon of tables pruned into the columnar archive (see archive.py)."""
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS archive_state (
+            table_name    TEXT PRIMARY KEY,
+            pruned_before TEXT NOT NULL,     -- rows dated before this live in the archive
+            archive_dir   TEXT NOT NULL,
+            rows_archived INTEGER NOT NULL,
+            pruned_at     TEXT NOT NULL
+        )
+    """)
+
+
+def _m13_checkin_notes(con):
+    """Daily Check-in notes in their own column (databases that ran migration 4 before it added one)."""
+    if "checkin_notes" not in _columns(con, "daily_diary"):
+        con.execute("ALTER TABLE daily_diary ADD COLUMN checkin_notes TEXT")
+
+
+def _m14_archived_diary_runs(con):
+    """Runs of archived diary days, so streak and energy recomputes still count them (see archive.py)."""
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS archived_diary_runs (
+            username  TEXT NOT NULL,
+            kind      TEXT NOT NULL,         -- 'logged': a checked-in diary row, 'diet': diet_followed = 1
+            run_start TEXT NOT NULL,
+            run_end   TEXT NOT NULL,         -- inclusive
+            PRIMARY KEY (username, kind, run_start)
+        ) WITHOUT ROWID
+    """)
+    if con.execute("SELECT 1 FROM archive_state WHERE table_name = 'daily_diary'").fetchone():
+        for name in ("archived_diary_runs", "user_streaks", "energy_state"):
+            _queue_rebuild(con, name)
+
+
+def _m15_diary_imported(con):
+    """
+    daily_diary.imported: 1 while only a wearable import has written the day,
+    which then isn't a check-in. Rows written before the flag that hold
+    nothing but steps / sleep are taken to be imports (archive.imported
+    applies the same rule to archived rows).
+    """
+    if "imported" not in _columns(con, "daily_diary"):
+        con.execute("ALTER TABLE daily_diary ADD COLUMN imported INTEGER NOT NULL DEFAULT 0")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_daily_diary_checkins ON daily_diary(entry_date, username) "
+                "WHERE imported = 0")
+    blank = [c for c in _columns(con, "daily_diary")
+             if c not in ("id", "username", "entry_date", "created_at", "updated_at",
+                          "steps_count", "sleep_hours", "imported")]
+    con.execute(f"""
+        UPDATE daily_diary SET imported = 1
+        WHERE imported = 0 AND {" AND ".join(f"COALESCE({c}, 0) IN (0, '')" for c in blank)}
+    """)
+    for name in ("archived_diary_runs", "user_streaks", "diary_rollups", "cohorts"):
+        _queue_rebuild(con, name)
+
+
+def _m16_batch_plan_saves(con):
+    """Profiles batch_planner.py has saved plans for, so a resumed batch doesn't save them again."""
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS batch_plan_saves (
+            batch           TEXT NOT NULL,   -- the run's checkpoint file
+            profile_id      TEXT NOT NULL,
+            username        TEXT NOT NULL,
+            workout_plan_id INTEGER,
+            diet_plan_id    INTEGER,
+            saved_at        TEXT NOT NULL,
+            PRIMARY KEY (batch, profile_id)
+        ) WITHOUT ROWID
+    """)
+
+
+def _m17_search_by_user(con):
+    """Search indexes that also hold the username, so FTS scopes a query to one user (see search.py)."""
+    for fts, table, cols in (
+        ("diary_fts", "daily_diary", ("journal_text", "workout_notes", "diet_notes", "username")),
+        ("canvas_fts", "canvas_entries", ("content", "tags", "username")),
+        ("wins_fts", "daily_wins", ("win1", "win2", "win3", "username")),
+    ):
+        for suffix in ("ai", "ad", "au"):
+            con.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+        con.execute(f"DROP TABLE IF EXISTS {fts}")
+        col_list = ", ".join(cols)
+        new_vals = ", ".join(f"new.{c}" for c in cols)
+        old_vals = ", ".join(f"old.{c}" for c in cols)
+        con.execute(f"""
+            CREATE VIRTUAL TABLE {fts} USING fts5(
+                {col_list}, content='{table}', content_rowid='id',
+                tokenize='porter unicode61 remove_diacritics 2'
+            )
+        """)
+        con.execute(f"""
+            CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, {col_list}) VALUES (new.id, {new_vals});
+            END
+        """)
+        con.execute(f"""
+            CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', old.id, {old_vals});
+            END
+        """)
+        con.execute(f"""
+            CREATE TRIGGER {fts}_au AFTER UPDATE OF {col_list} ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', old.id, {old_vals});
+                INSERT INTO {fts}(rowid, {col_list}) VALUES (new.id, {new_vals});
+            END
+        """)
+    _queue_rebuild(con, "search")
+
+
+MIGRATIONS = [
+    (1, "baseline schema", _m1_baseline),
+    (2, "daily_wins.win_date, weekly_reviews.on_track, canvas_entries.tags", _m2_column_fixes),
+    (3, "per-user / per-date indexes", _m3_indexes),
+    (4, "merge daily_checkin_logs into daily_diary", _m4_merge_checkins),
+    (5, "workout_checkins becomes a view over saved_workout_plans", _m5_workout_checkins_view),
+    (6, "normalized workout plans and per-date workout calendar", _m6_plan_calendar),
+    (7, "user_streaks summary table", _m7_user_streaks),
+    (8, "weekly/monthly/quarterly diary rollups", _m8_diary_rollups),
+    (9, "full-text search over diary, canvas and wins", _m9_full_text_search),
+    (10, "energy_state weight trend / adaptive TDEE", _m10_energy_state),
+    (11, "cohort analytics summary tables", _m11_cohort_analytics),
+    (12, "archive_state for pruned history", _m12_archive_state),
+    (13, "daily_diary.checkin_notes", _m13_checkin_notes),
+    (14, "archived_diary_runs for streak / energy recomputes", _m14_archived_diary_runs),
+    (15, "daily_diary.imported for wearable-only days", _m15_diary_imported),
+    (16, "batch_plan_saves for resumable batch runs", _m16_batch_plan_saves),
+    (17, "search indexes scoped by username", _m17_search_by_user),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Summary tables derived from the source tables, recomputed by the current
+# code. Migrations only create them and queue a rebuild (_queue_rebuild),
+# which migrate() runs after the last migration, so a shipped migration
+# does the same thing however these modules change later.
+REBUILDS = {
+    "archived_diary_runs": archive.rebuild_runs,
+    "user_streaks": streaks.backfill,
+    "diary_rollups": rollups.rebuild,
+    "search": search.rebuild,
+    "energy_state": energy.backfill,
+    "cohorts": cohorts.rebuild,
+}
+
+
+# ──────────────────────────────────────────────────────────────
+# RUNNER
+# ──────────────────────────────────────────────────────────────
+
+def get_version(db_name=DB_NAME):
+    con = connect(db_name, readonly=True)
+    version = con.execute("PRAGMA user_version").fetchone()[0]
+    con.close()
+    return version
+
+
+def migrate(db_name=DB_NAME, verbose=False):
+    """Apply pending migrations in order. Returns the resulting schema version."""
+    con = connect(db_name)
+    try:
+        version = con.execute("PRAGMA user_version").fetchone()[0]
+        for number, description, apply in MIGRATIONS:
+            if number <= version:
+                continue
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                # Another process may have migrated while we waited for the lock.
+                current = con.execute("PRAGMA user_version").fetchone()[0]
+                if number > current:
+                    apply(con)
+                    con.execute(f"PRAGMA user_version = {number}")
+                con.commit()
+            except BaseException:
+                con.rollback()
+                raise
+            version = number
+            if verbose:
+                print(f"  applied {number}: {description}")
+        _run_rebuilds(con, verbose)
+        return version
+    finally:
+        con.close()
+        # Idle connections may have cached the old schema.
+        discard_idle(db_name)
+
+
+def _run_rebuilds(con, verbose=False):
+    """Run every queued rebuild, each in its own transaction with its dequeue."""
+    if not con.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='schema_rebuilds'").fetchone():
+        return
+    for (name,) in con.execute("SELECT name FROM schema_rebuilds ORDER BY rowid").fetchall():
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have run it while we waited for the lock.
+            if con.execute("SELECT 1 FROM schema_rebuilds WHERE name = ?", (name,)).fetchone():
+                REBUILDS[name](con)
+                con.execute("DELETE FROM schema_rebuilds WHERE name = ?", (name,))
+            con.commit()
+        except BaseException:
+            con.rollback()
+            raise
+        if verbose:
+            print(f"  rebuilt {name}")
+
+
+def bootstrap(db_name=DB_NAME):
+    """Bring `db_name` up to date once per process. Cheap to call on every rerun."""
+    key = os.path.abspath(db_name)
+    if key in _ready:
+        return
+    with _lock:
+        if key not in _ready:
+            migrate(db_name)
+            _ready.add(key)
+
+
+# ──────────────────────────────────────────────────────────────
+# QUERY PLAN CHECK
+# ──────────────────────────────────────────────────────────────
+
+# --check explains the queries the data modules actually run: HOT_WRITES
+# seed a scratch copy of the database, then every public read
+# (READ_PREFIXES) of QUERY_MODULES is called on it — once with its defaults
+# and once more with each optional argument SAMPLE_ARGS has a value for —
+# and every statement traced along the way is explained.
+QUERY_MODULES = ("database", "database_extended", "database_tracker", "content_pool", "engine.telemetry")
+READ_PREFIXES = ("get_", "verify_", "search_", "count_")
+# Tables that stay a handful of rows (bookkeeping, week-by-week summaries); scanning them is fine.
+SMALL_TABLES = {"schema_rebuilds", "cohort_retention"}
+SAMPLE_ARGS = {
+    "username": "u", "usernames": ["u"], "password": "p", "plan_id": 1, "mood": "calm",
+    "date": "2024-01-03", "entry_date": "2024-01-03", "todo_date": "2024-01-03", "on": date(2024, 1, 3),
+    "start_date": "2024-01-01", "end_date": "2024-01-31", "start": "2024-01-01", "end": "2024-01-31",
+    "week_start": "2024-01-01", "week_start_str": "2024-01-01",
+    "after": ("2024-01-31", 10 ** 9), "metric": "weight", "text": "knee hurt",
+}
+HOT_WRITES = [
+    ("database", "add_user", ("u", "p")),
+    ("database", "log_mood", ("u", 4, "Good", "", "")),
+    ("database_tracker", "save_goal", ("u", "Fat Loss", "", 80, 75, "2024-01-01", "2024-03-01")),
+    ("database_tracker", "upsert_diary", ("u", "2024-01-03"), {"mood": 4, "journal_text": "knee hurt"}),
+    ("database_tracker", "log_weight", ("u", "2024-01-03", 80)),
+    ("database_tracker", "save_workout_plan", ("u", "Plan", "Fat Loss", 1, {"schedule": [
+        {"focus": "Base", "workouts": [{"day": "Monday", "exercises": ["Squat"]}]}]})),
+    ("database_tracker", "save_diet_plan", ("u", "Diet", "Fat Loss", 2000, {})),
+    ("database_tracker", "save_wins", ("u", "2024-01-03", "a", "b", "c")),
+    ("database_tracker", "add_todo", ("u", "2024-01-03", "stretch")),
+    ("database_tracker", "save_canvas_entry", ("u", "knee hurt")),
+    ("database_tracker", "save_weekly_review", ("u", "2024-01-01", "2024-01-07", 4, 3, 7, 6, 1, 1, 0, "", "")),
+    ("content_pool", "add_affirmations", ([{"text": "Breathe.", "mood": "calm"}],)),
+]
+
+
+def _trace_queries(db_name):
+    """Run HOT_WRITES and the public reads on `db_name`. Returns (statements, failed calls)."""
+    import importlib
+    import inspect
+    from database_pool import trace
+
+    statements, failed = {}, []
+    modules = {name: importlib.import_module(name) for name in QUERY_MODULES}
+    saved = {name: m.DB_NAME for name, m in modules.items()}
+    trace(db_name, lambda sql: statements.setdefault(sql.strip(), None))
+
+    def call(label, fn, *args, **kwargs):
+        try:
+            fn(*args, **kwargs)
+        except Exception as e:
+            failed.append((label, f"call failed: {e!r}"))
+
+    try:
+        for m in modules.values():
+            m.DB_NAME = db_name
+        for module, name, args, *kwargs in HOT_WRITES:
+            call(f"{module}.{name}", getattr(modules[module], name), *args, **(kwargs[0] if kwargs else {}))
+        for module, m in modules.items():
+            for name, fn in sorted(vars(m).items()):
+                if not (name.startswith(READ_PREFIXES) and callable(fn) and fn.__module__ == module):
+                    continue
+                params = inspect.signature(fn).parameters.values()
+                missing = [p.name for p in params if p.default is p.empty and p.name not in SAMPLE_ARGS]
+                if missing:
+                    failed.append((f"{module}.{name}", f"no SAMPLE_ARGS for {', '.join(missing)}"))
+                    continue
+                required = {p.name: SAMPLE_ARGS[p.name] for p in params if p.default is p.empty}
+                optional = {p.name: SAMPLE_ARGS[p.name] for p in params
+                            if p.default is not p.empty and p.name in SAMPLE_ARGS}
+                call(f"{module}.{name}", fn, **required)
+                if optional:
+                    call(f"{module}.{name}", fn, **required, **optional)
+    finally:
+        for name, m in modules.items():
+            m.DB_NAME = saved[name]
+        trace(db_name, None)
+        discard_idle(db_name)
+    return list(statements), failed
+
+
+def check_query_plans(db_name=DB_NAME):
+    """
+    EXPLAIN QUERY PLAN every statement the data modules run (see HOT_WRITES),
+    on a scratch copy of `db_name`. Returns [(sql, plan_detail)] for each one
+    that scans a whole table, plus any call that couldn't be made; an empty
+    list means all are indexed.
+    """
+    import shutil
+    import sqlite3
+    import tempfile
+
+    bootstrap(db_name)
+    scratch_dir = tempfile.mkdtemp(prefix="routinex-check-")
+    scratch = os.path.join(scratch_dir, "check.db")
+    try:
+        src, dst = sqlite3.connect(db_name), sqlite3.connect(scratch)
+        src.backup(dst)
+        src.close(); dst.close()
+        statements, problems = _trace_queries(scratch)
+
+        con = sqlite3.connect(scratch)
+        tables = {r[0] for r in con.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for sql in statements:
+            if sql.split(None, 1)[0].upper() not in ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE"):
+                continue
+            for row in con.execute("EXPLAIN QUERY PLAN " + sql):
+                detail = row[-1]
+                words = detail.split()
+                if (words[0] == "SCAN" and words[1] in tables - SMALL_TABLES
+                        and " USING " not in detail and "VIRTUAL TABLE" not in detail):
+                    problems.append((sql, detail))
+        con.close()
+        return problems
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    db = DB_NAME
+    before = get_version(db) if os.path.exists(db) else 0
+    after = migrate(db, verbose=True)
+    print(f"{db}: schema version {before} -> {after} (latest {LATEST_VERSION})")
+    if "--check" in sys.argv:
+        scans = check_query_plans(db)
+        for sql, detail in scans:
+            print(f"  {detail}\n    {sql}")
+        print(f"{len(scans)} full scans or failed calls")
+        sys.exit(1 if scans else 0)
@@ -0,0 +1,107 @@
+"""
+plan_calendar.py
+Normalized workout plan storage and the per-date workout calendar.
+
+A saved plan's schedule is stored once as rows
+(workout_plan_weeks → workout_plan_days → workout_plan_exercises) next to the
+plan_data blob, and activating a plan materializes workout_calendar: one row
+per (username, date) naming the plan, week and day planned for that date
+(day_id NULL = nothing scheduled). "What is today's workout" is then a single
+primary-key lookup, and adherence is a join against daily_diary.
+
+Every function takes an open connection so it runs inside the caller's
+transaction (database_tracker and migrations).
+"""
+
+from datetime import date, datetime, timedelta
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+
+def parse_weekday(label):
+    """0=Monday … 6=Sunday for labels like "Monday", "Mon - Push", "Day 3: Friday"; else None."""
+    text = (label or "").lower()
+    for i, name in enumerate(WEEKDAYS):
+        if name in text:
+            return i
+    for i, name in enumerate(WEEKDAYS):
+        if text.startswith(name[:3]):
+            return i
+    return None
+
+
+def store_plan_structure(con, plan_id, plan_data):
+    """Write the weeks/days/exercises rows for one plan. Returns the number of weeks."""
+    schedule = plan_data.get("schedule", []) if isinstance(plan_data, dict) else []
+    exercises = []
+    for week_number, week in enumerate(schedule, start=1):
+        if not isinstance(week, dict):
+            continue
+        con.execute(
+            "INSERT INTO workout_plan_weeks(plan_id, week_number, focus) VALUES(?,?,?)",
+            (plan_id, week_number, week.get("focus"))
+        )
+        for position, day in enumerate(week.get("workouts", [])):
+            if not isinstance(day, dict):
+                continue
+            items = [e if isinstance(e, str) else str(e) for e in day.get("exercises", []) or []]
+            cur = con.execute("""
+                INSERT INTO workout_plan_days
+                (plan_id, week_number, position, day_label, weekday, focus, exercise_count)
+                VALUES(?,?,?,?,?,?,?)
+            """, (plan_id, week_number, position, day.get("day", ""),
+                  parse_weekday(day.get("day")), day.get("focus"), len(items)))
+            exercises.extend((cur.lastrowid, i, text) for i, text in enumerate(items))
+    con.executemany(
+        "INSERT INTO workout_plan_exercises(day_id, position, text) VALUES(?,?,?)", exercises
+    )
+    return len(schedule)
+
+
+def delete_plan_structure(con, plan_id):
+    con.execute("""
+        DELETE FROM workout_plan_exercises
+        WHERE day_id IN (SELECT id FROM workout_plan_days WHERE plan_id = ?)
+    """, (plan_id,))
+    con.execute("DELETE FROM workout_plan_days WHERE plan_id = ?", (plan_id,))
+    con.execute("DELETE FROM workout_plan_weeks WHERE plan_id = ?", (plan_id,))
+    con.execute("DELETE FROM workout_calendar WHERE plan_id = ?", (plan_id,))
+
+
+def fill_calendar(con, username, plan_id, start=None):
+    """
+    Schedule `plan_id` for `username` from `start` (default today) to the end
+    of its last week, replacing whatever was planned from that date on.
+    Week 1 starts on `start`; each day follows the plan day with that weekday.
+    """
+    start = start or date.today()
+    if isinstance(start, str):
+        start = datetime.strptime(start[:10], "%Y-%m-%d").date()
+    weeks = con.execute(
+        "SELECT COUNT(*) FROM workout_plan_weeks WHERE plan_id = ?", (plan_id,)
+    ).fetchone()[0]
+    day_ids = {}
+    for day_id, week_number, weekday in con.execute(
+        "SELECT id, week_number, weekday FROM workout_plan_days WHERE plan_id = ? AND weekday IS NOT NULL "
+        "ORDER BY position DESC", (plan_id,)
+    ):
+        day_ids[(week_number, weekday)] = day_id   # first matching day in the week wins
+    rows = []
+    for offset in range(weeks * 7):
+        d = start + timedelta(days=offset)
+        week_number = offset // 7 + 1
+        rows.append((username, d.isoformat(), plan_id, week_number,
+                     day_ids.get((week_number, d.weekday()))))
+    clear_calendar(con, username, start)
+    con.executemany("""
+        INSERT INTO workout_calendar(username, cal_date, plan_id, week_number, day_id)
+        VALUES(?,?,?,?,?)
+    """, rows)
+    return len(rows)
+
+
+def clear_calendar(con, username, after):
+    """Drop planned days from `after` on; days already lived through stay for adherence history."""
+    if not isinstance(after, str):
+        after = after.isoformat()
+    con.execute("DELETE FROM workout_calendar WHERE username = ? AND cal_date >= ?", (username, after))
@@ -0,0 +1,305 @@
+"""
+plan_codec.py
+Binary encoding for the plan blobs (saved_plans, saved_workout_plans,
+saved_diet_plans; workout_checkins is a view over saved_workout_plans).
+
+    blob = encode(plan_dict)      # bytes, stored in the plan_data column
+    plan = decode(value)          # accepts new blobs and old JSON text rows
+
+A blob is a 6-byte header — b"RXB", format version, serializer id,
+compressor id — followed by the payload. Serializers and compressors are
+looked up by id, so rows written with any registered pair stay readable when
+the defaults change:
+
+    serializers: 1 = compact JSON, 2 = msgpack (if installed)
+    compressors: 0 = none, 1 = zlib, 2 = zstd (if zstandard is installed)
+
+Rows that are still JSON text (everything written before this module) are
+decoded with json.loads. `reencode` converts them in small batches so it can
+run next to the app:
+
+    python plan_codec.py stats
+    python plan_codec.py reencode [--batch 200] [--vacuum]
+    python plan_codec.py bench [--plans 50]
+"""
+
+import argparse
+import json
+import os
+import time
+import zlib
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from database_pool import connect
+
+DB_NAME = "routinex.db"
+
+MAGIC = b"RXB"
+FORMAT_VERSION = 1
+HEADER_SIZE = len(MAGIC) + 3
+MIN_COMPRESS_BYTES = 256        # smaller payloads are stored uncompressed
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+
+# (table, id column, blob column) — every column written through encode()
+PLAN_COLUMNS = [
+    ("saved_plans", "id", "plan_data"),
+    ("saved_workout_plans", "id", "plan_data"),
+    ("saved_diet_plans", "id", "plan_data"),
+]
+
+
+# ──────────────────────────────────────────────────────────────
+# REGISTRY
+# ──────────────────────────────────────────────────────────────
+
+def _json_dumps(obj):
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _json_loads(data):
+    return json.loads(data)
+
+
+SERIALIZERS = {1: ("json", _json_dumps, _json_loads)}
+COMPRESSORS = {0: ("none", bytes, bytes),
+               1: ("zlib", lambda b: zlib.compress(b, ZLIB_LEVEL), zlib.decompress)}
+
+if msgpack is not None:
+    SERIALIZERS[2] = ("msgpack",
+                      lambda obj: msgpack.packb(obj, use_bin_type=True),
+                      lambda data: msgpack.unpackb(data, raw=False))
+
+if zstandard is not None:
+    _zc = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    _zd = zstandard.ZstdDecompressor()
+    COMPRESSORS[2] = ("zstd", _zc.compress, _zd.decompress)
+
+DEFAULT_SERIALIZER = 2 if msgpack is not None else 1
+DEFAULT_COMPRESSOR = 2 if zstandard is not None else 1
+
+
+# ──────────────────────────────────────────────────────────────
+# ENCODE / DECODE
+# ──────────────────────────────────────────────────────────────
+
+def encode(obj, serializer=None, compressor=None):
+    """Serialize `obj` to a versioned blob."""
+    serializer = DEFAULT_SERIALIZER if serializer is None else serializer
+    compressor = DEFAULT_COMPRESSOR if compressor is None else compressor
+    payload = SERIALIZERS[serializer][1](obj)
+    if len(payload) < MIN_COMPRESS_BYTES:
+        compressor = 0
+    payload = COMPRESSORS[compressor][1](payload)
+    return MAGIC + bytes((FORMAT_VERSION, serializer, compressor)) + payload
+
+
+def is_encoded(value):
+    return isinstance(value, (bytes, memoryview)) and bytes(value[:len(MAGIC)]) == MAGIC
+
+
+def decode(value):
+    """Inverse of encode(); also reads legacy JSON text (str or bytes)."""
+    if value is None:
+        return None
+    if not is_encoded(value):
+        return json.loads(value)
+    value = bytes(value)
+    version, serializer, compressor = value[len(MAGIC):HEADER_SIZE]
+    if version != FORMAT_VERSION:
+        raise ValueError(f"unsupported plan blob version {version}")
+    try:
+        loads = SERIALIZERS[serializer][2]
+        decompress = COMPRESSORS[compressor][2]
+    except KeyError:
+        raise ValueError(f"plan blob needs serializer {serializer} / compressor {compressor}, "
+                         f"which is not installed") from None
+    return loads(decompress(value[HEADER_SIZE:]))
+
+
+# ──────────────────────────────────────────────────────────────
+# RE-ENCODE
+# ──────────────────────────────────────────────────────────────
+
+def column_stats(db_name=DB_NAME):
+    """Rows, bytes and how many rows are still legacy JSON, per plan column."""
+    con = connect(db_name, readonly=True)
+    out = []
+    for table, _, col in PLAN_COLUMNS:
+        rows, total, legacy = con.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST({col} AS BLOB))), 0), "
+            f"COALESCE(SUM(typeof({col}) = 'text'), 0) FROM {table}"
+        ).fetchone()
+        out.append({"table": table, "rows": rows, "bytes": total, "legacy_rows": legacy})
+    con.close()
+    return out
+
+
+def reencode(db_name=DB_NAME, batch=200, pause_s=0.0, verbose=False):
+    """
+    Rewrite every legacy JSON row (and blobs from other codec settings) with
+    the current defaults, `batch` rows per short transaction. Safe to stop and
+    re-run. Returns the number of rows rewritten.
+    """
+    header = MAGIC + bytes((FORMAT_VERSION, DEFAULT_SERIALIZER))
+    done = 0
+    for table, id_col, col in PLAN_COLUMNS:
+        last_id = 0
+        while True:
+            con = connect(db_name)
+            rows = con.execute(
+                f"SELECT {id_col}, {col} FROM {table} WHERE {id_col} > ? ORDER BY {id_col} LIMIT ?",
+                (last_id, batch)
+            ).fetchall()
+            if not rows:
+                con.close()
+                break
+            last_id = rows[-1][0]
+            updates = []
+            for row_id, value in rows:
+                if is_encoded(value) and bytes(value[:len(header)]) == header:
+                    continue
+                try:
+                    updates.append((encode(decode(value)), row_id))
+                except (ValueError, TypeError) as e:
+                    print(f"  skipped {table}.{id_col}={row_id}: {e}")
+            if updates:
+                con.executemany(f"UPDATE {table} SET {col} = ? WHERE {id_col} = ?", updates)
+                con.commit()
+            con.close()
+            done += len(updates)
+            if verbose and updates:
+                print(f"  {table}: re-encoded {len(updates)} rows (up to id {last_id})")
+            if pause_s:
+                time.sleep(pause_s)
+    return done
+
+
+# ──────────────────────────────────────────────────────────────
+# BENCHMARK
+# ──────────────────────────────────────────────────────────────
+
+def _sample_plan(weeks=12):
+    days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+    return {
+        "summary": "Progressive strength block with weekly deload and conditioning finishers.",
+        "schedule": [{
+            "week_number": w + 1,
+            "focus": ["Strength", "Hypertrophy", "Power", "Deload"][w % 4],
+            "workouts": [{
+                "day": d,
+                "focus": "Rest" if d == "Sunday" else f"Session {i + 1}",
+                "exercises": [] if d == "Sunday" else [
+                    f"Movement {(w * 7 + i) * 6 + k}: {3 + k % 3} sets x {6 + (w + k) % 7} reps "
+                    f"@ RPE {7 + k % 3}, rest {60 + 15 * (k % 4)}s" for k in range(6)
+                ],
+            } for i, d in enumerate(days)],
+        } for w in range(weeks)],
+    }
+
+
+def _bench(plans, db_dir):
+    import database_tracker
+    import migrations
+    import database_pool as pool
+
+    plan = _sample_plan()
+    legacy = json.dumps(plan)
+    blob = encode(plan)
+    n = 200
+    t = time.perf_counter()
+    for _ in range(n):
+        json.dumps(plan)
+    t_json_enc = (time.perf_counter() - t) / n * 1000
+    t = time.perf_counter()
+    for _ in range(n):
+        json.loads(legacy)
+    t_json_dec = (time.perf_counter() - t) / n * 1000
+    t = time.perf_counter()
+    for _ in range(n):
+        encode(plan)
+    t_enc = (time.perf_counter() - t) / n * 1000
+    t = time.perf_counter()
+    for _ in range(n):
+        decode(blob)
+    t_dec = (time.perf_counter() - t) / n * 1000
+    codec = f"{SERIALIZERS[DEFAULT_SERIALIZER][0]}+{COMPRESSORS[DEFAULT_COMPRESSOR][0]}"
+    print(f"one 12-week plan   legacy JSON {len(legacy):>7} B  enc {t_json_enc:.3f} ms  dec {t_json_dec:.3f} ms")
+    print(f"{codec:<18} {'':>11} {len(blob):>7} B  enc {t_enc:.3f} ms  dec {t_dec:.3f} ms")
+
+    db_path = os.path.join(db_dir, "bench.db")
+    pool.close_all()
+    migrations._ready.discard(os.path.abspath(db_path))
+    database_tracker.DB_NAME = db_path
+    database_tracker.init_tracker_db()
+    for i in range(plans):
+        database_tracker.save_workout_plan("bench", f"Plan {i}", "Strength", 3, plan, set_active=False)
+    con = connect(db_path)
+    con.executemany("UPDATE saved_workout_plans SET plan_data = ? WHERE id = ?",
+                    [(legacy, r[0]) for r in con.execute("SELECT id FROM saved_workout_plans").fetchall()])
+    con.commit()
+    con.close()
+
+    def page_load():
+        # What the profile page does: list plans, then load each one.
+        start = time.perf_counter()
+        for wp in database_tracker.get_all_workout_plans("bench"):
+            database_tracker.get_workout_plan_by_id(wp["id"])
+        return (time.perf_counter() - start) * 1000
+
+    def db_bytes():
+        c = connect(db_path)
+        c.execute("VACUUM")
+        size = c.execute("PRAGMA page_count").fetchone()[0] * c.execute("PRAGMA page_size").fetchone()[0]
+        c.close()
+        return size
+
+    before = (db_bytes(), min(page_load() for _ in range(5)))
+    reencode(db_path)
+    pool.discard_idle(db_path)
+    after = (db_bytes(), min(page_load() for _ in range(5)))
+    print(f"{plans} saved plans   legacy: db {before[0] / 1024:8.0f} KiB  page {before[1]:7.1f} ms")
+    print(f"{'':<17} {codec:<7} db {after[0] / 1024:8.0f} KiB  page {after[1]:7.1f} ms")
+
+
+# ──────────────────────────────────────────────────────────────
+# CLI
+# ──────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Inspect, re-encode or benchmark plan blobs.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats", help="rows, bytes and legacy JSON rows per plan column")
+    r = sub.add_parser("reencode", help="rewrite legacy JSON rows with the current codec")
+    r.add_argument("--batch", type=int, default=200, help="rows per transaction")
+    r.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between batches")
+    r.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to return freed pages")
+    b = sub.add_parser("bench", help="size / encode / decode / page-load benchmark on a temp DB")
+    b.add_argument("--plans", type=int, default=50, help="saved plans for the page-load test")
+    args = ap.parse_args()
+
+    if args.cmd == "bench":
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            _bench(args.plans, tmp)
+    else:
+        from migrations import bootstrap
+        bootstrap(DB_NAME)
+        if args.cmd == "reencode":
+            n = reencode(DB_NAME, args.batch, args.pause, verbose=True)
+            print(f"Re-encoded {n} rows")
+            if args.vacuum:
+                con = connect(DB_NAME)
+                con.execute("VACUUM")
+                con.close()
+        for s in column_stats(DB_NAME):
+            print(f"{s['table']:<20} rows={s['rows']:<6} bytes={s['bytes']:<10} legacy={s['legacy_rows']}")
@@ -0,0 +1,151 @@
+"""
+rollups.py
+Per-user weekly / monthly / quarterly sums of the daily diary.
+
+    diary_rollups(username, period, period_start, days_logged,
+                  mood_sum, mood_n, energy_sum, energy_n, sleep_sum, sleep_n,
+                  water_sum, water_n, steps_sum, steps_n, workouts, diet_days)
+
+period is 'week' (starting Monday), 'month' or 'quarter'. Sums and counts
+follow get_weekly_stats' rules — empty/zero values are left out of an
+average — so avg = sum / n; days_logged leaves out days only a wearable
+import wrote (imported = 1). Every diary upsert applies (new row - old row)
+to its three periods inside the same transaction; rebuild() recomputes them
+from daily_diary and the archived rows (archive.stage) with one GROUP BY per
+period.
+
+    python rollups.py rebuild [--user NAME]
+
+Every function takes an open connection so it runs inside the caller's
+transaction (database_tracker and migrations).
+"""
+
+import argparse
+from datetime import date, timedelta
+
+import archive
+
+PERIODS = ("week", "month", "quarter")
+
+# (rollup column prefix, daily_diary column) for the averaged metrics
+AVERAGED = [("mood", "mood"), ("energy", "energy_level"), ("sleep", "sleep_hours"),
+            ("water", "water_glasses"), ("steps", "steps_count")]
+
+# diary columns whose values feed the rollups
+SOURCE_COLUMNS = [col for _, col in AVERAGED] + ["workout_done", "diet_followed", "imported"]
+
+_COUNTERS = (["days_logged"]
+             + [c for prefix, _ in AVERAGED for c in (f"{prefix}_sum", f"{prefix}_n")]
+             + ["workouts", "diet_days"])
+
+# SQL expressions for each period's first day, over a column holding an ISO date
+_PERIOD_START_SQL = {
+    "week": "date({d}, '-' || ((CAST(strftime('%w', {d}) AS INTEGER) + 6) % 7) || ' days')",
+    "month": "strftime('%Y-%m-01', {d})",
+    "quarter": "printf('%s-%02d-01', strftime('%Y', {d}), "
+               "((CAST(strftime('%m', {d}) AS INTEGER) - 1) / 3) * 3 + 1)",
+}
+
+
+def period_start(period, day):
+    """First day (ISO string) of the week/month/quarter containing `day`."""
+    if isinstance(day, str):
+        day = date.fromisoformat(day[:10])
+    if period == "week":
+        return (day - timedelta(days=day.weekday())).isoformat()
+    if period == "month":
+        return day.replace(day=1).isoformat()
+    if period == "quarter":
+        return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1).isoformat()
+    raise ValueError(f"unknown period {period!r}")
+
+
+def _contribution(row):
+    """One diary row's contribution to every counter (all zeros for no row)."""
+    if not row:
+        return [0] * len(_COUNTERS)
+    out = [0 if row.get("imported") else 1]
+    for _, col in AVERAGED:
+        v = row.get(col)
+        out += [v, 1] if v else [0, 0]
+    out.append(1 if row.get("workout_done") == 1 else 0)
+    out.append(1 if row.get("diet_followed") == 1 else 0)
+    return out
+
+
+_APPLY_SQL = f"""
+    INSERT INTO diary_rollups(username, period, period_start, {", ".join(_COUNTERS)})
+    VALUES(?, ?, ?, {", ".join("?" * len(_COUNTERS))})
+    ON CONFLICT(username, period, period_start) DO UPDATE SET
+        {", ".join(f"{c} = {c} + excluded.{c}" for c in _COUNTERS)}
+"""
+
+
+def apply(con, username, entry_date, old_row, new_row):
+    """Add `new_row` and subtract `old_row` (None for a new day) for one diary day."""
+    apply_many(con, username, [(entry_date, old_row, new_row)])
+
+
+def apply_many(con, username, changes):
+    """apply() for many (entry_date, old_row, new_row) changes, merged per period first."""
+    totals = {}
+    for entry_date, old_row, new_row in changes:
+        delta = [n - o for n, o in zip(_contribution(new_row), _contribution(old_row))]
+        if not any(delta):
+            continue
+        for p in PERIODS:
+            key = (p, period_start(p, entry_date))
+            acc = totals.get(key)
+            totals[key] = delta if acc is None else [a + d for a, d in zip(acc, delta)]
+    con.executemany(_APPLY_SQL, [
+        [username, p, start] + delta for (p, start), delta in totals.items()
+    ])
+
+
+def rebuild(con, username=None):
+    """Recompute rollups from daily_diary and the archive for one user or everyone. Returns rows written."""
+    where, args = ("WHERE username = ?", (username,)) if username else ("", ())
+    con.execute(f"DELETE FROM diary_rollups {where}", args)
+    archive.stage(con, username)
+    cols = ", ".join(["username", "entry_date"] + SOURCE_COLUMNS)
+    source = f"(SELECT {cols} FROM main.daily_diary UNION ALL SELECT {cols} FROM temp.archived_daily_diary)"
+    sums = ", ".join(
+        f"SUM(COALESCE(NULLIF({col}, 0), 0)), SUM(NULLIF({col}, 0) IS NOT NULL)"
+        for _, col in AVERAGED
+    )
+    for p in PERIODS:
+        con.execute(f"""
+            INSERT INTO diary_rollups(username, period, period_start, {", ".join(_COUNTERS)})
+            SELECT username, '{p}', {_PERIOD_START_SQL[p].format(d="entry_date")} AS ps,
+                   SUM(imported = 0), {sums}, SUM(workout_done = 1), SUM(diet_followed = 1)
+            FROM {source} {where}
+            GROUP BY username, ps
+        """, args)
+    return con.execute(f"SELECT COUNT(*) FROM diary_rollups {where}", args).fetchone()[0]
+
+
+def averages(row):
+    """Turn a diary_rollups row into the averages/counts the dashboards show."""
+    out = {"period_start": row["period_start"], "days_logged": row["days_logged"],
+           "workouts_completed": row["workouts"], "days_diet_followed": row["diet_days"]}
+    for prefix, _ in AVERAGED:
+        n = row[f"{prefix}_n"]
+        out[f"avg_{prefix}"] = round(row[f"{prefix}_sum"] / n, 1) if n else None
+    return out
+
+
+if __name__ == "__main__":
+    from database_pool import transaction
+    from migrations import bootstrap
+
+    ap = argparse.ArgumentParser(description="Rebuild the diary rollup tables.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("rebuild", help="recompute rollups from daily_diary and the archive")
+    r.add_argument("--user", help="only this user (default: everyone)")
+    r.add_argument("--db", default="routinex.db")
+    args = ap.parse_args()
+
+    bootstrap(args.db)
+    with transaction(args.db) as con:
+        n = rebuild(con, args.user)
+    print(f"Rebuilt {n} rollup rows")
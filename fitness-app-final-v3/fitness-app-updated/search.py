@@ -0,0 +1,128 @@
+"""
+search.py
+Full-text search over what users write: diary journal / workout / diet
+notes, canvas journal entries and daily wins.
+
+Each source has an external-content FTS5 table (the text is not stored
+twice) kept in sync by AFTER INSERT / UPDATE / DELETE triggers on the source
+table, so every writer — database_tracker, migrations, bulk imports — keeps
+the index current without calling anything here. Each index also holds the
+row's username, so a search only walks that user's postings.
+
+    diary_fts(journal_text, workout_notes, diet_notes, username) -> daily_diary
+    canvas_fts(content, tags, username)                          -> canvas_entries
+    wins_fts(win1, win2, win3, username)                         -> daily_wins
+
+    python search.py rebuild
+    python search.py query --user NAME "knee hurt" [--start 2024-01-01]
+
+Every function takes an open connection so it runs inside the caller's
+transaction (database_tracker and migrations).
+"""
+
+import argparse
+import re
+
+# source -> (fts table, content table t, indexed columns, entry date expression)
+SOURCES = {
+    "diary": ("diary_fts", "daily_diary", ("journal_text", "workout_notes", "diet_notes"), "t.entry_date"),
+    "canvas": ("canvas_fts", "canvas_entries", ("content", "tags"), "substr(t.created_at, 1, 10)"),
+    "wins": ("wins_fts", "daily_wins", ("win1", "win2", "win3"), "t.win_date"),
+}
+
+SNIPPET_TOKENS = 12
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+# Too common to narrow anything down; dropped from queries unless nothing else is left.
+STOPWORDS = frozenset("""
+    a an and are as at be been but by did do does for from had has have he her him his how
+    if in into is it its me my no not of on or our she so than that the their them then
+    there they this to too was we were what when where which who why will with you your
+""".split())
+
+
+def rebuild(con):
+    """Re-index every source from its content table."""
+    for fts, _, _, _ in SOURCES.values():
+        con.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def match_query(text):
+    """
+    Turn what a user typed into an FTS5 query: every word quoted (so
+    punctuation and keywords like NOT can't break the syntax) and OR-ed, so
+    "that week my knee hurt" ranks entries with the most/rarest words first.
+    Stopwords are dropped unless the text is nothing but. The last word also
+    matches as a prefix. Returns None if nothing is left.
+    """
+    words = [w for w in _WORD.findall(text.lower()) if len(w) > 1 or w.isdigit()]
+    if not words:
+        return None
+    words = [w for w in words if w not in STOPWORDS] or words
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return " OR ".join(terms)
+
+
+def search(con, username, text, start=None, end=None, sources=None, limit=20):
+    """
+    Best-ranked (bm25) hits for `text` in one user's entries, optionally
+    between `start` and `end` (ISO dates, inclusive). Each hit is
+    {"source", "id", "entry_date", "snippet", "rank"}; snippets mark matches
+    with **bold**.
+    """
+    query = match_query(text)
+    if query is None:
+        return []
+    user = '"' + username.replace('"', '""') + '"'
+    parts, args = [], []
+    for source in sources or SOURCES:
+        fts, table, cols, date_expr = SOURCES[source]
+        # The username phrase keeps the match inside this user's rows (its
+        # tokens may be shared with another username, hence t.username too).
+        where = [f"{fts} MATCH ?", "t.username = ?"]
+        args += [f"username:{user} AND {{{' '.join(cols)}}}: ({query})", username]
+        if start:
+            where.append(f"{date_expr} >= ?")
+            args.append(str(start))
+        if end:
+            where.append(f"{date_expr} <= ?")
+            args.append(str(end))
+        parts.append(f"""
+            SELECT '{source}' AS source, t.id AS id, {date_expr} AS entry_date,
+                   snippet({fts}, -1, '**', '**', '…', {SNIPPET_TOKENS}) AS snippet,
+                   bm25({fts}, {", ".join(["1"] * len(cols))}, 0) AS rank
+            FROM {fts} CROSS JOIN {table} t ON t.id = {fts}.rowid   -- FTS first, then rowid lookups
+            WHERE {" AND ".join(where)}
+        """)
+    rows = con.execute(" UNION ALL ".join(parts) + " ORDER BY rank LIMIT ?", args + [limit]).fetchall()
+    return [dict(zip(("source", "id", "entry_date", "snippet", "rank"), r)) for r in rows]
+
+
+if __name__ == "__main__":
+    from database_pool import connect, transaction
+    from migrations import bootstrap
+
+    ap = argparse.ArgumentParser(description="Rebuild or query the full-text search index.")
+    ap.add_argument("--db", default="routinex.db")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("rebuild", help="re-index every source table")
+    q = sub.add_parser("query", help="search one user's entries")
+    q.add_argument("text")
+    q.add_argument("--user", required=True)
+    q.add_argument("--start")
+    q.add_argument("--end")
+    q.add_argument("--limit", type=int, default=20)
+    args = ap.parse_args()
+
+    bootstrap(args.db)
+    if args.cmd == "rebuild":
+        with transaction(args.db) as con:
+            rebuild(con)
+        print("Rebuilt the search index")
+    else:
+        con = connect(args.db, readonly=True)
+        for hit in search(con, args.user, args.text, args.start, args.end, limit=args.limit):
+            print(f"{hit['entry_date']}  {hit['source']:<6} #{hit['id']:<6} {hit['snippet']}")
+        con.close()
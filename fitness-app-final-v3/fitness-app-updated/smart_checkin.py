@@ -16,23 +16,28 @@ from database_tracker import (
     init_tracker_db,
     # goals
     save_goal, get_active_goal,
+    # snapshot (today's diary, todos, streak, goal, weight, plans, review)
+    get_user_snapshot,
     # diary
-    upsert_diary, get_diary_entry, get_diary_last_n, get_diary_range,
+    upsert_diary, get_diary_last_n, get_diary_range,
     # weight
-    log_weight, get_weight_history, get_latest_weight,
+    log_weight, get_series,
     # weekly
-    save_weekly_review, get_weekly_reviews, get_latest_weekly_review, get_weekly_stats,
+    save_weekly_review, get_weekly_reviews_page, load_pages, get_weekly_stats,
+    get_rollups, get_insights,
+    get_weight_change,
     # workout plans
-    get_active_workout_plan,
-    # diet plans
-    get_active_diet_plan,
+    get_workout_adherence,
     # todos
-    add_todo, get_todos, toggle_todo, delete_todo,
+    add_todo, toggle_todo, delete_todo,
     # wins
     save_wins, get_wins,
     # streak
     get_streak,
 )
+from engine.coach import generate_ai_weekly_review, fallback_review
+from insights import describe as describe_correlation
+from wearables import import_export, open_export
 
 
 # ─────────────────────────────────────────────────────────────
@@ -49,6 +54,10 @@ MOOD_MAP = {
 
 DAYS = ["Monday","Tuesday","Wednesday","Thursday","Friday","Saturday","Sunday"]
 
+# Progress chart ranges (days; None = all history) and points per chart
+CHART_RANGES = {"30 days": 30, "90 days": 90, "1 year": 365, "All time": None}
+CHART_POINTS = 120
+
 
 # ─────────────────────────────────────────────────────────────
 # CSS
@@ -325,68 +334,15 @@ def _dark_line(df, x, y, title, color="#818cf8", yrange=None):
     return fig
 
 
-# ─────────────────────────────────────────────────────────────
-# AI WEEKLY REVIEW GENERATOR
-# ─────────────────────────────────────────────────────────────
-
-def generate_ai_weekly_review(username, stats, goal, latest_weight, start_weight, target_weight, target_date_str):
-    """Call Gemini to produce a short weekly summary + suggestion."""
-    try:
-        import google.generativeai as genai
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            return "Keep up the great work this week!", "Stay consistent with your plan."
-        genai.configure(api_key=api_key)
-
-        weight_delta = ""
-        if latest_weight and start_weight:
-            delta = latest_weight - start_weight
-            weight_delta = f"Current weight: {latest_weight} kg (started at {start_weight} kg, delta: {delta:+.1f} kg)."
-
-        goal_info = ""
-        if goal:
-            goal_info = (f"Goal: {goal.get('description','')}, "
-                         f"Target weight: {goal.get('target_weight','N/A')} kg by {target_date_str}.")
-
-        prompt = f"""
-You are a supportive fitness coach reviewing a user's weekly data.
-Be concise, warm, motivating. Use 2-3 sentences max per section.
-
-WEEKLY DATA:
-- Days logged: {stats.get('days_logged',0)}/7
-- Avg Mood: {stats.get('avg_mood','N/A')}/5
-- Avg Energy: {stats.get('avg_energy','N/A')}/5
-- Avg Sleep: {stats.get('avg_sleep','N/A')} hrs
-- Avg Water: {stats.get('avg_water','N/A')} glasses
-- Workouts completed: {stats.get('workouts_completed',0)} days
-- Diet followed: {stats.get('days_diet_followed',0)} days
-{weight_delta}
-{goal_info}
-
-OUTPUT (JSON only, no markdown):
-{{
-  "summary": "2-3 sentence summary of the week",
-  "suggestion": "1-2 specific actionable next-step recommendations",
-  "on_track": true or false
-}}
-"""
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        resp = model.generate_content(prompt)
-        txt = resp.text.strip().strip("```json").strip("```").strip()
-        data = json.loads(txt)
-        return data.get("summary",""), data.get("suggestion",""), data.get("on_track",True)
-    except Exception:
-        return ("Great effort this week! Keep logging your progress.", "Stay consistent — every day counts.", True)
-
-
 # ─────────────────────────────────────────────────────────────
 # SUB-SECTIONS
 # ─────────────────────────────────────────────────────────────
 
-def render_today_diary(username):
+def render_today_diary(username, snap=None):
+    snap = snap or get_user_snapshot(username)
     today = _today()
     today_fmt = date.today().strftime("%A, %B %d %Y")
-    existing = get_diary_entry(username, today)
+    existing = snap["diary"]
 
     st.markdown(f"""
     <div class='dash-card-accent'>
@@ -496,39 +452,35 @@ def render_today_diary(username):
     st.markdown("---")
     st.markdown("<div class='sec-label'>📋 Your Active Plans</div>", unsafe_allow_html=True)
 
-    wp = get_active_workout_plan(username)
-    dp = get_active_diet_plan(username)
+    wp = snap["workout"]
+    dp = snap["diet"]
 
     pw, pd_ = st.columns(2)
     with pw:
         if wp:
-            schedule = wp["plan_data"].get("schedule", [])
-            # figure out which week
-            plan_start = datetime.strptime(wp["created_at"][:10], "%Y-%m-%d").date()
-            days_elapsed = (date.today() - plan_start).days
-            week_idx = min(days_elapsed // 7, len(schedule) - 1)
-            today_dow = date.today().weekday()  # 0=Mon
-
-            if schedule and week_idx >= 0:
-                current_week = schedule[week_idx]
-                workouts_today = [d for d in current_week.get("workouts", [])
-                                  if d.get("day","").lower()[:3] == date.today().strftime("%a").lower()]
-                today_workout = workouts_today[0] if workouts_today else None
-
-                st.markdown(f"""
-                <div class='dash-card'>
-                    <div style='font-size:11px;color:#6366f1;text-transform:uppercase;letter-spacing:1px;'>Active Workout</div>
-                    <div style='font-size:18px;font-weight:700;color:#e2e2f0;margin:6px 0;'>{wp['plan_name']}</div>
-                    <div style='font-size:12px;color:#6b6b8d;'>Week {week_idx+1} of {len(schedule)}</div>
-                </div>
-                """, unsafe_allow_html=True)
-
-                if today_workout:
-                    st.markdown(f"**Today:** _{today_workout.get('focus','')}_ ")
-                    for ex in today_workout.get("exercises", [])[:5]:
-                        st.markdown(f"<div class='exercise-item'>• {ex}</div>", unsafe_allow_html=True)
-                else:
-                    st.caption("Rest day today 🛌")
+            # Today's row of the workout calendar — no plan_data parsing
+            if wp["week_number"] is not None:
+                week_line = f"Week {wp['week_number']} of {wp['duration_weeks'] or '?'}"
+            else:
+                week_line = "Plan complete 🏁"
+            adherence = get_workout_adherence(username, date.today() - timedelta(days=29), date.today())
+            if adherence["planned"]:
+                week_line += f" · {adherence['completed']}/{adherence['planned']} planned workouts done (30d)"
+
+            st.markdown(f"""
+            <div class='dash-card'>
+                <div style='font-size:11px;color:#6366f1;text-transform:uppercase;letter-spacing:1px;'>Active Workout</div>
+                <div style='font-size:18px;font-weight:700;color:#e2e2f0;margin:6px 0;'>{wp['plan_name']}</div>
+                <div style='font-size:12px;color:#6b6b8d;'>{week_line}</div>
+            </div>
+            """, unsafe_allow_html=True)
+
+            if wp["exercises"]:
+                st.markdown(f"**Today:** _{wp.get('focus') or ''}_ ")
+                for ex in wp["exercises"][:5]:
+                    st.markdown(f"<div class='exercise-item'>• {ex}</div>", unsafe_allow_html=True)
+            elif wp["week_number"] is not None:
+                st.caption("Rest day today 🛌")
         else:
             st.markdown("""
             <div class='dash-card' style='text-align:center;padding:30px;'>
@@ -547,14 +499,9 @@ def render_today_diary(username):
             </div>
             """, unsafe_allow_html=True)
             # Show today's meals from weekly plan
-            plan_data = dp["plan_data"]
-            today_dow_name = date.today().strftime("%A")
-            days_data = plan_data.get("days", [])
-            today_meals = next((d for d in days_data if d.get("day","").lower() == today_dow_name.lower()), None)
-            if today_meals:
-                for meal in today_meals.get("meals", [])[:3]:
-                    st.markdown(f"**{meal.get('meal_name','')}:** "
-                                + ", ".join(fi.get("item","") for fi in meal.get("food_items",[])[:2]))
+            for meal in snap["today_meals"][:3]:
+                st.markdown(f"**{meal.get('meal_name','')}:** "
+                            + ", ".join(fi.get("item","") for fi in meal.get("food_items",[])[:2]))
         else:
             st.markdown("""
             <div class='dash-card' style='text-align:center;padding:30px;'>
@@ -567,7 +514,7 @@ def render_today_diary(username):
     st.markdown("---")
     st.markdown("<div class='sec-label'>✅ Today's To-Do</div>", unsafe_allow_html=True)
 
-    todos = get_todos(username, today)
+    todos = snap["todos"]
     for todo in todos:
         tc1, tc2 = st.columns([8, 1])
         with tc1:
@@ -594,12 +541,14 @@ def render_today_diary(username):
 
 # ─────────────────────────────────────────────────────────────
 
-def render_weight_tracker(username):
+def render_weight_tracker(username, snap=None):
     st.markdown("<div class='sec-label'>⚖️ Weight Tracker</div>", unsafe_allow_html=True)
 
-    goal = get_active_goal(username)
-    history = get_weight_history(username)
-    latest = get_latest_weight(username)
+    snap = snap or get_user_snapshot(username)
+    goal = snap["goal"]
+    # Whole history, downsampled to a fixed number of points
+    history = get_series(username, "weight", points=CHART_POINTS)
+    latest = snap["latest_weight"]
 
     # ── LOG WEIGHT ──
     with st.form("weight_form"):
@@ -622,11 +571,11 @@ def render_weight_tracker(username):
     # ── CHART ──
     if history:
         df_w = pd.DataFrame(history)
-        df_w["log_date"] = pd.to_datetime(df_w["log_date"])
+        df_w["date"] = pd.to_datetime(df_w["date"])
 
         fig = go.Figure()
         fig.add_trace(go.Scatter(
-            x=df_w["log_date"], y=df_w["weight_kg"],
+            x=df_w["date"], y=df_w["value"],
             mode="lines+markers",
             line=dict(color="#818cf8", width=2.5),
             marker=dict(size=8, color="#6366f1",
@@ -663,7 +612,7 @@ def render_weight_tracker(username):
         if goal and goal.get("start_weight") and goal.get("target_weight"):
             sw = goal["start_weight"]
             tw = goal["target_weight"]
-            cw = history[-1]["weight_kg"]
+            cw = latest["weight_kg"]
             total_needed = abs(sw - tw)
             achieved = abs(sw - cw)
             pct = min(100, round((achieved / total_needed) * 100)) if total_needed > 0 else 100
@@ -698,6 +647,21 @@ def render_weight_tracker(username):
             </div>
             """, unsafe_allow_html=True)
 
+        # Adaptive trend / TDEE (energy_state, updated on every weigh-in)
+        est = snap.get("energy")
+        if est:
+            e1, e2, e3 = st.columns(3)
+            e1.metric("Trend Weight", f"{est['trend_kg']} kg", f"{est['rate_kg_week']:+} kg/wk",
+                      delta_color="off")
+            e2.metric("Est. Maintenance", f"{est['tdee']} kcal",
+                      f"± {est['tdee_sd']}" if est["confident"] else "still learning", delta_color="off")
+            if est["projected_date"]:
+                e3.metric("Projected Goal Date", est["projected_date"],
+                          f"{est['days_to_goal']} days" if est["days_to_goal"] else "target reached",
+                          delta_color="off")
+            elif goal and goal.get("target_weight"):
+                e3.metric("Projected Goal Date", "—", "trend not heading there yet", delta_color="off")
+
     # ── GOAL SETTER ──
     st.markdown("---")
     st.markdown("<div class='sec-label'>🎯 Set / Update Goal</div>", unsafe_allow_html=True)
@@ -727,11 +691,50 @@ def render_weight_tracker(username):
 
 # ─────────────────────────────────────────────────────────────
 
-def render_weekly_review(username):
+def _render_review_card(summary, suggestion, on_track, title="AI Weekly Review"):
+    track_color = "#22c55e" if on_track else "#f59e0b"
+    track_label = "On Track ✅" if on_track else "Needs Attention ⚠️"
+    st.markdown(f"""
+    <div class='dash-card-accent' style='margin-top:16px;'>
+        <div style='display:flex;justify-content:space-between;align-items:flex-start;margin-bottom:14px;'>
+            <div style='font-family:Syne,sans-serif;font-size:20px;font-weight:800;color:#e2e2f0;'>
+                {title}
+            </div>
+            <span style='background:{track_color}22;color:{track_color};
+                         border:1px solid {track_color}55;border-radius:20px;
+                         padding:3px 12px;font-size:12px;font-weight:700;'>{track_label}</span>
+        </div>
+        <div style='color:#c4c4e0;font-size:14px;line-height:1.7;margin-bottom:14px;'>
+            {summary}
+        </div>
+        <div style='background:rgba(99,102,241,0.08);border-radius:10px;padding:14px;'>
+            <div style='font-size:11px;color:#6366f1;text-transform:uppercase;letter-spacing:1px;margin-bottom:6px;'>
+                💡 Recommendation
+            </div>
+            <div style='color:#c4c4e0;font-size:14px;line-height:1.6;'>{suggestion}</div>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+
+
+def render_weekly_review(username, snap=None):
     st.markdown("<div class='sec-label'>📊 Weekly Progress Review</div>", unsafe_allow_html=True)
 
+    snap = snap or get_user_snapshot(username)
     week_start = _week_monday()
     week_end = (date.fromisoformat(week_start) + timedelta(days=6)).isoformat()
+
+    # ── LATEST STORED REVIEW (precomputed by weekly_review_job.py) ──
+    latest = snap["latest_review"]
+    if latest and latest.get("ai_summary"):
+        on_track = latest.get("on_track")
+        _render_review_card(
+            latest["ai_summary"], latest.get("ai_suggestion", ""),
+            True if on_track is None else bool(on_track),
+            title=f"AI Review · week of {latest['week_start']}"
+        )
+        st.markdown("<br>", unsafe_allow_html=True)
+
     stats = get_weekly_stats(username, week_start)
 
     if not stats:
@@ -794,58 +797,37 @@ def render_weekly_review(username):
 
     # ── AI REVIEW BUTTON ──
     if st.button("🤖 Generate AI Weekly Review", type="primary", use_container_width=True, key="gen_review"):
-        goal = get_active_goal(username)
-        lw = get_latest_weight(username)
+        goal = snap["goal"]
+        lw = snap["latest_weight"]
         latest_w = lw["weight_kg"] if lw else None
         start_w = goal["start_weight"] if goal else None
         target_w = goal["target_weight"] if goal else None
         target_d = goal.get("target_date","") if goal else ""
 
         # Weight change vs previous week
-        prev_ws = (date.fromisoformat(week_start) - timedelta(days=7)).isoformat()
-        prev_we = (date.fromisoformat(week_start) - timedelta(days=1)).isoformat()
-        prev_entries = get_diary_range(username, prev_ws, prev_we)
-        w_change = 0.0
+        w_change = get_weight_change(username, week_start)
 
         with st.spinner("🤖 AI is analysing your week…"):
-            summary, suggestion, on_track = generate_ai_weekly_review(
+            review = generate_ai_weekly_review(
                 username, stats, goal, latest_w, start_w, target_w, target_d
             )
 
+        # A failed generation shows generic advice but isn't saved as the review
+        saved = (review[0], review[1], 1 if review[2] else 0) if review else (None, None, None)
         save_weekly_review(
             username, week_start, week_end,
             stats.get("avg_mood"), stats.get("avg_energy"),
             stats.get("avg_sleep"), stats.get("avg_water"),
             stats.get("workouts_completed",0), stats.get("days_diet_followed",0),
-            w_change, summary, suggestion
+            w_change, *saved
         )
 
-        track_color = "#22c55e" if on_track else "#f59e0b"
-        track_label = "On Track ✅" if on_track else "Needs Attention ⚠️"
-        st.markdown(f"""
-        <div class='dash-card-accent' style='margin-top:16px;'>
-            <div style='display:flex;justify-content:space-between;align-items:flex-start;margin-bottom:14px;'>
-                <div style='font-family:Syne,sans-serif;font-size:20px;font-weight:800;color:#e2e2f0;'>
-                    AI Weekly Review
-                </div>
-                <span style='background:{track_color}22;color:{track_color};
-                             border:1px solid {track_color}55;border-radius:20px;
-                             padding:3px 12px;font-size:12px;font-weight:700;'>{track_label}</span>
-            </div>
-            <div style='color:#c4c4e0;font-size:14px;line-height:1.7;margin-bottom:14px;'>
-                {summary}
-            </div>
-            <div style='background:rgba(99,102,241,0.08);border-radius:10px;padding:14px;'>
-                <div style='font-size:11px;color:#6366f1;text-transform:uppercase;letter-spacing:1px;margin-bottom:6px;'>
-                    💡 Recommendation
-                </div>
-                <div style='color:#c4c4e0;font-size:14px;line-height:1.6;'>{suggestion}</div>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+        _render_review_card(*(review or fallback_review()))
 
     # ── PAST REVIEWS ──
-    past = get_weekly_reviews(username, limit=8)
+    review_pages_key = f"past_review_page_count:{username}"
+    past_page = load_pages(get_weekly_reviews_page, username, st.session_state.setdefault(review_pages_key, 1))
+    past = past_page["items"]
     if past:
         st.markdown("---")
         st.markdown("<div class='sec-label'>📚 Past Weekly Reviews</div>", unsafe_allow_html=True)
@@ -861,6 +843,9 @@ def render_weekly_review(username):
                     st.markdown(f"**Summary:** {rev['ai_summary']}")
                 if rev.get("ai_suggestion"):
                     st.info(f"💡 {rev['ai_suggestion']}")
+        if past_page["next_cursor"] and st.button("Load older reviews", key="more_reviews"):
+            st.session_state[review_pages_key] += 1
+            st.rerun()
 
 
 # ─────────────────────────────────────────────────────────────
@@ -892,34 +877,37 @@ def render_progress_charts(username):
 
     st.markdown("<br>", unsafe_allow_html=True)
 
-    # ── MULTI-CHART ──
+    # ── MULTI-CHART (downsampled to CHART_POINTS whatever the range) ──
+    range_label = st.radio("Range", list(CHART_RANGES), index=0, horizontal=True, key="chart_range")
+    days = CHART_RANGES[range_label]
+    start = (date.today() - timedelta(days=days - 1)).isoformat() if days else None
+
+    def _series_chart(metric, title, color, yrange=None):
+        points = get_series(username, metric, start, points=CHART_POINTS)
+        if points:
+            dfs = pd.DataFrame(points)
+            dfs["date"] = pd.to_datetime(dfs["date"])
+            st.plotly_chart(_dark_line(dfs, "date", "value", title, color, yrange), use_container_width=True)
+
     ch1, ch2 = st.columns(2)
     with ch1:
-        if "mood" in df.columns:
-            fig = _dark_line(df, "entry_date", "mood", "Mood Over Time", "#818cf8", [0,6])
-            st.plotly_chart(fig, use_container_width=True)
+        _series_chart("mood", "Mood Over Time", "#818cf8", [0,6])
     with ch2:
-        if "sleep_hours" in df.columns:
-            fig = _dark_line(df, "entry_date", "sleep_hours", "Sleep Hours", "#34d399")
-            st.plotly_chart(fig, use_container_width=True)
+        _series_chart("sleep", "Sleep Hours", "#34d399")
 
     ch3, ch4 = st.columns(2)
     with ch3:
-        if "energy_level" in df.columns:
-            fig = _dark_line(df, "entry_date", "energy_level", "Energy Level", "#f472b6", [0,6])
-            st.plotly_chart(fig, use_container_width=True)
+        _series_chart("energy", "Energy Level", "#f472b6", [0,6])
     with ch4:
-        if "water_glasses" in df.columns:
-            fig = _dark_line(df, "entry_date", "water_glasses", "Water Glasses", "#60a5fa")
-            st.plotly_chart(fig, use_container_width=True)
+        _series_chart("water", "Water Glasses", "#60a5fa")
 
     # ── WEIGHT CHART ──
-    wh = get_weight_history(username, 30)
+    wh = get_series(username, "weight", start, points=CHART_POINTS)
     if wh:
         st.markdown("---")
         dfw = pd.DataFrame(wh)
-        dfw["log_date"] = pd.to_datetime(dfw["log_date"])
-        fig = _dark_line(dfw, "log_date", "weight_kg", "Weight Progress (kg)", "#a78bfa")
+        dfw["date"] = pd.to_datetime(dfw["date"])
+        fig = _dark_line(dfw, "date", "value", "Weight Progress (kg)", "#a78bfa")
         goal = get_active_goal(username)
         if goal and goal.get("target_weight"):
             fig.add_hline(y=goal["target_weight"], line_dash="dot", line_color="#22c55e",
@@ -927,12 +915,14 @@ def render_progress_charts(username):
                           annotation_font_color="#22c55e")
         st.plotly_chart(fig, use_container_width=True)
 
-    # ── WORKOUT ADHERENCE BAR ──
-    if "workout_done" in df.columns:
+    # ── WORKOUT ADHERENCE BAR (weekly rollups, no groupby) ──
+    weekly = get_rollups(username, "week", 5)
+    if weekly:
         st.markdown("---")
-        df["week"] = df["entry_date"].dt.strftime("Week %W")
-        weekly_w = df.groupby("week")["workout_done"].sum().reset_index()
-        weekly_w.columns = ["Week","Workouts"]
+        weekly_w = pd.DataFrame({
+            "Week": [date.fromisoformat(w["period_start"]).strftime("Week %W") for w in weekly],
+            "Workouts": [w["workouts_completed"] for w in weekly],
+        })
         fig = px.bar(weekly_w, x="Week", y="Workouts", title="Weekly Workout Adherence",
                      color_discrete_sequence=["#6366f1"])
         fig.update_layout(
@@ -947,12 +937,101 @@ def render_progress_charts(username):
         )
         st.plotly_chart(fig, use_container_width=True)
 
+    # ── LONG-RANGE TRENDS (monthly / quarterly rollups) ──
+    st.markdown("---")
+    period_label = st.radio("Long-range trends", ["Weekly", "Monthly", "Quarterly"],
+                            index=1, horizontal=True, key="trend_period")
+    period, limit = {"Weekly": ("week", 26), "Monthly": ("month", 12), "Quarterly": ("quarter", 8)}[period_label]
+    trend = get_rollups(username, period, limit)
+    if len(trend) > 1:
+        dft = pd.DataFrame(trend)
+        dft["period_start"] = pd.to_datetime(dft["period_start"])
+        dft["workout_rate"] = (dft["workouts_completed"] / dft["days_logged"] * 100).round(0)
+        t1, t2 = st.columns(2)
+        with t1:
+            st.plotly_chart(_dark_line(dft, "period_start", "avg_mood", f"Avg Mood ({period_label})",
+                                       "#818cf8", [0, 6]), use_container_width=True)
+        with t2:
+            st.plotly_chart(_dark_line(dft, "period_start", "workout_rate",
+                                       f"Workout Days % ({period_label})", "#fb923c", [0, 100]),
+                            use_container_width=True)
+    else:
+        st.caption("Keep logging — trends appear once you have more than one period of data.")
+
+    render_insights(username)
+
+
+def render_insights(username):
+    """Cross-metric insights over the whole history (cached until the next write)."""
+    ins = get_insights(username)
+    if not ins or ins["logged_days"] < 14:
+        return
+    st.markdown("---")
+    st.markdown("<div class='sec-label'>🧠 Insights</div>", unsafe_allow_html=True)
+    st.caption(f"From {ins['logged_days']} logged days since {ins['first_day']}")
+
+    if ins["correlations"]:
+        for corr in ins["correlations"][:4]:
+            st.markdown(f"• {describe_correlation(corr)}")
+    else:
+        st.caption("No strong links between your metrics yet.")
+
+    wk = ins["weekday"]
+    dfw = pd.DataFrame({
+        "Day": [d[:3] for d in DAYS],
+        "Workout %": [round(v * 100) if v is not None else 0 for v in wk["workout"]],
+        "Diet %": [round(v * 100) if v is not None else 0 for v in wk["diet"]],
+    }).melt(id_vars="Day", var_name="Metric", value_name="Rate")
+    fig = px.bar(dfw, x="Day", y="Rate", color="Metric", barmode="group",
+                 title="Adherence by Weekday", color_discrete_sequence=["#fb923c", "#34d399"])
+    fig.update_layout(
+        height=240, paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(255,255,255,0.02)",
+        font=dict(family="Plus Jakarta Sans", color="#a0a0c0"),
+        title_font_color="#c4c4e0",
+        xaxis=dict(showgrid=False, color="#555577"),
+        yaxis=dict(showgrid=True, gridcolor="rgba(255,255,255,0.05)", color="#555577", range=[0, 100]),
+        margin=dict(t=40, b=20, l=10, r=10),
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+    roll = ins["rolling"]
+    r1, r2, r3, r4 = st.columns(4)
+    for col, (name, label) in zip((r1, r2, r3, r4), (("mood", "Mood"), ("energy", "Energy"),
+                                                     ("sleep", "Sleep"), ("weight", "Weight"))):
+        now, base = roll[name]["7d"], roll[name]["28d"]
+        if now is not None:
+            col.metric(f"{label} (7d avg)", now,
+                       round(now - base, 2) if base is not None else None,
+                       delta_color="inverse" if name == "weight" else "normal")
+
+    if ins["anomalies"]:
+        with st.expander(f"⚠️ {len(ins['anomalies'])} unusual day(s) in the last month"):
+            for a in ins["anomalies"]:
+                st.markdown(f"**{a['date']}** — {a['metric']} {a['value']:g} "
+                            f"({'above' if a['z'] > 0 else 'below'} your 4-week norm, z = {a['z']:+})")
+
 
 # ─────────────────────────────────────────────────────────────
 
 def render_history_diary(username):
     st.markdown("<div class='sec-label'>📖 Diary History</div>", unsafe_allow_html=True)
 
+    with st.expander("⌚ Import from a wearable"):
+        st.caption("Apple Health export.zip / export.xml, Google Fit daily metrics CSV or Fitbit export CSV. "
+                   "Fills in steps, sleep and weight; days you already logged keep their values.")
+        uploaded = st.file_uploader("Export file", type=["zip", "xml", "csv"], key="wearable_export")
+        if uploaded and st.button("Import", key="wearable_import"):
+            bar = st.progress(0.0)
+            try:
+                with st.spinner("Importing…"):
+                    f, size = open_export(uploaded)
+                    summary = import_export(username, f, size,
+                                            progress=lambda done, total, _: bar.progress(min(done / total, 1.0)))
+                st.success(f"Imported {summary['diary_days']:,} diary days and {summary['weigh_ins']:,} weigh-ins.")
+            except ValueError as e:
+                st.error(str(e))
+
     diary = get_diary_last_n(username, 30)
     if not diary:
         st.info("No diary entries yet. Start logging today!")
@@ -987,7 +1066,9 @@ def show_smart_checkin(username):
     st.markdown(CHECKIN_CSS, unsafe_allow_html=True)
 
     # ── HEADER ──
-    streak = get_streak(username)
+    snap = get_user_snapshot(username)
+    streak_info = snap["streak"]
+    streak = streak_info["current"]
     st.markdown(f"""
     <div style='display:flex;justify-content:space-between;align-items:flex-start;margin-bottom:8px;'>
         <div>
@@ -998,7 +1079,7 @@ def show_smart_checkin(username):
             <div style='font-family:Syne,sans-serif;font-size:32px;font-weight:800;color:#f97316;'>
                 {streak}🔥
             </div>
-            <div style='font-size:11px;color:#555577;text-transform:uppercase;letter-spacing:1px;'>day streak</div>
+            <div style='font-size:11px;color:#555577;text-transform:uppercase;letter-spacing:1px;'>day streak · best {streak_info["longest"]}</div>
         </div>
     </div>
     """, unsafe_allow_html=True)
@@ -1013,13 +1094,13 @@ def show_smart_checkin(username):
     ])
 
     with tab_today:
-        render_today_diary(username)
+        render_today_diary(username, snap)
 
     with tab_weight:
-        render_weight_tracker(username)
+        render_weight_tracker(username, snap)
 
     with tab_weekly:
-        render_weekly_review(username)
+        render_weekly_review(username, snap)
 
     with tab_charts:
         render_progress_charts(username)
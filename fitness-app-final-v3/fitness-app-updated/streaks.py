@@ -0,0 +1,135 @@
+"""
+streaks.py
+Per-user logging streaks kept in the user_streaks summary row.
+
+    user_streaks(username, run_start, last_logged, current_run, longest_run)
+
+run_start..last_logged is the newest run of consecutive diary days; days
+only a wearable import wrote (imported = 1) don't count. Logging
+the day after last_logged extends it, a later day starts a new run; both are
+O(1) updates made inside the diary write's transaction. Anything else (a
+back-dated entry, a bulk import, a deleted day) recomputes the user's row
+with a gaps-and-islands query instead of walking dates in Python. Days
+pruned out of daily_diary still count through their archived_diary_runs.
+
+Every function takes an open connection so it runs inside the caller's
+transaction (database_tracker and migrations).
+"""
+
+from datetime import date, timedelta
+
+# Runs of consecutive checked-in diary days (day minus its row number is constant
+# within one), plus the runs of days pruned into the archive (see archive.py),
+# as [start, end] julian-day spans. _RUNS merges overlapping or adjacent
+# spans by carrying the furthest end seen so far.
+_SPANS = """
+    SELECT username, MIN(day) AS s, MAX(day) AS e
+    FROM (SELECT username, julianday(entry_date) AS day,
+                 julianday(entry_date) - ROW_NUMBER() OVER (PARTITION BY username ORDER BY entry_date) AS grp
+          FROM daily_diary WHERE imported = 0 AND {where})
+    GROUP BY username, grp
+    UNION ALL
+    SELECT username, julianday(run_start), julianday(run_end)
+    FROM archived_diary_runs WHERE kind = 'logged' AND {where}
+"""
+
+_RUNS = """
+    WITH spans AS ({spans}),
+    reach AS (
+        SELECT username, s, e, MAX(e) OVER (
+            PARTITION BY username ORDER BY s, e ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING) AS reach
+        FROM spans
+    ),
+    grouped AS (
+        SELECT username, s, e, SUM(reach IS NULL OR s > reach + 1) OVER (
+            PARTITION BY username ORDER BY s, e ROWS UNBOUNDED PRECEDING) AS grp
+        FROM reach
+    )
+    SELECT username, date(MIN(s)) AS run_start, date(MAX(e)) AS run_end,
+           CAST(MAX(e) - MIN(s) + 1 AS INTEGER) AS run_len
+    FROM grouped GROUP BY username, grp
+"""
+
+_ISLANDS = """
+    WITH islands AS ({runs}),
+    ranked AS (
+        SELECT *, ROW_NUMBER() OVER (PARTITION BY username ORDER BY run_end DESC) AS newest,
+               MAX(run_len) OVER (PARTITION BY username) AS longest
+        FROM islands
+    )
+    SELECT username, run_start, run_end, run_len, longest, datetime('now', 'localtime')
+    FROM ranked WHERE newest = 1
+"""
+
+
+def runs_sql(spans):
+    """SELECT username, run_start, run_end, run_len over a (username, s, e) julian-day span query."""
+    return _RUNS.format(spans=spans)
+
+
+_UPSERT = """
+    INSERT INTO user_streaks(username, run_start, last_logged, current_run, longest_run, updated_at)
+    {select}
+    ON CONFLICT(username) DO UPDATE SET
+        run_start=excluded.run_start, last_logged=excluded.last_logged,
+        current_run=excluded.current_run, longest_run=excluded.longest_run,
+        updated_at=excluded.updated_at
+"""
+
+
+def _select(where):
+    return _ISLANDS.format(runs=runs_sql(_SPANS.format(where=where)))
+
+
+def recompute(con, username):
+    """Rebuild one user's streak row from daily_diary and their archived runs."""
+    con.execute("DELETE FROM user_streaks WHERE username = ?", (username,))
+    con.execute(_UPSERT.format(select=_select("username = ?")), (username, username))
+
+
+def backfill(con):
+    """Rebuild every user's streak row in one statement. Returns the number of users."""
+    con.execute("DELETE FROM user_streaks")
+    con.execute(_UPSERT.format(select=_select("true")))
+    return con.execute("SELECT COUNT(*) FROM user_streaks").fetchone()[0]
+
+
+def record_day(con, username, entry_date):
+    """
+    Account for a newly logged diary day. Call only when the day did not
+    exist before or was imported (re-saving a logged day cannot change a
+    streak).
+    """
+    row = con.execute(
+        "SELECT run_start, last_logged, current_run, longest_run FROM user_streaks WHERE username = ?",
+        (username,)
+    ).fetchone()
+    day = date.fromisoformat(entry_date)
+    if row is None:
+        return recompute(con, username)       # first day, or history predates the summary row
+    else:
+        last = date.fromisoformat(row[1])
+        if day == last + timedelta(days=1):
+            run_start, current = row[0], row[2] + 1
+        elif day > last:
+            run_start, current = entry_date, 1
+        else:
+            return recompute(con, username)   # back-dated entry may merge runs
+        longest = max(row[3], current)
+    con.execute(_UPSERT.format(select="VALUES(?, ?, ?, ?, ?, datetime('now', 'localtime'))"),
+                (username, run_start, entry_date, current, longest))
+
+
+def current_streak(row, today=None):
+    """
+    Days in a row ending today, from a user_streaks row (0 if today isn't
+    logged yet) — the same rule the old date walk used.
+    """
+    if not row:
+        return 0
+    today = today or date.today()
+    last = date.fromisoformat(row["last_logged"])
+    start = date.fromisoformat(row["run_start"])
+    if last < today or start > today + timedelta(days=1):
+        return 0
+    return row["current_run"]
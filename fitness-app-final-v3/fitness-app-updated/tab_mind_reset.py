@@ -3,15 +3,17 @@ import os
 import time
 from datetime import datetime
 from dotenv import load_dotenv
-import google.generativeai as genai
-from googleapiclient.discovery import build
+
+from content_pool import serve_affirmation
+from vibe_cache import get_vibe_video
 
 # NEW: Import from main database
-from database_extended import (
+from database_tracker import (
     save_canvas_entry,
-    get_canvas_entries,
+    get_canvas_page,
     save_wins,
-    get_wins
+    get_wins_page,
+    load_pages
 )
 
 # --- 1. CONFIGURATION & SETUP ---
@@ -21,9 +23,6 @@ load_dotenv()
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-
 # --- 2. CSS & AESTHETICS (The "Mind Reset" Visual Engine) ---
 def inject_vibrant_css():
     st.markdown("""
@@ -107,27 +106,25 @@ def inject_vibrant_css():
     """, unsafe_allow_html=True)
 
 # --- 3. LOGIC ---
+# Vibe Check frequency -> affirmation pool mood tag
+AFFIRMATION_MOODS = {
+    "🌊 Deep Focus": "focus",
+    "⚡ High Energy": "energy",
+    "🌌 Cosmic Chill": "calm",
+    "🔥 Gym Mode": "drive",
+}
+
 def get_gemini_affirmation():
-    if not GEMINI_API_KEY: return "Discipline is freedom."
-    try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        prompt = "One short, stoic, powerful sentence about focus. Max 12 words."
-        response = model.generate_content(prompt)
-        return response.text.strip()
-    except: return "The obstacle is the way."
+    # Served from the pre-generated pool; refills run in the background.
+    return serve_affirmation(AFFIRMATION_MOODS.get(st.session_state.get('current_mood')))
 
 def get_youtube_vibe(mood_query, custom_url=None):
     if custom_url and len(custom_url) > 5:
         if "v=" in custom_url: return custom_url.split("v=")[1].split("&")[0]
         elif "youtu.be/" in custom_url: return custom_url.split("youtu.be/")[1].split("?")[0]
         return custom_url
-    if not YOUTUBE_API_KEY: return None
-    try:
-        youtube = build("youtube", "v3", developerKey=YOUTUBE_API_KEY)
-        req = youtube.search().list(part="snippet", q=mood_query, type="video", maxResults=1)
-        res = req.execute()
-        if res['items']: return res['items'][0]['id']['videoId']
-    except: return None
+    # Cached lookup; searches happen in the background within the daily quota budget.
+    return get_vibe_video(mood_query)
 
 # --- 4. UI COMPONENTS ---
 
@@ -143,15 +140,22 @@ def render_sidebar():
         tab_journal, tab_wins = st.tabs(["📖 Journal", "🏆 Wins"])
         
         with tab_journal:
-            entries = get_canvas_entries(st.session_state.user, limit=10)
+            pages_key = f"vault_canvas_page_count:{st.session_state.user}"
+            page = load_pages(get_canvas_page, st.session_state.user, st.session_state.setdefault(pages_key, 1), limit=10)
+            entries = page["items"]
             if not entries: 
                 st.info("Pages are blank.")
             for e in entries:
                 with st.expander(f"{e['created_at']} ({e.get('mood', 'Neutral')})"):
                     st.write(e['content'])
+            if page["next_cursor"] and st.button("Load more", key="vault_more_canvas"):
+                st.session_state[pages_key] += 1
+                st.rerun()
 
         with tab_wins:
-            wins = get_wins(st.session_state.user, limit=10)
+            pages_key = f"vault_wins_page_count:{st.session_state.user}"
+            page = load_pages(get_wins_page, st.session_state.user, st.session_state.setdefault(pages_key, 1), limit=10)
+            wins = page["items"]
             if not wins:
                 st.info("No wins logged yet.")
             for w in wins:
@@ -161,6 +165,9 @@ def render_sidebar():
                     if w.get('win2'): text += f"• {w['win2']}\n"
                     if w.get('win3'): text += f"• {w['win3']}"
                     st.write(text)
+            if page["next_cursor"] and st.button("Load more", key="vault_more_wins"):
+                st.session_state[pages_key] += 1
+                st.rerun()
 
 def render_vibe_check():
     st.markdown("### 🎧 Vibe Check")
@@ -185,7 +192,7 @@ def render_vibe_check():
         "🔥 Gym Mode": "aggressive workout motivation music"
     }
     
-    vid_id = get_youtube_vibe(queries[mood], custom_url) or "jfKfPfyJRdk"
+    vid_id = get_youtube_vibe(queries[mood], custom_url)
     
     st.markdown(f"""
     <div class="glass-card" style="padding: 0; overflow: hidden;">
@@ -245,8 +252,7 @@ def render_mindset():
     c1, c2 = st.columns([3, 1])
     with c1:
         if st.button("✨ New Thought"):
-            with st.spinner("."):
-                st.session_state['affirmation'] = get_gemini_affirmation()
+            st.session_state['affirmation'] = get_gemini_affirmation()
     
     with st.expander("Override"):
         manual = st.text_input("Custom Quote", label_visibility="collapsed")
@@ -273,7 +279,8 @@ def render_wins():
         w3 = st.text_input("Win 3", placeholder="Large")
         st.markdown('</div>', unsafe_allow_html=True)
         if st.form_submit_button("Log Wins"):
-            if save_wins(st.session_state.user, w1, w2, w3):
+            if any([w1, w2, w3]):
+                save_wins(st.session_state.user, datetime.now().strftime("%Y-%m-%d"), w1, w2, w3)
                 st.success("Wins Logged")
                 time.sleep(1)
                 st.rerun()
@@ -0,0 +1,150 @@
+"""
+timeseries.py
+Range-aware, downsampled series for the progress charts.
+
+    weight                          <- weight_log.weight_kg
+    mood, sleep, energy, water,     <- daily_diary (empty / zero values are
+    steps                              left out, as in get_weekly_stats)
+
+series() returns at most `points` points for any date range, so a ten-year
+chart sends plotly the same payload as a one-month one:
+
+    method="lttb"     Largest-Triangle-Three-Buckets over the raw rows —
+                      keeps the peaks and dips that give a line its shape.
+    method="buckets"  one row per equal-width date bucket with mean / min /
+                      max / n, aggregated in SQL (for band charts).
+
+Ranges with no more than `points` rows are returned as-is. Diary days that
+archive.prune() moved out of daily_diary are read back from the archive.
+
+Every function takes an open connection so it runs inside the caller's
+transaction (database_tracker).
+"""
+
+from datetime import date
+
+import archive
+
+# metric -> (table, date column, value column)
+METRICS = {
+    "weight": ("weight_log", "log_date", "weight_kg"),
+    "mood": ("daily_diary", "entry_date", "mood"),
+    "sleep": ("daily_diary", "entry_date", "sleep_hours"),
+    "energy": ("daily_diary", "entry_date", "energy_level"),
+    "water": ("daily_diary", "entry_date", "water_glasses"),
+    "steps": ("daily_diary", "entry_date", "steps_count"),
+}
+
+
+def _table(metric):
+    try:
+        return METRICS[metric]
+    except KeyError:
+        raise ValueError(f"unknown metric {metric!r}") from None
+
+
+def _range(con, username, metric, start, end):
+    """Fill in an open start (the user's first row) and end (today)."""
+    table, date_col, value_col = _table(metric)
+    end = str(end or date.today().isoformat())
+    if start is None:
+        archived = _archived(con, username, metric, None, end)
+        start = (archived[0][0] if archived else None) or con.execute(
+            f"SELECT MIN({date_col}) FROM {table} WHERE username = ? AND NULLIF({value_col}, 0) IS NOT NULL",
+            (username,)
+        ).fetchone()[0] or end
+    return str(start), end
+
+
+def _archived(con, username, metric, start, end):
+    """(date, value) rows of `metric` that archive.prune() moved out of its table."""
+    table, date_col, value_col = _table(metric)
+    if table not in archive.PRUNABLE:
+        return []
+    return [(r[date_col], r[value_col])
+            for r in archive.read(con, table, username, start, end, [value_col]) if r[value_col]]
+
+
+def lttb(xs, ys, threshold):
+    """Indices of the `threshold` points LTTB keeps (all of them if there are fewer)."""
+    size = len(xs)
+    if threshold >= size or threshold < 3:
+        return list(range(size))
+    every = (size - 2) / (threshold - 2)
+    keep, a = [0], 0
+    for i in range(threshold - 2):
+        # average of the next bucket is the third triangle corner
+        lo, hi = int((i + 1) * every) + 1, min(int((i + 2) * every) + 1, size)
+        avg_x = sum(xs[lo:hi]) / (hi - lo)
+        avg_y = sum(ys[lo:hi]) / (hi - lo)
+        ax, ay = xs[a], ys[a]
+        best, best_area = lo - 1, -1.0
+        for j in range(int(i * every) + 1, lo):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        keep.append(best)
+        a = best
+    keep.append(size - 1)
+    return keep
+
+
+def raw(con, username, metric, start, end):
+    """Every (date, value) row of `metric` in start..end, oldest first."""
+    table, date_col, value_col = _table(metric)
+    rows = con.execute(f"""
+        SELECT {date_col}, {value_col} FROM {table}
+        WHERE username = ? AND {date_col} BETWEEN ? AND ? AND NULLIF({value_col}, 0) IS NOT NULL
+        ORDER BY {date_col}
+    """, (username, start, end)).fetchall()
+    archived = _archived(con, username, metric, start, end)
+    if archived:
+        have = {r[0] for r in rows}
+        rows = sorted([tuple(r) for r in rows] + [r for r in archived if r[0] not in have])
+    return rows
+
+
+def buckets(con, username, metric, start, end, n):
+    """`n` equal-width date buckets over start..end: date (first day with data), mean, min, max, n."""
+    table, date_col, value_col = _table(metric)
+    span = date.fromisoformat(end[:10]).toordinal() - date.fromisoformat(start[:10]).toordinal() + 1
+    if _archived(con, username, metric, start, end):
+        return _buckets_of(raw(con, username, metric, start, end), start, span, n)
+    rows = con.execute(f"""
+        SELECT MIN(d), AVG(v), MIN(v), MAX(v), COUNT(*)
+        FROM (SELECT {date_col} AS d, {value_col} AS v,
+                     CAST((julianday({date_col}) - julianday(?)) * ? / ? AS INTEGER) AS b
+              FROM {table}
+              WHERE username = ? AND {date_col} BETWEEN ? AND ? AND NULLIF({value_col}, 0) IS NOT NULL)
+        GROUP BY b ORDER BY b
+    """, (start, n, span, username, start, end)).fetchall()
+    return [{"date": r[0], "value": round(r[1], 2), "min": r[2], "max": r[3], "n": r[4]} for r in rows]
+
+
+def _buckets_of(rows, start, span, n):
+    """buckets() over (date, value) rows already in memory (ranges reaching into the archive)."""
+    first = date.fromisoformat(start[:10]).toordinal()
+    out = {}
+    for d, v in rows:
+        b = out.setdefault((date.fromisoformat(d[:10]).toordinal() - first) * n // span, [d, 0.0, v, v, 0])
+        b[1] += v
+        b[2], b[3], b[4] = min(b[2], v), max(b[3], v), b[4] + 1
+    return [{"date": b[0], "value": round(b[1] / b[4], 2), "min": b[2], "max": b[3], "n": b[4]}
+            for _, b in sorted(out.items())]
+
+
+def series(con, username, metric, start=None, end=None, points=200, method="lttb"):
+    """
+    `metric` for `username` between start and end (ISO dates, inclusive;
+    default: first logged day .. today), downsampled to at most `points`
+    [{"date", "value"}, ...] — plus "min", "max", "n" with method="buckets".
+    """
+    start, end = _range(con, username, metric, start, end)
+    if method == "buckets":
+        return buckets(con, username, metric, start, end, points)
+    if method != "lttb":
+        raise ValueError(f"unknown method {method!r}")
+    rows = raw(con, username, metric, start, end)
+    xs = [date.fromisoformat(r[0][:10]).toordinal() for r in rows]
+    ys = [r[1] for r in rows]
+    return [{"date": rows[i][0], "value": ys[i]} for i in lttb(xs, ys, points)]
@@ -0,0 +1,113 @@
+"""
+user_cache.py
+In-process read-through cache for per-user dashboard reads.
+
+    @cached                  # first argument is the username
+    def get_todos(username, todo_date): ...
+
+    @invalidates()           # bumps the username's version after the write
+    def add_todo(username, todo_date, task_text): ...
+
+    @invalidates(None)       # id-only writes: bump every user
+    def delete_todo(todo_id): ...
+
+Entries are keyed by (username, function, args, today's date) and remember
+the user's version when they were read; any write for that user bumps the
+version, so a repeat render with no writes in between never touches the
+database. Memory is bounded by MAX_ENTRIES (least recently used first) and
+entries expire after TTL_S as a backstop for writes from other processes
+(e.g. weekly_review_job.py).
+
+Cached values are shared between callers — treat them as read-only.
+"""
+
+import functools
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+MAX_ENTRIES = 2048
+TTL_S = 300
+
+_entries = OrderedDict()     # key -> (version, stored_at, value)
+_versions = {}               # username -> int
+_epoch = 0                   # bumped by writes that can't name a user
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def _version(username):
+    return (_epoch, _versions.get(username, 0))
+
+
+def bump(username=None):
+    """Invalidate everything cached for `username` (every user if None)."""
+    global _epoch
+    with _lock:
+        if username is None:
+            _epoch += 1
+        else:
+            _versions[username] = _versions.get(username, 0) + 1
+        _stats["invalidations"] += 1
+
+
+def clear():
+    global _epoch
+    with _lock:
+        _entries.clear()
+        _epoch += 1
+
+
+def stats():
+    with _lock:
+        return dict(_stats, entries=len(_entries))
+
+
+def cached(fn):
+    """Cache `fn(username, ...)` until the next write for that username."""
+    name = fn.__qualname__
+
+    @functools.wraps(fn)
+    def wrapper(username, *args, **kwargs):
+        key = (username, name, args, tuple(sorted(kwargs.items())), date.today().toordinal())
+        now = time.monotonic()
+        with _lock:
+            version = _version(username)
+            hit = _entries.get(key)
+            if hit is not None and hit[0] == version and now - hit[1] < TTL_S:
+                _entries.move_to_end(key)
+                _stats["hits"] += 1
+                return hit[2]
+            _stats["misses"] += 1
+        # Read outside the lock; a write landing meanwhile bumps the version,
+        # so this result is stored under the old one and never served.
+        value = fn(username, *args, **kwargs)
+        with _lock:
+            _entries[key] = (version, now, value)
+            _entries.move_to_end(key)
+            while len(_entries) > MAX_ENTRIES:
+                _entries.popitem(last=False)
+        return value
+
+    wrapper.uncached = fn
+    return wrapper
+
+
+def invalidates(user_arg=0):
+    """
+    Bump the version of the username passed as positional argument `user_arg`
+    (or keyword "username") once the write returns; user_arg=None bumps all.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                if user_arg is None:
+                    bump()
+                else:
+                    bump(args[user_arg] if len(args) > user_arg else kwargs.get("username"))
+        return wrapper
+    return decorator
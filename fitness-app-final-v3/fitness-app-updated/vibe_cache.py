@@ -0,0 +1,187 @@
+"""
+vibe_cache.py
+Cached YouTube lookups for the Mind Reset Vibe Check.
+
+Lookups never touch the network: results come from an in-memory cache that
+is warmed from SQLite and from the curated catalogue in
+config/vibe_catalogue.json. Entries older than CACHE_TTL_S (or that only come
+from the catalogue) are refreshed by a background thread, and every search is
+charged against a per-day quota budget so the YouTube API key can't be drained
+by widget reruns.
+
+The catalogue only lists queries with a known-good video id; a query missing
+from it plays DEFAULT_VIDEO_ID until its first background search lands.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from database_pool import connect
+from migrations import bootstrap
+
+DB_NAME = "routinex.db"
+BASE_DIR = os.path.dirname(__file__)
+CATALOGUE_PATH = os.path.join(BASE_DIR, "config/vibe_catalogue.json")
+
+DEFAULT_VIDEO_ID = "jfKfPfyJRdk"   # lofi girl live
+CACHE_TTL_S = 24 * 3600            # refresh a query at most once a day
+SEARCH_COST = 100                  # YouTube Data API units per search.list
+DAILY_QUOTA_BUDGET = int(os.getenv("YOUTUBE_DAILY_QUOTA_BUDGET", "1000"))
+RESULTS_PER_SEARCH = 5
+
+_cache = {}            # query -> (video_ids, fetched_at epoch, source)
+_cache_lock = threading.Lock()
+_loaded = False
+_refreshing = set()
+_youtube = None
+_search_lock = threading.Lock()   # googleapiclient/httplib2 clients aren't thread-safe
+
+
+def _conn():
+    return connect(DB_NAME, row_factory=sqlite3.Row)
+
+
+def init_vibe_db():
+    bootstrap(DB_NAME)
+
+
+def _load_catalogue():
+    try:
+        with open(CATALOGUE_PATH, encoding="utf-8") as f:
+            return {q: [v for v in ids if v] for q, ids in json.load(f).items()}
+    except (OSError, ValueError) as e:
+        print(f"Vibe catalogue not loaded: {e}")
+        return {}
+
+
+def _warm():
+    """Fill the in-memory cache once per process: catalogue first, then stored API results."""
+    global _loaded
+    if _loaded:
+        return
+    with _cache_lock:
+        if _loaded:
+            return
+        for query, ids in _load_catalogue().items():
+            if ids:
+                _cache[query] = (ids, 0.0, "catalogue")
+        try:
+            con = _conn()
+            for r in con.execute("SELECT query, video_ids, fetched_at, source FROM youtube_vibe_cache"):
+                ids = json.loads(r["video_ids"])
+                if ids:
+                    _cache[r["query"]] = (ids, r["fetched_at"], r["source"])
+            con.close()
+        except sqlite3.Error:
+            pass  # table not created yet; catalogue is enough
+        _loaded = True
+
+
+# ──────────────────────────────────────────────────────────────
+# LOOKUP (hot path — no network)
+# ──────────────────────────────────────────────────────────────
+
+def get_vibe_video(query):
+    """Video id for a mood query. Returns immediately; may schedule a background refresh."""
+    _warm()
+    ids, fetched_at, _ = _cache.get(query, ([], 0.0, None))
+    if time.time() - fetched_at > CACHE_TTL_S:
+        refresh_async(query)
+    return ids[0] if ids else DEFAULT_VIDEO_ID
+
+
+# ──────────────────────────────────────────────────────────────
+# QUOTA
+# ──────────────────────────────────────────────────────────────
+
+def _charge_quota(units=SEARCH_COST, budget=None):
+    """Reserve `units` from today's budget. Returns False if that would exceed it."""
+    budget = DAILY_QUOTA_BUDGET if budget is None else budget
+    today = date.today().isoformat()
+    con = _conn()
+    con.execute("INSERT OR IGNORE INTO youtube_quota(day, units_used) VALUES(?, 0)", (today,))
+    cur = con.execute(
+        "UPDATE youtube_quota SET units_used = units_used + ? WHERE day=? AND units_used + ? <= ?",
+        (units, today, units, budget)
+    )
+    con.commit(); con.close()
+    return cur.rowcount == 1
+
+
+def get_quota_used(day=None):
+    con = _conn()
+    row = con.execute("SELECT units_used FROM youtube_quota WHERE day=?",
+                      (day or date.today().isoformat(),)).fetchone()
+    con.close()
+    return row["units_used"] if row else 0
+
+
+# ──────────────────────────────────────────────────────────────
+# REFRESH (background)
+# ──────────────────────────────────────────────────────────────
+
+def _client(api_key):
+    global _youtube
+    if _youtube is None:
+        from googleapiclient.discovery import build
+        _youtube = build("youtube", "v3", developerKey=api_key, cache_discovery=False)
+    return _youtube
+
+
+def refresh_query(query):
+    """Search YouTube for `query` and store the results. Returns the ids, or None if skipped/failed."""
+    api_key = os.getenv("YOUTUBE_API_KEY")
+    if not api_key or not _charge_quota():
+        return None
+    try:
+        with _search_lock:
+            res = _client(api_key).search().list(
+                part="id", q=query, type="video", maxResults=RESULTS_PER_SEARCH
+            ).execute()
+        ids = [i["id"]["videoId"] for i in res.get("items", []) if i.get("id", {}).get("videoId")]
+    except Exception as e:
+        print(f"YouTube refresh failed for '{query}': {e}")
+        return None
+    if not ids:
+        return None
+
+    now = time.time()
+    con = _conn()
+    con.execute("""
+        INSERT INTO youtube_vibe_cache(query, video_ids, source, fetched_at) VALUES(?,?,?,?)
+        ON CONFLICT(query) DO UPDATE SET video_ids=excluded.video_ids,
+            source=excluded.source, fetched_at=excluded.fetched_at
+    """, (query, json.dumps(ids), "api", now))
+    con.commit(); con.close()
+    with _cache_lock:
+        _cache[query] = (ids, now, "api")
+    return ids
+
+
+def refresh_async(query):
+    """Start a refresh thread for `query` unless one is already running."""
+    if not os.getenv("YOUTUBE_API_KEY"):
+        return False
+    with _cache_lock:
+        if query in _refreshing:
+            return False
+        _refreshing.add(query)
+
+    def _run():
+        try:
+            if refresh_query(query) is None:
+                # Skipped or failed: back off for a full TTL instead of retrying every rerun.
+                with _cache_lock:
+                    ids, _, source = _cache.get(query, ([], 0.0, None))
+                    _cache[query] = (ids, time.time(), source)
+        finally:
+            with _cache_lock:
+                _refreshing.discard(query)
+
+    threading.Thread(target=_run, name="vibe-refresh", daemon=True).start()
+    return True
+
@@ -0,0 +1,437 @@
+"""
+Wearable Import for RoutineX
+Streams Apple Health, Google Fit and Fitbit exports into the diary
+(steps_count, sleep_hours) and the weight log, without loading the file.
+
+    python wearables.py alice export.zip                    # Apple Health (export.zip or export.xml)
+    python wearables.py alice "Daily activity metrics.csv"  # Google Fit (Takeout daily summary)
+    python wearables.py alice fitbit_export_20240101.csv    # Fitbit (sectioned account export)
+
+Samples are folded into per-day totals as they are read, so memory grows
+with the number of days covered, never with the size of the file:
+
+    steps   summed per source, then the busiest source per day (a phone and a
+            watch both count the same walk)
+    sleep   asleep intervals merged per night and credited to the wake-up
+            day; "in bed" is used for nights with no asleep data
+    weight  the day's last reading, in kg
+
+Days are then written through upsert_diary_many / log_weights in chunks of
+WRITE_CHUNK_DAYS, so rollups, streaks and the energy estimate stay current.
+Days that already have a value keep it unless --overwrite is given. Days the
+import creates are flagged imported and don't count as check-ins (streaks,
+days logged, insights, cohorts) until the user logs them.
+
+Progress is checkpointed every CHECKPOINT_BYTES of input (byte offset plus
+the day totals so far), so re-running the same command after an
+interruption carries on from there.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import zipfile
+from datetime import datetime
+from xml.etree.ElementTree import XMLPullParser
+
+from database_tracker import get_diary_range, get_weight_range, log_weights, upsert_diary_many
+
+READ_BYTES = 4 << 20           # XML fed to the parser per read
+CHECKPOINT_BYTES = 64 << 20    # input between checkpoints
+WRITE_CHUNK_DAYS = 1000        # diary days per write transaction
+LB_TO_KG = 0.45359237
+
+APPLE_STEPS = "HKQuantityTypeIdentifierStepCount"
+APPLE_WEIGHT = "HKQuantityTypeIdentifierBodyMass"
+APPLE_SLEEP = "HKCategoryTypeIdentifierSleepAnalysis"
+APPLE_IN_BED = "HKCategoryValueSleepAnalysisInBed"
+APPLE_AWAKE = "HKCategoryValueSleepAnalysisAwake"
+
+SOURCE_LABELS = {"apple_health": "Apple Health", "google_fit": "Google Fit", "fitbit": "Fitbit"}
+
+
+# ─────────────────────────────────────────────────────────────
+# PER-DAY TOTALS
+# ─────────────────────────────────────────────────────────────
+
+def _merge_interval(intervals, start, end):
+    """Insert [start, end] into a sorted list of disjoint intervals, merging overlaps."""
+    out, placed = [], False
+    for s, e in intervals:
+        if e < start:
+            out.append([s, e])
+        elif s > end:
+            if not placed:
+                out.append([start, end])
+                placed = True
+            out.append([s, e])
+        else:
+            start, end = min(s, start), max(e, end)
+    if not placed:
+        out.append([start, end])
+    return out
+
+
+class DayTotals:
+    """Everything read so far, as plain JSON-able dicts keyed by ISO day."""
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.steps = state.get("steps", {})        # day -> {source: steps}
+        self.asleep = state.get("asleep", {})      # day -> [[start, end], ...] epoch seconds
+        self.in_bed = state.get("in_bed", {})
+        self.sleep_hours = state.get("sleep_hours", {})   # day -> hours, for daily-total exports
+        self.weight = state.get("weight", {})      # day -> [reading time, kg]
+
+    def state(self):
+        return {"steps": self.steps, "asleep": self.asleep, "in_bed": self.in_bed,
+                "sleep_hours": self.sleep_hours, "weight": self.weight}
+
+    def add_steps(self, day, source, n):
+        by_source = self.steps.setdefault(day, {})
+        by_source[source] = by_source.get(source, 0) + n
+
+    def add_sleep(self, day, start, end, asleep=True):
+        target = self.asleep if asleep else self.in_bed
+        target[day] = _merge_interval(target.get(day, []), start, end)
+
+    def add_weight(self, day, at, kg):
+        if day not in self.weight or at >= self.weight[day][0]:
+            self.weight[day] = [at, kg]
+
+    def days(self):
+        """{day: {"steps_count", "sleep_hours"}} with whatever each day has."""
+        out = {}
+        for day, by_source in self.steps.items():
+            out.setdefault(day, {})["steps_count"] = int(round(max(by_source.values())))
+        for day in set(self.asleep) | set(self.in_bed) | set(self.sleep_hours):
+            intervals = self.asleep.get(day) or self.in_bed.get(day)
+            hours = sum(e - s for s, e in intervals) / 3600 if intervals else self.sleep_hours[day]
+            if hours > 0:
+                out.setdefault(day, {})["sleep_hours"] = round(hours, 1)
+        return out
+
+    def weights(self):
+        return {day: round(kg, 2) for day, (_, kg) in self.weight.items() if kg > 0}
+
+
+# ─────────────────────────────────────────────────────────────
+# PARSERS — each reads from a byte offset and yields
+# (records read, offset of a clean resume point or None)
+# ─────────────────────────────────────────────────────────────
+
+def _epoch(stamp):
+    """Apple / Fitbit timestamp -> epoch seconds."""
+    for fmt in ("%Y-%m-%d %H:%M:%S %z", "%Y-%m-%d %I:%M%p", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S.%f"):
+        try:
+            return datetime.strptime(stamp.strip(), fmt).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognised timestamp {stamp!r}")
+
+
+def parse_apple_health(f, totals, offset=0, cursor=None):
+    """
+    Apple Health export.xml. Fed to an XMLPullParser in READ_BYTES chunks
+    cut at line ends; a chunk that ends with only <HealthData> open is a
+    clean place to resume (the root tag is re-opened by hand then).
+    """
+    parser = XMLPullParser(events=("start", "end"))
+    if offset:
+        f.seek(offset)
+        parser.feed(b"<HealthData>")
+    depth, root, records, tail = 0, None, 0, b""
+    while True:
+        chunk = f.read(READ_BYTES)
+        data = tail + chunk
+        if chunk:
+            cut = data.rfind(b"\n") + 1
+            data, tail = data[:cut], data[cut:]
+        else:
+            tail = b""
+        offset += len(data)
+        parser.feed(data)
+        for event, elem in parser.read_events():
+            if event == "start":
+                depth += 1
+                if root is None:
+                    root = elem
+                continue
+            depth -= 1
+            if elem.tag != "Record":
+                continue
+            a = elem.attrib
+            kind = a.get("type")
+            if kind == APPLE_STEPS:
+                totals.add_steps(a["startDate"][:10], a.get("sourceName", ""), float(a["value"]))
+            elif kind == APPLE_SLEEP and a.get("value") != APPLE_AWAKE:
+                end = a["endDate"]
+                totals.add_sleep(end[:10], _epoch(a["startDate"]), _epoch(end),
+                                 asleep=a.get("value") != APPLE_IN_BED)
+            elif kind == APPLE_WEIGHT:
+                kg = float(a["value"]) * (LB_TO_KG if a.get("unit") == "lb" else 1)
+                totals.add_weight(a["startDate"][:10], a["startDate"], kg)
+            else:
+                continue
+            records += 1
+        if root is not None:
+            root.clear()    # drop finished elements; an open one lives on in the parser
+        yield records, (offset if depth == 1 and data.endswith(b"\n") else None)
+        if not chunk:
+            break
+    parser.close()
+
+
+def _csv_rows(f, offset):
+    """(row, offset after it) for a CSV read as bytes from `offset`."""
+    f.seek(offset)
+    for line in f:
+        offset += len(line)
+        for row in csv.reader([line.decode("utf-8-sig")]):
+            yield row, offset
+
+
+def _number(text):
+    text = (text or "").replace(",", "").strip()
+    return float(text) if text else 0.0
+
+
+def _iso_day(text, fmt=None):
+    text = text.strip()[:10]
+    for f in ([fmt] if fmt else ["%Y-%m-%d", "%m/%d/%Y", "%m-%d-%Y", "%d-%m-%Y"]):
+        try:
+            return datetime.strptime(text, f).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognised date {text!r}")
+
+
+def parse_google_fit(f, totals, offset=0, cursor=None):
+    """Google Fit Takeout "Daily activity metrics.csv": one row per day."""
+    cursor = cursor if cursor is not None else {}
+    records = 0
+    for row, pos in _csv_rows(f, offset):
+        if "header" not in cursor:
+            cursor["header"] = row
+            continue
+        r = dict(zip(cursor["header"], row))
+        day = _iso_day(r.get("Date", ""))
+        if _number(r.get("Step count")):
+            totals.add_steps(day, "google_fit", _number(r["Step count"]))
+        if _number(r.get("Average weight (kg)")):
+            totals.add_weight(day, day, _number(r["Average weight (kg)"]))
+        sleep_ms = next((v for k, v in r.items() if k.lower().startswith("sleep duration")), "")
+        if _number(sleep_ms):
+            totals.sleep_hours[day] = _number(sleep_ms) / 3_600_000
+        records += 1
+        if records % 1000 == 0:
+            yield records, pos
+    yield records, None
+
+
+def parse_fitbit(f, totals, offset=0, cursor=None, weight_unit="kg"):
+    """
+    Fitbit account export: sections ("Activities", "Body", "Sleep", …) each
+    with a title line, a header row and data rows, separated by blank lines.
+    """
+    cursor = cursor if cursor is not None else {}
+    records = 0
+    for row, pos in _csv_rows(f, offset):
+        if not any(c.strip() for c in row):
+            cursor.pop("section", None)
+            cursor.pop("header", None)
+            continue
+        if "section" not in cursor:
+            cursor["section"] = row[0].strip()
+            continue
+        if "header" not in cursor:
+            cursor["header"] = [c.strip() for c in row]
+            continue
+        r = dict(zip(cursor["header"], row))
+        section = cursor["section"]
+        if section == "Activities" and _number(r.get("Steps")):
+            totals.add_steps(_iso_day(r["Date"]), "fitbit", _number(r["Steps"]))
+        elif section == "Body" and _number(r.get("Weight")):
+            day = _iso_day(r["Date"])
+            kg = _number(r["Weight"]) * (LB_TO_KG if weight_unit == "lb" else 1)
+            totals.add_weight(day, day, kg)
+        elif section == "Sleep" and _number(r.get("Minutes Asleep")):
+            start = _epoch(r["Start Time"])
+            end = _epoch(r["End Time"])
+            totals.add_sleep(datetime.fromtimestamp(end).date().isoformat(),
+                             start, start + _number(r["Minutes Asleep"]) * 60)
+        else:
+            continue
+        records += 1
+        if records % 1000 == 0:
+            yield records, pos
+    yield records, None
+
+
+PARSERS = {"apple_health": parse_apple_health, "google_fit": parse_google_fit, "fitbit": parse_fitbit}
+
+
+def detect(head):
+    """Which export the first bytes of a file look like (None if unknown)."""
+    text = head.decode("utf-8-sig", errors="ignore").lstrip()
+    if text.startswith("<?xml") or "<HealthData" in text:
+        return "apple_health"
+    first = text.splitlines()[0] if text else ""
+    if first.strip().strip('"') in ("Activities", "Body", "Sleep", "Foods", "Food Log"):
+        return "fitbit"
+    if first.startswith("Date") and "Step count" in first:
+        return "google_fit"
+    return None
+
+
+def open_export(path):
+    """
+    (seekable binary stream, size) for a path or an open binary file (an
+    upload); for an Apple Health zip, its export.xml.
+    """
+    if zipfile.is_zipfile(path):
+        z = zipfile.ZipFile(path)
+        name = next((n for n in z.namelist() if n.endswith("export.xml")), None)
+        if name is None:
+            raise ValueError("No export.xml inside the zip")
+        return z.open(name), z.getinfo(name).file_size
+    if hasattr(path, "read"):
+        size = path.seek(0, os.SEEK_END)
+        path.seek(0)
+        return path, size
+    return open(path, "rb"), os.path.getsize(path)
+
+
+# ─────────────────────────────────────────────────────────────
+# IMPORT
+# ─────────────────────────────────────────────────────────────
+
+def _load_checkpoint(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_checkpoint(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def write_days(username, totals, overwrite=False, label=""):
+    """Upsert the totals into the diary and weight log. Returns (diary rows, weigh-ins)."""
+    days = totals.days()
+    weights = totals.weights()
+    diary_rows = 0
+    if days:
+        first, last = min(days), max(days)
+        if not overwrite:
+            for entry in get_diary_range(username, first, last):
+                have = days.get(entry["entry_date"])
+                for field in list(have or ()):
+                    if entry.get(field):
+                        del have[field]
+        entries = [{"entry_date": d, **fields} for d, fields in sorted(days.items()) if fields]
+        for i in range(0, len(entries), WRITE_CHUNK_DAYS):
+            diary_rows += upsert_diary_many(username, entries[i:i + WRITE_CHUNK_DAYS], imported=True)
+    weigh_ins = 0
+    if weights:
+        if not overwrite:
+            for w in get_weight_range(username, min(weights), max(weights)):
+                weights.pop(w["log_date"], None)
+        if weights:
+            weigh_ins = log_weights(username, [(d, kg, f"Imported from {label}".strip())
+                                               for d, kg in sorted(weights.items())])
+    return diary_rows, weigh_ins
+
+
+def import_export(username, f, size, source=None, overwrite=False, checkpoint=None,
+                  progress=None, weight_unit="kg"):
+    """
+    Read one export from the binary stream `f` (`size` bytes) and write it.
+    `checkpoint` is a file path for resumable runs; `progress(bytes_read,
+    size, records)` is called after every chunk. Returns a summary dict.
+    """
+    saved = _load_checkpoint(checkpoint) if checkpoint else None
+    if saved and saved.get("size") != size:
+        saved = None                       # a different file under the same name
+    head = f.read(4096)
+    f.seek(0)
+    source = source or (saved or {}).get("source") or detect(head)
+    if source not in PARSERS:
+        raise ValueError("Unrecognised export: expected Apple Health XML, Google Fit or Fitbit CSV")
+
+    totals = DayTotals(saved and saved["state"])
+    offset = saved["offset"] if saved else 0
+    cursor = saved.get("cursor", {}) if saved else {}
+    records = saved["records"] if saved else 0
+    started = time.time()
+    kwargs = {"weight_unit": weight_unit} if source == "fitbit" else {}
+    last_ckpt = offset
+    parsed = 0
+    for parsed, clean in PARSERS[source](f, totals, offset, cursor, **kwargs):
+        if progress:
+            progress(f.tell(), size, records + parsed)
+        if checkpoint and clean is not None and clean - last_ckpt >= CHECKPOINT_BYTES:
+            _save_checkpoint(checkpoint, {"source": source, "size": size, "offset": clean,
+                                          "cursor": cursor, "records": records + parsed,
+                                          "state": totals.state()})
+            last_ckpt = clean
+    parse_s = time.time() - started
+
+    write_started = time.time()
+    diary_rows, weigh_ins = write_days(username, totals, overwrite, SOURCE_LABELS[source])
+    write_s = time.time() - write_started
+    if checkpoint and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return {
+        "source": source, "records": records + parsed, "bytes": size - offset,
+        "resumed_from": offset, "diary_days": diary_rows, "weigh_ins": weigh_ins,
+        "parse_s": round(parse_s, 2), "write_s": round(write_s, 2),
+        "mb_per_s": round((size - offset) / 1e6 / parse_s, 1) if parse_s else None,
+        "records_per_s": round((records + parsed) / parse_s) if parse_s else None,
+        "rows_per_s": round((diary_rows + weigh_ins) / write_s) if write_s else None,
+    }
+
+
+def import_file(username, path, source=None, overwrite=False, checkpoint=None, progress=None, weight_unit="kg"):
+    """import_export() for a file on disk (an Apple Health .zip is read in place)."""
+    f, size = open_export(path)
+    try:
+        return import_export(username, f, size, source, overwrite, checkpoint, progress, weight_unit)
+    finally:
+        f.close()
+
+
+if __name__ == "__main__":
+    from database_tracker import init_tracker_db
+
+    ap = argparse.ArgumentParser(description="Import a wearable export into a user's diary and weight log.")
+    ap.add_argument("username")
+    ap.add_argument("export", help="Apple Health export.zip / export.xml, Google Fit or Fitbit CSV")
+    ap.add_argument("--source", choices=sorted(PARSERS), help="skip format detection")
+    ap.add_argument("--overwrite", action="store_true", help="replace values already in the diary")
+    ap.add_argument("--weight-unit", choices=("kg", "lb"), default="kg", help="Fitbit body weight unit")
+    ap.add_argument("--checkpoint", help="progress file (default: <export>.checkpoint)")
+    args = ap.parse_args()
+
+    init_tracker_db()
+
+    def show(done, size, records):
+        print(f"\r  {done / 1e6:,.0f} / {size / 1e6:,.0f} MB  ·  {records:,} samples", end="", file=sys.stderr)
+
+    summary = import_file(args.username, args.export, args.source, args.overwrite,
+                          args.checkpoint or args.export + ".checkpoint", show, args.weight_unit)
+    print(file=sys.stderr)
+    if summary["resumed_from"]:
+        print(f"Resumed at byte {summary['resumed_from']:,}")
+    print(f"{SOURCE_LABELS[summary['source']]}: {summary['records']:,} samples parsed in "
+          f"{summary['parse_s']}s ({summary['mb_per_s'] or 0} MB/s); "
+          f"wrote {summary['diary_days']:,} diary days and {summary['weigh_ins']:,} weigh-ins in "
+          f"{summary['write_s']}s ({summary['rows_per_s'] or 0:,} rows/s)")
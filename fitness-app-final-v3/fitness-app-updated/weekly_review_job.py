@@ -0,0 +1,138 @@
+"""
+Weekly Review Job for RoutineX
+Precomputes every active user's weekly stats and AI review so the Weekly
+Review tab can show them without waiting on Gemini.
+
+Run it from cron every Sunday night, e.g.
+
+    0 23 * * SUN  cd /path/to/fitness-app-updated && python weekly_review_job.py
+
+or keep it running with `--daemon`, which sleeps until the next Sunday
+RUN_AT and repeats.
+
+"Active users" are users with at least one diary entry in the week.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from engine.ai_handler import set_rate_limit
+from engine.coach import agenerate_ai_weekly_reviews
+from database_tracker import (
+    init_tracker_db,
+    get_weekly_stats_all, get_weekly_weight_changes, get_active_goals_all,
+    get_weekly_reviews_for_week, save_weekly_reviews,
+)
+
+RUN_WEEKDAY = 6        # Sunday
+RUN_AT = (23, 0)       # 23:00 local time
+
+
+def default_week_start(today=None):
+    """Monday of the week that contains yesterday (so a run just after midnight still reviews last week)."""
+    d = (today or date.today()) - timedelta(days=1)
+    return (d - timedelta(days=d.weekday())).isoformat()
+
+
+def build_review_rows(week_start, force=False):
+    """Collect stats for all active users in one pass. Returns (rows, ai_requests)."""
+    week_end = (date.fromisoformat(week_start) + timedelta(days=6)).isoformat()
+    stats_by_user = get_weekly_stats_all(week_start)
+    if not force:
+        done = {r["username"] for r in get_weekly_reviews_for_week(week_start) if r.get("ai_summary")}
+        stats_by_user = {u: s for u, s in stats_by_user.items() if u not in done}
+    users = list(stats_by_user)
+    weights = get_weekly_weight_changes(week_start, users)
+    goals = get_active_goals_all(users)
+
+    rows, requests = [], []
+    for username in users:
+        stats = stats_by_user[username]
+        w = weights.get(username, {})
+        goal = goals.get(username)
+        rows.append({
+            "username": username, "week_start": week_start, "week_end": week_end,
+            "stats": stats, "weight_change": w.get("weight_change"),
+        })
+        requests.append({
+            "username": username,
+            "stats": stats,
+            "goal": goal,
+            "latest_weight": w.get("latest_weight"),
+            "start_weight": goal.get("start_weight") if goal else None,
+            "target_weight": goal.get("target_weight") if goal else None,
+            "target_date_str": goal.get("target_date", "") if goal else "",
+        })
+    return rows, requests
+
+
+async def run_week(week_start, batch_size, concurrency, force=False):
+    rows, requests = build_review_rows(week_start, force)
+    print(f"Week of {week_start}: {len(rows)} users to review")
+
+    written = failed = 0
+    for i in range(0, len(rows), batch_size):
+        batch_rows = rows[i:i + batch_size]
+        results = await agenerate_ai_weekly_reviews(requests[i:i + batch_size], concurrency=concurrency)
+        # A failed generation still saves the week's stats, but with no
+        # ai_summary, so the next run picks the user up again.
+        save_weekly_reviews([
+            (r["username"], r["week_start"], r["week_end"],
+             r["stats"]["avg_mood"], r["stats"]["avg_energy"],
+             r["stats"]["avg_sleep"], r["stats"]["avg_water"],
+             r["stats"]["workouts_completed"], r["stats"]["days_diet_followed"],
+             r["weight_change"], *(review or (None, None, None)))
+            for r, review in zip(batch_rows, results)
+        ])
+        written += len(batch_rows)
+        failed += sum(review is None for review in results)
+        print(f"  saved {written}/{len(rows)}" + (f" ({failed} without an AI review, retried next run)" if failed else ""))
+    return written
+
+
+def seconds_until_next_run(now=None):
+    now = now or datetime.now()
+    target = now.replace(hour=RUN_AT[0], minute=RUN_AT[1], second=0, microsecond=0)
+    target += timedelta(days=(RUN_WEEKDAY - now.weekday()) % 7)
+    if target <= now:
+        target += timedelta(days=7)
+    return (target - now).total_seconds()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Precompute RoutineX AI weekly reviews for all active users.")
+    ap.add_argument("--week", help="Monday of the week to review (YYYY-MM-DD); default: the week containing yesterday")
+    ap.add_argument("--batch-size", type=int, default=50, help="reviews generated and saved per batch (default 50)")
+    ap.add_argument("--concurrency", type=int, default=8, help="AI calls in flight per batch (default 8)")
+    ap.add_argument("--rpm", type=int, default=60, help="max AI calls started per minute, 0 = unlimited (default 60)")
+    ap.add_argument("--force", action="store_true", help="regenerate reviews that already exist")
+    ap.add_argument("--daemon", action="store_true", help="stay running and repeat every Sunday at RUN_AT")
+    args = ap.parse_args(argv)
+
+    init_tracker_db()
+    set_rate_limit(args.rpm)
+
+    if not args.daemon:
+        week = args.week or default_week_start()
+        date.fromisoformat(week)  # validate
+        asyncio.run(run_week(week, args.batch_size, args.concurrency, args.force))
+        return 0
+
+    while True:
+        wait = seconds_until_next_run()
+        print(f"Next run in {wait / 3600:.1f} h")
+        time.sleep(wait)
+        started = time.monotonic()
+        try:
+            asyncio.run(run_week(default_week_start(date.today() + timedelta(days=1)),
+                                 args.batch_size, args.concurrency, args.force))
+        except Exception as e:
+            print(f"Weekly review run failed: {e}")
+        print(f"Run finished in {time.monotonic() - started:.0f}s")
+
+
+if __name__ == "__main__":
+    sys.exit(main())